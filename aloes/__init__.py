@@ -0,0 +1 @@
+default_app_config = 'aloes.apps.AloesConfig'
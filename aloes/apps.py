@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save
+
+
+class AloesConfig(AppConfig):
+    name = 'aloes'
+
+    def ready(self):
+        from documents.models import Document # pylint: disable=import-outside-toplevel
+        from .home import invalidate_sender # pylint: disable=import-outside-toplevel
+        from .jobs import autodiscover # pylint: disable=import-outside-toplevel
+        from .models import GeneralPreferences # pylint: disable=import-outside-toplevel
+        from .versions import finish_request, start_request # pylint: disable=import-outside-toplevel
+        autodiscover()
+        request_started.connect(start_request)
+        request_finished.connect(finish_request)
+        for model in (GeneralPreferences, Document):
+            post_save.connect(invalidate_sender, sender=model)
+            post_delete.connect(invalidate_sender, sender=model)
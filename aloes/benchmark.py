@@ -0,0 +1,238 @@
+"""Benchmark of the main views: duration and number of queries of each request.
+
+The requests are sent with the test client, logged in as a staff user, to the current
+database (generate a residence with the make_dataset command first). Jobs are run in
+the request (JOBS_ASYNC = False) so that the documents and exports are measured, then
+deleted with their results.
+"""
+import io
+import os
+import statistics
+import time
+from collections import namedtuple
+
+import django
+import openpyxl
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from generate_docs.documents import DOCUMENTS
+from gestion.autocomplete import warm_up
+from gestion.models import Leasing, Room, Tenant
+
+from .jobs import result_file
+from .models import Job
+
+Case = namedtuple('Case', ['name', 'url', 'data', 'files'])
+Case.__new__.__defaults__ = (None, None)
+Case.__doc__ = """
+Request to measure: a GET to url, or a POST of data (and files) if data is not None.
+"""
+
+
+def camel_case(name):
+    """Return the url name of a document ("lease_attestation" -> "leaseAttestation")."""
+    first, *others = name.split("_")
+    return first + "".join(word.capitalize() for word in others)
+
+
+def mailing_labels_file(rows=20):
+    """Return an xlsx file of tenants and rooms for the mailing labels view."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sheet1"
+    for leasing in Leasing.objects.filter(current_rooms__isnull=False).select_related(
+            'tenant', 'room')[:rows]:
+        sheet.append([str(leasing.tenant), str(leasing.room)])
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    output.name = "etiquettes.xlsx"
+    return output
+
+
+def samples():
+    """Return the rooms, tenants and leasings used by the cases, with the richest histories."""
+    room = Room.objects.filter(current_leasing__isnull=False).annotate(
+        leasings=Count('leasing')
+    ).order_by('-leasings').first()
+    tenant = Tenant.objects.filter(current_leasing__isnull=False).annotate(
+        leasings=Count('leasing')
+    ).order_by('-leasings').first()
+    if room is None or tenant is None:
+        return None
+    return {
+        "room": room,
+        "tenant": tenant,
+        "leasing": tenant.current_leasing,
+        "ended_leasing": Leasing.objects.filter(date_of_departure__isnull=False).first(),
+        "next_tenant": Tenant.objects.filter(next_leasing__isnull=False).first(),
+    }
+
+
+def build_cases():
+    """Return the list of cases, or an empty list if the database has no tenant in a room."""
+    objects = samples()
+    if objects is None:
+        return []
+    index = reverse('gestion:indexGestion')
+    filters = "?sort=room&building=I&gender=I"
+    cases = [
+        Case("gestion_index", index),
+        Case("gestion_index.search_name", index + filters + "&name=Martin&search="),
+        Case(
+            "gestion_index.search_building",
+            index + "?sort=last_name&building=B&gender=F&search="
+        ),
+        Case("gestion_index.search_empty", index + filters + "&empty_rooms_only=on&search="),
+        Case("gestion_index.export_csv", index + filters + "&name=Martin&csv=csv"),
+        Case("gestion_index.export_xlsx", index + filters + "&csv=xlsx"),
+        Case("gestion_index.export_ods", index + filters + "&csv=ods"),
+        Case("export_xls.xlsx", reverse('gestion:exportCSV') + "?format=xlsx"),
+        Case("export_xls.csv", reverse('gestion:exportCSV') + "?format=csv"),
+        Case("room_profile", reverse('gestion:roomProfile', args=[objects["room"].pk])),
+        Case("room_timeline", reverse('gestion:roomTimeline', args=[objects["room"].pk])),
+        Case("tenant_profile", reverse('gestion:tenantProfile', args=[objects["tenant"].pk])),
+        Case("tenant_timeline", reverse('gestion:tenantTimeline', args=[objects["tenant"].pk])),
+        Case("leasing_profile", reverse('gestion:leasingProfile', args=[objects["leasing"].pk])),
+        Case("autocomplete.empty_room", reverse('gestion:emptyRoomAutocomplete') + "?q=B1"),
+        Case(
+            "autocomplete.no_next_tenant_room",
+            reverse('gestion:noNextTenantRoomAutocomplete') + "?q=C"
+        ),
+        Case("autocomplete.tenant_wnr", reverse('gestion:tenantWNRAutocomplete') + "?q=mar"),
+        Case(
+            "autocomplete.tenant_without_room",
+            reverse('gestion:tenantWithoutRoomAutocomplete') + "?q=dub"
+        ),
+        Case("mail_tenants", reverse('gestion:mailTenants')),
+    ]
+    for name, document in DOCUMENTS.items():
+        if document.model is Tenant:
+            key = "next_tenant" if name == "reservation_attestation" else "tenant"
+        else:
+            key = "ended_leasing" if name == "lease_end_attestation" else "leasing"
+        pk = objects[key] and objects[key].pk
+        if pk is not None:
+            cases.append(Case(
+                "generate_docs." + name,
+                reverse('generate_docs:' + camel_case(name), args=[pk])
+            ))
+    cases.append(Case(
+        "generate_docs.batch_documents",
+        reverse('generate_docs:batchDocuments'),
+        {"document": "tenant_record", "selection": "current", "building": "A"}
+    ))
+    cases.append(Case(
+        "generate_docs.mailing_labels",
+        reverse('generate_docs:mailingLabels'),
+        {},
+        {"file": mailing_labels_file}
+    ))
+    return cases
+
+
+def consume(response):
+    """Read the whole content of response and return its size."""
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    response.close()
+    return size
+
+
+def measure(client, case, repeat):
+    """Send the request of case repeat times and return its measures."""
+    durations = []
+    for _ in range(repeat):
+        data = case.data
+        if case.files:
+            data = dict(data, **{name: build() for name, build in case.files.items()})
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            if data is None:
+                response = client.get(case.url)
+            else:
+                response = client.post(case.url, data)
+            size = consume(response)
+            durations.append(time.perf_counter() - start)
+    return {
+        "name": case.name,
+        "url": case.url,
+        "method": "GET" if case.data is None else "POST",
+        "status": response.status_code,
+        "bytes": size,
+        "queries": len(queries),
+        "min_ms": round(min(durations) * 1000, 2),
+        "median_ms": round(statistics.median(durations) * 1000, 2),
+        "mean_ms": round(statistics.mean(durations) * 1000, 2),
+        "max_ms": round(max(durations) * 1000, 2),
+    }
+
+
+def delete_jobs_after(pk):
+    """Delete the jobs created after the job pk, and their results."""
+    jobs = Job.objects.filter(pk__gt=pk)
+    for job in jobs.exclude(result_path=""):
+        try:
+            os.remove(result_file(job))
+        except FileNotFoundError:
+            pass
+    jobs.delete()
+
+
+def run(user, repeat=5, only=None, log=None):
+    """
+    Measure every case (or the ones whose name starts with only) as user and return
+    the report, a dictionary serializable in JSON.
+    """
+    log = log or (lambda result: None)
+    client = Client()
+    client.force_login(user)
+    # Built at startup by the WSGI application, not by the test client.
+    warm_up()
+    last_job = Job.objects.aggregate(pk=Max('pk'))["pk"] or 0
+    results = []
+    try:
+        # The test client sends its requests to the host testserver.
+        with override_settings(JOBS_ASYNC=False,
+                               ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ["testserver"]):
+            for case in build_cases():
+                if only and not case.name.startswith(tuple(only)):
+                    continue
+                # One request to warm the caches before measuring.
+                measure(client, case, 1)
+                result = measure(client, case, repeat)
+                results.append(result)
+                log(result)
+    finally:
+        delete_jobs_after(last_job)
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "dataset": {
+            "rooms": Room.objects.count(),
+            "tenants": Tenant.objects.count(),
+            "leasings": Leasing.objects.count(),
+        },
+        "results": results,
+    }
+
+
+def compare(report, previous):
+    """Yield (name, median before, median after, queries before, queries after)."""
+    before = {result["name"]: result for result in previous["results"]}
+    for result in report["results"]:
+        old = before.get(result["name"])
+        if old is not None:
+            yield (
+                result["name"], old["median_ms"], result["median_ms"],
+                old["queries"], result["queries"]
+            )
@@ -0,0 +1,237 @@
+"""Declarative export engine writing querysets to csv, xlsx or ods files.
+
+An export is made of sections. Each section reads its queryset with a single
+values() query built from the ORM paths declared by its columns, by chunks, so
+that adding a column can not trigger one query per row.
+"""
+import csv
+import logging
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+import xlsxwriter
+from django.db import connection
+from django.http import FileResponse
+
+from .utils import Echo, streaming_csv_response
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ods": "application/vnd.oasis.opendocument.spreadsheet",
+}
+
+
+class Column: # pylint: disable=too-few-public-methods
+    """
+    A column of an export.
+
+    header : title of the column
+    paths : ORM paths (relative to the queryset of the section) needed by the column
+    render : function receiving the values of paths (in the same order) and returning the cell.
+        By default, the value of the first path (or an empty cell if there is no path).
+    """
+    def __init__(self, header, paths=(), render=None):
+        self.header = header
+        self.paths = tuple(paths)
+        self.render = render
+
+    def cell(self, values):
+        """Return the content of the cell for a row of values."""
+        args = [values[path] for path in self.paths]
+        if self.render:
+            return self.render(*args)
+        if args:
+            return "" if args[0] is None else args[0]
+        return ""
+
+
+class Section: # pylint: disable=too-few-public-methods
+    """
+    A set of rows read from one queryset.
+
+    color : optional Column returning a key of the colors of the export for the row.
+    """
+    def __init__(self, queryset, columns, color=None):
+        self.queryset = queryset
+        self.columns = columns
+        self.color = color
+
+    @property
+    def paths(self):
+        """Return all ORM paths required by the columns, without duplicates."""
+        paths = []
+        for column in self.columns + ([self.color] if self.color else []):
+            for path in column.paths:
+                if path not in paths:
+                    paths.append(path)
+        return paths
+
+    def rows(self):
+        """Yield (cells, color key) for each row of the section."""
+        values_list = self.queryset.values(*self.paths)
+        for values in values_list.iterator(chunk_size=CHUNK_SIZE):
+            cells = [column.cell(values) for column in self.columns]
+            yield cells, self.color.cell(values) if self.color else None
+
+
+class QueryCounter: # pylint: disable=too-few-public-methods
+    """Database execute wrapper counting queries and their duration."""
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.duration += time.monotonic() - start
+
+
+class Export:
+    """
+    An export made of sections sharing the headers of the first one.
+
+    name : name used in logs and as default filename
+    colors : dictionnary mapping the color keys of the sections to background colors
+    """
+    def __init__(self, name, sections, colors=None):
+        self.name = name
+        self.sections = sections
+        self.colors = colors or {}
+        self.stats = {}
+
+    @property
+    def headers(self):
+        """Return the headers of the export."""
+        return [column.header for column in self.sections[0].columns]
+
+    @property
+    def expected_queries(self):
+        """Return the number of queries the export should need: one per section."""
+        return len(self.sections)
+
+    def rows(self):
+        """Yield (cells, color key) for every row, header included, and record stats."""
+        counter = QueryCounter()
+        start = time.monotonic()
+        count = 0
+        with connection.execute_wrapper(counter):
+            yield self.headers, None
+            for section in self.sections:
+                for row in section.rows():
+                    count += 1
+                    yield row
+        self.stats = {
+            "rows": count,
+            "queries": counter.queries,
+            "sql_time": counter.duration,
+            "time": time.monotonic() - start,
+        }
+        log = logger.warning if counter.queries > self.expected_queries else logger.info
+        log(
+            "Export %s: %d rows, %d queries (%.3fs SQL), %.3fs",
+            self.name, count, counter.queries, counter.duration, self.stats["time"]
+        )
+
+    def response(self, file_format="xlsx", filename=None):
+        """Return a response containing the export in file_format (csv, xlsx or ods)."""
+        if file_format not in FORMATS:
+            file_format = "xlsx"
+        filename = (filename or self.name) + "." + file_format
+        if file_format == "csv":
+            return streaming_csv_response((cells for cells, _ in self.rows()), filename)
+        output = tempfile.TemporaryFile()
+        self.write(output, file_format)
+        output.seek(0)
+        response = FileResponse(output, content_type=FORMATS[file_format])
+        response['Content-Disposition'] = 'attachment; filename="' + filename + '"'
+        response['X-Export-Queries'] = self.stats["queries"]
+        response['X-Export-Time'] = "%.3f" % self.stats["time"]
+        return response
+
+    def write(self, output, file_format="xlsx"):
+        """Write the export in file_format (csv, xlsx or ods) into output, a binary file."""
+        if file_format == "csv":
+            self.write_csv(output)
+        elif file_format == "ods":
+            self.write_ods(output)
+        else:
+            self.write_xlsx(output)
+
+    def write_csv(self, output):
+        """Write the export in csv format into output, like streaming_csv_response."""
+        writer = csv.writer(Echo(), delimiter=";")
+        output.write("\ufeff".encode())
+        for cells, _ in self.rows():
+            output.write(writer.writerow(cells).encode())
+
+    def write_xlsx(self, output):
+        """Write the export in xlsx format into output, keeping only one row in memory."""
+        workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+        formats = {
+            key: workbook.add_format({"bg_color": color}) for key, color in self.colors.items()
+        }
+        worksheet = workbook.add_worksheet()
+        for i, (cells, color) in enumerate(self.rows()):
+            worksheet.write_row(i, 0, cells, formats.get(color))
+        workbook.close()
+
+    def write_ods(self, output):
+        """Write the export in ods format into output, streaming content.xml."""
+        styles = {key: "row" + str(i) for i, key in enumerate(self.colors)}
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(
+                zipfile.ZipInfo("mimetype"),
+                FORMATS["ods"].encode()
+            )
+            archive.writestr("META-INF/manifest.xml", ODS_MANIFEST)
+            with archive.open("content.xml", "w") as content:
+                content.write(ODS_CONTENT_START.encode())
+                for key, style in styles.items():
+                    content.write((
+                        '<style:style style:name="' + style + '" style:family="table-cell">'
+                        '<style:table-cell-properties fo:background-color='
+                        + quoteattr(self.colors[key]) + '/></style:style>'
+                    ).encode())
+                content.write(ODS_BODY_START.encode())
+                for cells, color in self.rows():
+                    style = styles.get(color)
+                    row = "<table:table-row>"
+                    for cell in cells:
+                        row += '<table:table-cell office:value-type="string"'
+                        if style:
+                            row += ' table:style-name="' + style + '"'
+                        row += "><text:p>" + escape(str(cell)) + "</text:p></table:table-cell>"
+                    content.write((row + "</table:table-row>").encode())
+                content.write(ODS_CONTENT_END.encode())
+
+
+ODS_MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" \
+manifest:version="1.2">
+<manifest:file-entry manifest:full-path="/" manifest:version="1.2" \
+manifest:media-type="application/vnd.oasis.opendocument.spreadsheet"/>
+<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+</manifest:manifest>"""
+
+ODS_CONTENT_START = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" \
+xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" \
+xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" \
+xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" \
+xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0" office:version="1.2">
+<office:automatic-styles>"""
+
+ODS_BODY_START = """</office:automatic-styles>
+<office:body><office:spreadsheet><table:table table:name="Export">"""
+
+ODS_CONTENT_END = """</table:table></office:spreadsheet></office:body></office:document-content>"""
@@ -0,0 +1,166 @@
+"""Delivery of the uploaded files (documents and maps) by the download views.
+
+The ETag of a file is the hash of its content, kept in the default cache by path,
+size and modification time: a browser downloading again the same file gets a 304.
+
+If SENDFILE_BACKEND is set, the file itself is sent by the front-end server:
+"x-accel-redirect" for nginx, whose internal location SENDFILE_URL (MEDIA_URL by
+default) serves MEDIA_ROOT, or "x-sendfile" for Apache with mod_xsendfile. Otherwise
+the file is streamed by Django, a single byte range if the request asks for it (to
+resume a download or to read a PDF page by page).
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+HASH_BLOCK_SIZE = 1 << 16
+
+
+def file_hash(path, stat=None):
+    """Return the SHA-1 of the content of the file path, cached by size and mtime."""
+    stat = stat or os.stat(path)
+    key = "aloes.files.%s" % hashlib.md5(
+        ("%s:%d:%d" % (path, stat.st_size, stat.st_mtime_ns)).encode()
+    ).hexdigest()
+    digest = cache.get(key)
+    if digest is None:
+        content_hash = hashlib.sha1()
+        with open(path, 'rb') as content:
+            for block in iter(lambda: content.read(HASH_BLOCK_SIZE), b''):
+                content_hash.update(block)
+        digest = content_hash.hexdigest()
+        cache.set(key, digest, None)
+    return digest
+
+
+def parse_range(header, size):
+    """Return (start, end) of the single byte range asked by header, or None."""
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last bytes of the file.
+        if not int(last):
+            raise ValueError("Unsatisfiable range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+class FileRange:
+    """File-like object reading the bytes start to end (included) of a file."""
+    def __init__(self, file, start, end):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        """Read at most size bytes of the range."""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+
+def content_disposition(filename, inline):
+    """Return the Content-Disposition header of filename."""
+    disposition = 'inline' if inline else 'attachment'
+    try:
+        filename.encode('ascii')
+        return '%s; filename="%s"' % (disposition, filename.replace('"', ''))
+    except UnicodeEncodeError:
+        return "%s; filename*=utf-8''%s" % (disposition, quote(filename))
+
+
+def sendfile(path, name):
+    """Return a response asking the front-end server to send path (name in MEDIA_ROOT)."""
+    backend = getattr(settings, 'SENDFILE_BACKEND', None)
+    if backend == "x-accel-redirect":
+        response = HttpResponse()
+        url = getattr(settings, 'SENDFILE_URL', settings.MEDIA_URL)
+        response['X-Accel-Redirect'] = quote(url + name)
+    elif backend == "x-sendfile":
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+    else:
+        return None
+    return response
+
+
+def serve_file(request, field_file, inline=True):
+    """
+    Return the response sending field_file, a FieldFile of FileSystemStorage.
+
+    Raise Http404 if the field is empty or the file is missing.
+    """
+    if not field_file:
+        raise Http404
+    return serve_path(request, field_file.path, field_file.name, inline)
+
+
+def serve_path(request, path, name, inline=True):
+    """
+    Return the response sending the file path, whose name is relative to MEDIA_ROOT.
+
+    Raise Http404 if the file is missing.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404
+    filename = os.path.basename(name)
+    etag = '"%s"' % file_hash(path, stat)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = sendfile(path, name) or stream_file(request, path, stat.st_size, etag)
+        content_type, _ = mimetypes.guess_type(filename)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['Content-Disposition'] = content_disposition(filename, inline)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    # The address of a file does not change when the file is replaced: revalidate.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def stream_file(request, path, size, etag):
+    """Return a FileResponse of path, or of the byte range asked by the request."""
+    response_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and request.META.get('HTTP_IF_RANGE', etag) == etag:
+        try:
+            response_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+    file = open(path, 'rb')
+    if response_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = response_range
+        response = FileResponse(FileRange(file, start, end), status=206)
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
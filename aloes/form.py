@@ -1,10 +1,77 @@
 """Forms of aloes app."""
 from django import forms
+from django.core.exceptions import FieldDoesNotExist
+from django.shortcuts import get_object_or_404
 
 from .models import GeneralPreferences
 
 
-class HomeTextEditForm(forms.ModelForm):
+def display_value(instance, field):
+    """Return the value of the model field of instance as shown to the user."""
+    value = getattr(instance, field.name)
+    if field.choices:
+        return getattr(instance, 'get_%s_display' % field.name)()
+    if isinstance(value, bool):
+        return "Oui" if value else "Non"
+    if value is None:
+        return ""
+    return str(value)
+
+
+class VersionedModelForm(forms.ModelForm):
+    """
+    ModelForm of a VersionedModel, carrying the version of the row it displays.
+
+    save raises VersionConflict if the row was saved by someone else since the form was
+    displayed. rebase then gives the form of the current row with the submitted values,
+    to be checked and sent again (see aloes.utils.conflict_form).
+    """
+    version = forms.IntegerField(widget=forms.HiddenInput, min_value=0, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['version'].initial = self.instance.version
+        self.conflicts = []
+
+    def save(self, commit=True):
+        if not commit or self.instance._state.adding:
+            return super().save(commit)
+        version = self.cleaned_data.get('version')
+        self.instance.save(
+            expected_version=self.instance.version if version is None else version
+        )
+        self._save_m2m()
+        return self.instance
+
+    def rebase(self):
+        """
+        Return the form bound to the submitted data on the current row, with the version
+        of this row and conflicts: the (label, submitted value, current value) of the
+        fields whose values differ. Raise Http404 if the row was deleted.
+        """
+        current = get_object_or_404(type(self.instance), pk=self.instance.pk)
+        data = self.data.copy()
+        data[self.add_prefix('version')] = current.version
+        form = type(self)(
+            data, self.files, instance=current, prefix=self.prefix, initial=self.initial
+        )
+        for name, form_field in self.fields.items():
+            try:
+                field = self.instance._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.many_to_many:
+                continue
+            if field.value_from_object(self.instance) != field.value_from_object(current):
+                form.conflicts.append((
+                    form_field.label or field.verbose_name,
+                    display_value(self.instance, field),
+                    display_value(current, field),
+                ))
+        return form
+
+
+class HomeTextEditForm(VersionedModelForm):
     """Display a form to edit home text."""
     class Meta:
         model = GeneralPreferences
@@ -0,0 +1,77 @@
+"""Copy of the data of the home page, the most visited page of the intranet.
+
+Each process keeps the home texts and the active documents in memory, with their
+version (see aloes.versions), bumped when GeneralPreferences or a Document is saved
+or deleted (signals connected in AloesConfig.ready). The data is read once
+per request, shared by the conditional checks and the view. The version is the source
+of the ETag, with the user, and the time of its bump the Last-Modified date of the
+page: the processes give the same ones, and a browser coming back to an unchanged
+home page gets a 304 without any query.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.db import transaction
+
+from documents.models import Document
+
+from . import versions
+from .models import GeneralPreferences
+
+VERSION = "aloes.home"
+
+COPY = {}
+
+
+def home_data(request):
+    """Return the home texts, the active documents and the version they were read at."""
+    if not hasattr(request, '_home_data'):
+        # Read before the rows: a change made meanwhile makes them stale again.
+        version = versions.current(VERSION)
+        data = COPY.get("data")
+        if data is None or data["version"] != version:
+            preferences = GeneralPreferences.objects.first()
+            data = {
+                "home_text": preferences.home_text if preferences else "",
+                "english_home_text": preferences.english_home_text if preferences else "",
+                "documents": list(Document.objects.filter(active=True).order_by('pk')),
+                "version": version,
+            }
+            COPY["data"] = data
+        request._home_data = data # pylint: disable=protected-access
+    return request._home_data # pylint: disable=protected-access
+
+
+def invalidate():
+    """Make the home page stale in every process, now and at commit."""
+    versions.bump(VERSION)
+    # A visit during the transaction would keep the former texts.
+    transaction.on_commit(lambda: versions.bump(VERSION))
+
+
+def invalidate_sender(sender, **kwargs): # pylint: disable=unused-argument
+    """Receiver of post_save and post_delete."""
+    invalidate()
+
+
+def has_messages(request):
+    """Return True if messages are waiting to be shown (the page must be rendered)."""
+    return bool(len(messages.get_messages(request)))
+
+
+def last_modified(request):
+    """Return the Last-Modified date of the home page, or None if it must be rendered."""
+    if has_messages(request):
+        return None
+    return home_data(request)["version"].updated_at
+
+
+def etag(request):
+    """Return the ETag of the home page, or None if it must be rendered."""
+    if has_messages(request):
+        return None
+    user = request.user
+    source = "%s:%s:%s:%s" % (
+        home_data(request)["version"].token, user.pk, user.is_staff, user.is_superuser
+    )
+    return hashlib.md5(source.encode()).hexdigest()
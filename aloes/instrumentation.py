@@ -0,0 +1,179 @@
+"""Per-request SQL instrumentation, enabled with the SQL_INSTRUMENTATION setting.
+
+The middleware records the queries of each request with an execute wrapper: their
+number, their total duration, and the queries repeated with different parameters.
+A query repeated at least SQL_INSTRUMENTATION_THRESHOLD times (5 by default) is the
+sign of an N+1 pattern: a query run for each object of a list, like a foreign key
+read in a loop. The first line of the project which ran it is recorded to find it.
+
+Each request is written to the aloes.sql logger as a JSON line (a warning if an N+1
+pattern was found) and aggregated by view in ViewStats, displayed by the sqlStats page.
+When SQL_INSTRUMENTATION is False, the middleware removes itself at startup and costs
+nothing.
+
+Queries run while a streaming response is sent are not recorded.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ViewStats
+
+logger = logging.getLogger("aloes.sql")
+
+IN_CLAUSE = re.compile(r"IN \((?:%s, )*%s\)")
+
+LIBRARIES = ("site-packages", "dist-packages")
+
+
+def query_shape(sql):
+    """Return sql with its lists of parameters collapsed, to group similar queries."""
+    return IN_CLAUSE.sub("IN (...)", sql)
+
+
+def caller():
+    """Return "file:line (function)" of the first frame of the project outside this module."""
+    frame = sys._getframe(2) # pylint: disable=protected-access
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(settings.BASE_DIR) and filename != __file__ and
+                not any(library in filename for library in LIBRARIES)):
+            return "%s:%d (%s)" % (
+                os.path.relpath(filename, settings.BASE_DIR), frame.f_lineno, frame.f_code.co_name
+            )
+        frame = frame.f_back
+    return ""
+
+
+class QueryRecorder:
+    """Execute wrapper recording the number, the duration and the shapes of queries."""
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.time += duration
+            shape = query_shape(sql)
+            if shape in self.shapes:
+                stats = self.shapes[shape]
+                stats["count"] += 1
+                stats["time"] += duration
+                if not stats["location"]:
+                    stats["location"] = caller()
+            else:
+                # The location is only looked for when the query is repeated.
+                self.shapes[shape] = {"sql": shape, "count": 1, "time": duration, "location": ""}
+
+    def duplicates(self):
+        """Return the queries run more than once, the most repeated first."""
+        return sorted(
+            (dict(stats, time=round(stats["time"], 6))
+             for stats in self.shapes.values() if stats["count"] > 1),
+            key=lambda stats: -stats["count"]
+        )
+
+
+def save_stats(view, path, record):
+    """Aggregate the record of a request into the ViewStats of view."""
+    stats = ViewStats.objects.filter(view=view)
+    n_plus_one = int(bool(record["n_plus_one"]))
+    updated = stats.update(
+        requests=F('requests') + 1,
+        queries=F('queries') + record["queries"],
+        sql_time=F('sql_time') + record["sql_time"],
+        duration=F('duration') + record["duration"],
+        max_sql_time=Greatest(F('max_sql_time'), record["sql_time"]),
+        max_duration=Greatest(F('max_duration'), record["duration"]),
+        n_plus_one=F('n_plus_one') + n_plus_one,
+        updated_at=timezone.now()
+    )
+    worst = {
+        "max_queries": record["queries"],
+        "worst_path": path[:1000],
+        "worst_duplicates": json.dumps(record["duplicates"]),
+    }
+    if updated:
+        stats.filter(max_queries__lt=record["queries"]).update(**worst)
+        return
+    try:
+        with transaction.atomic():
+            ViewStats.objects.create(
+                view=view,
+                requests=1,
+                queries=record["queries"],
+                sql_time=record["sql_time"],
+                duration=record["duration"],
+                max_sql_time=record["sql_time"],
+                max_duration=record["duration"],
+                n_plus_one=n_plus_one,
+                **worst
+            )
+    except IntegrityError:
+        # Created by a concurrent request in the meantime.
+        save_stats(view, path, record)
+
+
+class SQLInstrumentationMiddleware:
+    """Record the queries of each request (see the module documentation)."""
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'SQL_INSTRUMENTATION_THRESHOLD', 5)
+        self.ignored = tuple(
+            url for url in (settings.STATIC_URL, settings.MEDIA_URL) if url
+        )
+
+    def __call__(self, request):
+        if self.ignored and request.path.startswith(self.ignored):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else "(non résolue)"
+        duplicates = recorder.duplicates()
+        record = {
+            "method": request.method,
+            "path": request.get_full_path(),
+            "view": view,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "sql_time": round(recorder.time, 6),
+            "duration": round(duration, 6),
+            "n_plus_one": [
+                stats for stats in duplicates if stats["count"] >= self.threshold
+            ],
+            "duplicates": duplicates[:10],
+        }
+        logger.log(
+            logging.WARNING if record["n_plus_one"] else logging.INFO,
+            json.dumps(record, ensure_ascii=False)
+        )
+        try:
+            save_stats(view, record["path"], record)
+        except DatabaseError:
+            logger.exception("Unable to save the SQL statistics of %s", view)
+        return response
@@ -0,0 +1,306 @@
+"""Database-backed queue running slow tasks (documents, exports, backups) in the background.
+
+Tasks are functions registered with the task decorator in the tasks module of an app.
+They receive the job and the arguments given to enqueue, and return None or a Result
+whose content is written in JOBS_ROOT and downloaded from the status page of the job.
+A task may also set job.summary, shown on this page once the job is done.
+
+Jobs are run by the run_jobs command, each one in a child process so that it can be
+stopped when it exceeds its timeout. No broker is needed: workers claim pending jobs
+with a conditional UPDATE on the Job table.
+
+Settings (all optional):
+    JOBS_ROOT : directory of the results (jobs_files in the project by default)
+    JOBS_QUEUES : maximum number of running jobs per queue, across all workers
+    JOBS_ASYNC : set to False to run jobs in the request (development without worker)
+    JOBS_RETENTION_DAYS : finished jobs and their results are deleted after this delay
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+from .profiling import active_mode, profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUES = {
+    "default": 2,
+    "documents": 2,
+    "exports": 1,
+    "backup": 1,
+}
+
+Task = namedtuple('Task', ['function', 'queue', 'max_attempts', 'timeout', 'retry_delay'])
+
+Result = namedtuple('Result', ['filename', 'content_type', 'content', 'inline'])
+Result.__new__.__defaults__ = (False,)
+Result.__doc__ = """
+Result of a task.
+
+content : bytes, an iterable of bytes written as they are produced, or a function
+    receiving the binary file to write into
+inline : True to display the file in the browser instead of downloading it
+"""
+
+TASKS = {}
+
+
+class JobError(Exception):
+    """Raised by a task failing for a reason that retrying would not fix."""
+
+
+def task(name, queue="default", max_attempts=1, timeout=300, retry_delay=60):
+    """
+    Register the decorated function as the task name.
+
+    max_attempts : number of runs before the job is marked as failed
+    timeout : duration in seconds after which the job is stopped (and retried)
+    retry_delay : delay in seconds before a retry, multiplied by the number of attempts
+    """
+    def register(function):
+        TASKS[name] = Task(function, queue, max_attempts, timeout, retry_delay)
+        return function
+    return register
+
+
+def autodiscover():
+    """Import the tasks module of every installed app to register their tasks."""
+    autodiscover_modules('tasks')
+
+
+def jobs_root():
+    """Return the directory where the results of jobs are written."""
+    return getattr(settings, 'JOBS_ROOT', os.path.join(settings.BASE_DIR, 'jobs_files'))
+
+
+def result_file(job):
+    """Return the absolute path of the result of job."""
+    return os.path.join(jobs_root(), job.result_path)
+
+
+def enqueue(name, label, user=None, **arguments):
+    """
+    Create a job running the task name with arguments (JSON serializable) and return it.
+
+    The job is run immediately if JOBS_ASYNC is False. It is profiled if it is queued
+    by a profiled request (see aloes.profiling).
+    """
+    registered = TASKS[name]
+    job = Job.objects.create(
+        task=name,
+        label=label,
+        arguments=json.dumps(arguments),
+        queue=registered.queue,
+        user=user if user is not None and user.is_authenticated else None,
+        max_attempts=registered.max_attempts,
+        timeout=registered.timeout,
+        profile=active_mode(),
+    )
+    if not getattr(settings, 'JOBS_ASYNC', True):
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+        run_job(job.pk)
+        job.refresh_from_db()
+    return job
+
+
+def claim_next():
+    """
+    Mark the oldest runnable job as running and return it, or None if there is none.
+
+    Queues having reached their limit of running jobs are skipped. The running jobs of
+    the queue are counted and the job is claimed in one transaction holding the lock of
+    the active jobs of the queue (SQLite serializes writing transactions anyway), so that
+    concurrent workers can not exceed the limit. The conditional UPDATE guarantees that
+    a job is claimed by a single worker.
+    """
+    limits = dict(DEFAULT_QUEUES, **getattr(settings, 'JOBS_QUEUES', {}))
+    running = Job.objects.filter(status=Job.RUNNING).values('queue').annotate(count=Count('pk'))
+    full = [
+        row['queue'] for row in running if row['count'] >= limits.get(row['queue'], 1)
+    ]
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        Q(run_after__isnull=True) | Q(run_after__lte=now),
+        status=Job.PENDING
+    ).exclude(queue__in=full).order_by('created_at').values_list('pk', 'queue')
+    for pk, queue in candidates[:10]:
+        with transaction.atomic():
+            active = Job.objects.select_for_update().filter(
+                queue=queue, status__in=(Job.PENDING, Job.RUNNING)
+            )
+            statuses = list(active.values_list('status', flat=True))
+            if statuses.count(Job.RUNNING) >= limits.get(queue, 1):
+                continue
+            claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+                status=Job.RUNNING,
+                started_at=now,
+                finished_at=None,
+                attempts=F('attempts') + 1
+            )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def write_result(job, result):
+    """Write the content of result in JOBS_ROOT and record it on job."""
+    os.makedirs(jobs_root(), exist_ok=True)
+    job.result_path = str(job.pk) + "-" + os.path.basename(result.filename)
+    path = result_file(job)
+    with open(path + ".part", "wb") as output:
+        if isinstance(result.content, bytes):
+            output.write(result.content)
+        elif callable(result.content):
+            result.content(output)
+        else:
+            for chunk in result.content:
+                output.write(chunk)
+    os.replace(path + ".part", path)
+    job.result_name = result.filename
+    job.result_type = result.content_type
+    job.result_inline = result.inline
+
+
+def fail(job, error, retry=True):
+    """Record the failure of job, and put it back in the queue if it can be retried."""
+    job.error = error
+    job.finished_at = timezone.now()
+    registered = TASKS.get(job.task)
+    if retry and registered and job.attempts < job.max_attempts:
+        job.status = Job.PENDING
+        job.run_after = job.finished_at + timedelta(seconds=registered.retry_delay * job.attempts)
+        logger.warning("Job %d (%s) failed, retry %d: %s", job.pk, job.task, job.attempts, error)
+    else:
+        job.status = Job.FAILED
+        logger.error("Job %d (%s) failed: %s", job.pk, job.task, error)
+    job.save()
+
+
+def run_job(pk):
+    """Run the job pk, already marked as running, in the current process."""
+    job = Job.objects.get(pk=pk)
+    try:
+        if job.task not in TASKS:
+            raise JobError("Tâche inconnue : " + job.task)
+        if job.profile:
+            with profile("job-%d-%s" % (job.pk, job.task), job.profile):
+                result = TASKS[job.task].function(job, **json.loads(job.arguments))
+        else:
+            result = TASKS[job.task].function(job, **json.loads(job.arguments))
+        if result is not None:
+            write_result(job, result)
+    except JobError as error:
+        fail(job, str(error), retry=False)
+    except Exception: # pylint: disable=broad-except
+        fail(job, traceback.format_exc(limit=5))
+    else:
+        job.status = Job.DONE
+        job.error = ""
+        job.finished_at = timezone.now()
+        job.save()
+        logger.info("Job %d (%s) done in %.3fs", job.pk, job.task, job.duration)
+
+
+def run_child(pk):
+    """Entry point of the process running the job pk."""
+    try:
+        run_job(pk)
+    finally:
+        connections.close_all()
+
+
+def purge(days=None):
+    """Delete the finished jobs older than days (JOBS_RETENTION_DAYS) and their results."""
+    days = getattr(settings, 'JOBS_RETENTION_DAYS', 7) if days is None else days
+    old = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        finished_at__lt=timezone.now() - timedelta(days=days)
+    )
+    for job in old.exclude(result_path=""):
+        try:
+            os.remove(result_file(job))
+        except FileNotFoundError:
+            pass
+    return old.delete()[0]
+
+
+def recover_stale():
+    """Put back in the queue the running jobs whose worker died."""
+    now = timezone.now()
+    for job in Job.objects.filter(status=Job.RUNNING):
+        if job.started_at + timedelta(seconds=job.timeout + 60) < now:
+            fail(job, "Le processus exécutant la tâche a disparu.")
+
+
+class Worker:
+    """Run the queued jobs, at most concurrency at the same time, each in a child process."""
+    def __init__(self, concurrency=2, poll=1.0):
+        self.concurrency = concurrency
+        self.poll = poll
+        self.processes = {}
+        self.context = multiprocessing.get_context("fork")
+
+    def start(self, job):
+        """Start a child process running job."""
+        # Children must open their own database connections.
+        connections.close_all()
+        process = self.context.Process(target=run_child, args=(job.pk,))
+        process.start()
+        self.processes[job.pk] = (process, time.monotonic() + job.timeout)
+        logger.info("Job %d (%s) started, attempt %d", job.pk, job.task, job.attempts)
+
+    def reap(self):
+        """Forget the finished processes and stop the ones exceeding their timeout."""
+        for pk, (process, deadline) in list(self.processes.items()):
+            if process.is_alive():
+                if time.monotonic() < deadline:
+                    continue
+                process.terminate()
+                process.join(5)
+                if process.is_alive():
+                    process.kill()
+                process.join()
+                job = Job.objects.get(pk=pk)
+                fail(job, "Durée maximale de %d s dépassée." % job.timeout)
+            else:
+                process.join()
+                job = Job.objects.get(pk=pk)
+                if job.status == Job.RUNNING:
+                    fail(job, "Le processus s'est arrêté avec le code %s." % process.exitcode)
+            del self.processes[pk]
+
+    def run(self, once=False):
+        """Run jobs until interrupted, or until the queue is empty if once is True."""
+        recover_stale()
+        purge()
+        last_purge = time.monotonic()
+        while True:
+            self.reap()
+            job = None
+            while len(self.processes) < self.concurrency:
+                job = claim_next()
+                if job is None:
+                    break
+                self.start(job)
+            if once and job is None and not self.processes:
+                return
+            if time.monotonic() - last_purge > 3600:
+                purge()
+                last_purge = time.monotonic()
+            time.sleep(self.poll)
@@ -16,5 +16,44 @@ TIME_ZONE = 'Europe/Paris'
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
+# Uploaded files sent by the front-end server (see aloes/files.py): "x-accel-redirect"
+# (nginx, internal location SENDFILE_URL serving MEDIA_ROOT) or "x-sendfile" (Apache)
+SENDFILE_BACKEND = None
+SENDFILE_URL = '/protected-media/'
+
 DBBACKUP_STORAGE = 'django.core.files.storage.FileSystemStorage'
 DBBACKUP_STORAGE_OPTIONS = {'location': '/var/backups/aloes/'}
+# Compressed backups kept by the gestion.backup job (see gestion/backups.py): the last
+# one of each of the last days, weeks and months having a backup
+BACKUP_RETENTION = {'daily': 7, 'weekly': 4, 'monthly': 12}
+
+# Background jobs (see aloes/jobs.py), run by "python manage.py run_jobs"
+JOBS_ROOT = '/var/lib/aloes/jobs/'
+JOBS_QUEUES = {'documents': 2, 'exports': 1, 'backup': 1}
+
+# Versions of the data kept in memory by each process (see aloes/versions.py), shared
+# by the processes like JOBS_ROOT
+VERSIONS_ROOT = '/var/lib/aloes/versions/'
+
+# Maximum number of results of the autocomplete fields (see gestion/autocomplete.py)
+AUTOCOMPLETE_LIMIT = 20
+
+# Profiles of requests asked by staff users with ?profile=1 (see aloes/profiling.py)
+PROFILES_ROOT = '/var/lib/aloes/profiles/'
+
+# SQL instrumentation of the requests (see aloes/instrumentation.py)
+SQL_INSTRUMENTATION = False
+SQL_INSTRUMENTATION_THRESHOLD = 5
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'sql': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': '/var/log/aloes/sql.log',
+        },
+    },
+    'loggers': {
+        'aloes.sql': {'handlers': ['sql'], 'level': 'INFO', 'propagate': False},
+    },
+}
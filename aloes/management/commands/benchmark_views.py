@@ -0,0 +1,64 @@
+"""Command measuring the duration and the number of queries of the main views."""
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from aloes.benchmark import compare, run
+
+
+class Command(BaseCommand):
+    """Request the main views as a staff user, print the measures and save them in JSON."""
+    help = "Benchmark the main views (duration and number of queries) and save the results in JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Measured requests per view")
+        parser.add_argument('--user', help="Username of the staff user (first superuser by default)")
+        parser.add_argument(
+            '--only',
+            action='append',
+            help="Only measure the views whose name starts with this prefix (repeatable)"
+        )
+        parser.add_argument('--output', default='benchmark.json', help="JSON file of the results")
+        parser.add_argument('--compare', help="JSON file of a previous run to compare with")
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user'], is_staff=True).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError("Aucun utilisateur administrateur trouvé")
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as previous_file:
+                    previous = json.load(previous_file)
+            except (OSError, ValueError) as error:
+                raise CommandError("Impossible de lire " + options['compare'] + " : " + str(error))
+        self.stdout.write("%-40s %6s %8s %10s %10s" % (
+            "Vue", "statut", "requêtes", "médiane ms", "max ms"
+        ))
+        report = run(user, options['repeat'], options['only'], self.log_result)
+        if not report["results"]:
+            raise CommandError(
+                "Aucune chambre occupée : générer une résidence avec make_dataset"
+            )
+        with open(options['output'], "w") as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS("Résultats enregistrés dans " + options['output']))
+        if previous is not None:
+            self.stdout.write("%-40s %12s %12s %8s %8s" % (
+                "Vue", "avant ms", "après ms", "avant", "après"
+            ))
+            for name, old_time, new_time, old_queries, new_queries in compare(report, previous):
+                self.stdout.write("%-40s %12.2f %12.2f %8d %8d" % (
+                    name, old_time, new_time, old_queries, new_queries
+                ))
+
+    def log_result(self, result):
+        """Print the measures of a view."""
+        self.stdout.write("%-40s %6d %8d %10.2f %10.2f" % (
+            result["name"], result["status"], result["queries"], result["median_ms"],
+            result["max_ms"]
+        ))
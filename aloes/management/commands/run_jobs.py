@@ -0,0 +1,35 @@
+"""Command running the background jobs (see aloes.jobs)."""
+from django.core.management.base import BaseCommand
+
+from aloes.jobs import Worker
+
+
+class Command(BaseCommand):
+    """Run the queued jobs until interrupted."""
+    help = "Run the background jobs (documents, exports, backups)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=2,
+            help="Maximum number of jobs run at the same time by this worker"
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=1.0,
+            help="Delay in seconds between two checks of the queue"
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Stop when there is no job left to run"
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(options['concurrency'], options['poll'])
+        try:
+            worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du worker")
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aloes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100, verbose_name='Tâche')),
+                ('label', models.CharField(max_length=255, verbose_name='Description')),
+                ('arguments', models.TextField(default='{}', verbose_name='Arguments (JSON)')),
+                ('queue', models.CharField(db_index=True, default='default', max_length=50)),
+                ('status', models.CharField(choices=[('P', 'En attente'), ('R', 'En cours'), ('D', 'Terminé'), ('F', 'Échec')], db_index=True, default='P', max_length=1, verbose_name='État')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('run_after', models.DateTimeField(blank=True, null=True, verbose_name='Pas avant')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Commencé le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Essais')),
+                ('max_attempts', models.PositiveIntegerField(default=1, verbose_name='Essais maximum')),
+                ('timeout', models.PositiveIntegerField(default=300, verbose_name='Durée maximale (s)')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('result_path', models.CharField(blank=True, max_length=255)),
+                ('result_name', models.CharField(blank=True, max_length=255, verbose_name='Fichier')),
+                ('result_type', models.CharField(blank=True, max_length=255)),
+                ('result_inline', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aloes', '0002_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=255, unique=True, verbose_name='Vue')),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name='Requêtes HTTP')),
+                ('queries', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL')),
+                ('sql_time', models.FloatField(default=0, verbose_name='Temps SQL (s)')),
+                ('duration', models.FloatField(default=0, verbose_name='Durée (s)')),
+                ('max_queries', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL maximum')),
+                ('max_sql_time', models.FloatField(default=0, verbose_name='Temps SQL maximum (s)')),
+                ('max_duration', models.FloatField(default=0, verbose_name='Durée maximum (s)')),
+                ('n_plus_one', models.PositiveIntegerField(default=0, verbose_name='Requêtes N+1')),
+                ('worst_path', models.CharField(blank=True, max_length=1000, verbose_name='Pire requête')),
+                ('worst_duplicates', models.TextField(default='[]', verbose_name='Requêtes répétées (JSON)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+            ],
+            options={
+                'verbose_name': "Statistiques SQL d'une vue",
+                'ordering': ['-max_queries'],
+            },
+        ),
+    ]
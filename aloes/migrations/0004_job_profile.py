@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aloes', '0003_viewstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='profile',
+            field=models.CharField(blank=True, max_length=10, verbose_name='Profilage'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aloes', '0004_job_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generalpreferences',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
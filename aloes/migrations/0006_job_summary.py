@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aloes', '0005_generalpreferences_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='summary',
+            field=models.TextField(blank=True, verbose_name='Résumé'),
+        ),
+    ]
@@ -1,10 +1,76 @@
 """
 Model of aloes app
 """
-from django.db import models
+from django.db import models, transaction
 
 
-class GeneralPreferences(models.Model):
+class VersionConflict(Exception):
+    """The row of a VersionedModel was saved by someone else since it was read."""
+    def __init__(self, instance):
+        super().__init__("%s was saved meanwhile" % instance._meta.label)
+        self.instance = instance
+
+
+class VersionedModel(models.Model):
+    """
+    Abstract model whose rows carry a version number, incremented by each save.
+
+    A form displaying a row carries its version (see aloes.form.VersionedModelForm),
+    and save(expected_version=...) updates the row only if it still has this version,
+    with a single conditional UPDATE: two people editing the same row do not overwrite
+    each other, and nothing is locked or written when a form is displayed. Code writing
+    rows without save (queryset.update, bulk_update) must increment version itself.
+    """
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, expected_version=None, **kwargs):  # pylint: disable=arguments-differ
+        """
+        Save the instance. If expected_version is given, raise VersionConflict if the
+        row was saved since this version (nothing is written then).
+        """
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        if expected_version is None:
+            # Incremented by the database, to count the saves made meanwhile, then read
+            # back so that the instance can be saved again with expected_version.
+            self.version = models.F('version') + 1
+            super().save(*args, **kwargs)
+            self.refresh_from_db(fields=['version'])
+            return
+        self.version = expected_version + 1
+        self._expected_version = expected_version
+        try:
+            # A savepoint: the transaction of the request stays usable after a conflict.
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except VersionConflict:
+            self.version = expected_version
+            raise
+        finally:
+            self.__dict__.pop('_expected_version', None)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected_version = self.__dict__.pop('_expected_version', None)
+        if expected_version is None:
+            return super()._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update
+            )
+        updated = super()._do_update(
+            base_qs.filter(version=expected_version),
+            using, pk_val, values, update_fields, forced_update
+        )
+        if not updated:
+            raise VersionConflict(self)
+        return updated
+
+
+class GeneralPreferences(VersionedModel):
     """
     Store general preferences (home text in french and english)
     """
@@ -14,3 +80,114 @@ class GeneralPreferences(models.Model):
         help_text="Ce texte sera affiché sur la page d'accueil, avant les documents"
     )
     english_home_text = models.TextField(blank=True, verbose_name="Texte d'accueil (anglais)")
+
+
+class Job(models.Model):
+    """
+    A task run in the background by the run_jobs command (see aloes.jobs).
+
+    The result of the task, if any, is written in a file of JOBS_ROOT.
+    """
+    PENDING = "P"
+    RUNNING = "R"
+    DONE = "D"
+    FAILED = "F"
+    STATUS_CHOICES = (
+        (PENDING, "En attente"),
+        (RUNNING, "En cours"),
+        (DONE, "Terminé"),
+        (FAILED, "Échec"),
+    )
+    task = models.CharField(max_length=100, verbose_name="Tâche")
+    label = models.CharField(max_length=255, verbose_name="Description")
+    arguments = models.TextField(default="{}", verbose_name="Arguments (JSON)")
+    queue = models.CharField(max_length=50, default="default", db_index=True)
+    status = models.CharField(
+        max_length=1,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+        verbose_name="État"
+    )
+    user = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Demandé par"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    run_after = models.DateTimeField(null=True, blank=True, verbose_name="Pas avant")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Commencé le")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Essais")
+    max_attempts = models.PositiveIntegerField(default=1, verbose_name="Essais maximum")
+    timeout = models.PositiveIntegerField(default=300, verbose_name="Durée maximale (s)")
+    error = models.TextField(blank=True, verbose_name="Erreur")
+    summary = models.TextField(blank=True, verbose_name="Résumé")
+    result_path = models.CharField(max_length=255, blank=True)
+    result_name = models.CharField(max_length=255, blank=True, verbose_name="Fichier")
+    result_type = models.CharField(max_length=255, blank=True)
+    result_inline = models.BooleanField(default=False)
+    profile = models.CharField(max_length=10, blank=True, verbose_name="Profilage")
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.label or self.task
+
+    @property
+    def finished(self):
+        """Return True if the job will not run anymore."""
+        return self.status in (self.DONE, self.FAILED)
+
+    @property
+    def duration(self):
+        """Return the duration of the last run in seconds, or None."""
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
+
+class ViewStats(models.Model):
+    """
+    SQL statistics of a view, aggregated by the SQL instrumentation middleware
+    (see aloes.instrumentation).
+
+    The worst_* fields describe the request of the view which ran the most queries.
+    """
+    view = models.CharField(max_length=255, unique=True, verbose_name="Vue")
+    requests = models.PositiveIntegerField(default=0, verbose_name="Requêtes HTTP")
+    queries = models.PositiveIntegerField(default=0, verbose_name="Requêtes SQL")
+    sql_time = models.FloatField(default=0, verbose_name="Temps SQL (s)")
+    duration = models.FloatField(default=0, verbose_name="Durée (s)")
+    max_queries = models.PositiveIntegerField(default=0, verbose_name="Requêtes SQL maximum")
+    max_sql_time = models.FloatField(default=0, verbose_name="Temps SQL maximum (s)")
+    max_duration = models.FloatField(default=0, verbose_name="Durée maximum (s)")
+    n_plus_one = models.PositiveIntegerField(default=0, verbose_name="Requêtes N+1")
+    worst_path = models.CharField(max_length=1000, blank=True, verbose_name="Pire requête")
+    worst_duplicates = models.TextField(default="[]", verbose_name="Requêtes répétées (JSON)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+
+    class Meta:
+        ordering = ['-max_queries']
+        verbose_name = "Statistiques SQL d'une vue"
+
+    def __str__(self):
+        return self.view
+
+    @property
+    def mean_queries(self):
+        """Return the mean number of queries by request."""
+        return self.queries / self.requests if self.requests else 0
+
+    @property
+    def mean_sql_time(self):
+        """Return the mean SQL time by request in seconds."""
+        return self.sql_time / self.requests if self.requests else 0
+
+    @property
+    def mean_duration(self):
+        """Return the mean duration of requests in seconds."""
+        return self.duration / self.requests if self.requests else 0
@@ -0,0 +1,192 @@
+"""On-demand profiling of requests and background jobs, for staff users.
+
+A staff user adds ?profile=1 to the address of a page (or sends the X-Profile header)
+to run the request under a sampling profiler: a thread records the stack of the
+request every PROFILING_INTERVAL seconds (0.005 by default). The profile is written
+in PROFILES_ROOT in the collapsed stacks format ("frame;frame;frame count" lines),
+read by flamegraph.pl, speedscope or inferno. ?profile=cprofile uses cProfile instead
+and writes a .prof file, read by pstats or snakeviz.
+
+The jobs queued by a profiled request (documents, exports) are profiled the same way
+by the worker running them. The profiles are listed by the profiles page.
+"""
+import cProfile
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib import messages
+
+MODES = {
+    "1": "sample",
+    "sample": "sample",
+    "cprofile": "cprofile",
+}
+
+LIBRARY_PATH = re.compile(r".*/(?:site|dist)-packages/|.*/lib/python[\d.]+/")
+
+ProfileFile = namedtuple('ProfileFile', ['name', 'size', 'created_at'])
+
+_active = threading.local()
+
+
+def profiles_root():
+    """Return the directory where the profiles are written."""
+    return getattr(settings, 'PROFILES_ROOT', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def active_mode():
+    """Return the mode of the profile running in the current thread, or ""."""
+    return getattr(_active, "mode", "")
+
+
+def frame_name(code):
+    """Return the name of a frame in a collapsed stack: function (file)."""
+    filename = code.co_filename
+    if filename.startswith(settings.BASE_DIR):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    else:
+        filename = LIBRARY_PATH.sub("", filename)
+    return (code.co_name + " (" + filename + ")").replace(";", ":")
+
+
+class SamplingProfiler:
+    """Record the stacks of a thread at regular intervals."""
+    extension = "folded"
+
+    def __init__(self, interval=None):
+        self.interval = interval or getattr(settings, 'PROFILING_INTERVAL', 0.005)
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+
+    def start(self):
+        """Start sampling the current thread."""
+        self.sampler.start()
+
+    def stop(self):
+        """Stop sampling."""
+        self.stopped.set()
+        self.sampler.join()
+
+    def sample(self):
+        """Record the stack of the profiled thread until stopped."""
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id) # pylint: disable=protected-access
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, output):
+        """Write the collapsed stacks into output, a binary file."""
+        for stack, count in self.stacks.most_common():
+            output.write((stack + " " + str(count) + "\n").encode())
+
+
+class CProfiler:
+    """Record every function call with cProfile."""
+    extension = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        """Start profiling the current thread."""
+        self.profile.enable()
+
+    def stop(self):
+        """Stop profiling."""
+        self.profile.disable()
+
+    def write(self, output):
+        """Write the statistics into output, a binary file, like pstats.dump_stats."""
+        self.profile.create_stats()
+        marshal.dump(self.profile.stats, output)
+
+
+PROFILERS = {"sample": SamplingProfiler, "cprofile": CProfiler}
+
+
+@contextmanager
+def profile(name, mode="sample"):
+    """
+    Profile the code run in the block and write the profile in PROFILES_ROOT.
+
+    Yield a dictionary whose "filename" key is set to the name of the profile file at
+    the end of the block. Nothing is profiled if a profile is already running in the
+    current thread (a job run in the request).
+    """
+    result = {"filename": None}
+    if active_mode():
+        yield result
+        return
+    profiler = PROFILERS[mode]()
+    _active.mode = mode
+    start = time.monotonic()
+    profiler.start()
+    try:
+        yield result
+    finally:
+        profiler.stop()
+        _active.mode = ""
+        duration = int((time.monotonic() - start) * 1000)
+        slug = re.sub(r"[^\w-]+", "-", name).strip("-")[:80]
+        filename = "%s-%s-%dms.%s" % (
+            datetime.now().strftime("%Y%m%d-%H%M%S"), slug, duration, profiler.extension
+        )
+        os.makedirs(profiles_root(), exist_ok=True)
+        with open(os.path.join(profiles_root(), filename), "wb") as output:
+            profiler.write(output)
+        result["filename"] = filename
+
+
+def list_profiles():
+    """Return the profiles of PROFILES_ROOT, the most recent first."""
+    try:
+        entries = list(os.scandir(profiles_root()))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (
+            ProfileFile(entry.name, entry.stat().st_size,
+                        datetime.fromtimestamp(entry.stat().st_mtime))
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(tuple(
+                "." + profiler.extension for profiler in PROFILERS.values()
+            ))
+        ),
+        key=lambda profile_file: profile_file.created_at,
+        reverse=True
+    )
+
+
+class ProfilingMiddleware:
+    """Profile the requests of staff users asking for it (see the module documentation)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = MODES.get(request.GET.get("profile") or request.META.get("HTTP_X_PROFILE", ""))
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        if "profile" in request.GET:
+            # The views (search forms) must not see the parameter.
+            query = request.GET.copy()
+            del query["profile"]
+            request.GET = query
+        with profile(request.method + " " + request.path, mode) as result:
+            response = self.get_response(request)
+        response["X-Profile-File"] = result["filename"]
+        messages.info(request, "Profil enregistré : " + result["filename"])
+        return response
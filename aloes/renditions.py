@@ -0,0 +1,72 @@
+"""Reduced renditions of the uploaded images (maps), made with Pillow.
+
+The scans of the maps weigh several megabytes: the pages show a rendition of SIZES
+and link to the original. A rendition is made on its first request and written in
+MEDIA_ROOT/renditions, named after the hash of the original (see aloes.files) and the
+size: a replaced image gets new renditions, and the same image uploaded twice shares
+them. Browsers accepting WebP get WebP, the others a progressive JPEG.
+"""
+import os
+
+from django.conf import settings
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from PIL import Image, ImageOps, features
+
+from .files import file_hash, serve_file, serve_path
+
+SIZES = {
+    "thumbnail": 240,
+    "medium": 1200,
+}
+
+RENDITIONS_DIRECTORY = "renditions"
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+
+def render(source, destination, size, extension):
+    """Write into destination the image source reduced to fit in a size x size square."""
+    image_format, options = FORMATS[extension]
+    with Image.open(source) as image:
+        # The scans of phones are rotated with an EXIF tag.
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            flattened = Image.new("RGB", image.size, "white")
+            flattened.paste(image, mask=image.convert("RGBA"))
+            image = flattened
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        temporary = "%s.%d.tmp" % (destination, os.getpid())
+        image.save(temporary, image_format, **options)
+    # Concurrent requests of a new rendition write the same file.
+    os.replace(temporary, destination)
+
+
+def rendition(field_file, size, extension):
+    """Return (path, name in MEDIA_ROOT) of the rendition of field_file, made if needed."""
+    name = "%s/%s-%s.%s" % (RENDITIONS_DIRECTORY, file_hash(field_file.path), size, extension)
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if not os.path.exists(path):
+        render(field_file.path, path, SIZES[size], extension)
+    return path, name
+
+
+def serve_rendition(request, field_file, size):
+    """Return the response sending the rendition size of the image field_file."""
+    if not field_file or size not in SIZES:
+        raise Http404
+    webp = "image/webp" in request.META.get("HTTP_ACCEPT", "") and features.check("webp")
+    try:
+        path, name = rendition(field_file, size, "webp" if webp else "jpg")
+    except FileNotFoundError:
+        raise Http404
+    except OSError:
+        # Not an image Pillow can read: the original is sent.
+        return serve_file(request, field_file)
+    response = serve_path(request, path, name)
+    patch_vary_headers(response, ("Accept",))
+    return response
@@ -42,17 +42,18 @@ INSTALLED_APPS = [
     'colorfield',
     'dbbackup',
     'django_cron',
-    'lock_tokens.apps.LockTokensConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'aloes.instrumentation.SQLInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'aloes.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'aloes.urls'
@@ -125,8 +126,4 @@ MESSAGE_TAGS = {
 
 LOGIN_URL = '/login'
 
-LOCK_TOKENS = {
-    'TIMEOUT': 300,
-}
-
 INTERNAL_IPS = ['127.0.0.1']
\ No newline at end of file
@@ -37,6 +37,12 @@ urlpatterns = [
     path('deleleUser/<int:pk>', views.UserDelete.as_view(), name="deleteUser"),
     path('resetPassword/<int:pk>', views.reset_password, name="resetPassword"),
     path('adminRights/<int:pk>', views.admin_rights, name="adminRights"),
+    path('jobs', views.jobs_index, name="jobs"),
+    path('job/<int:pk>', views.job, name="job"),
+    path('jobDownload/<int:pk>', views.job_download, name="jobDownload"),
+    path('sqlStats', views.sql_stats, name="sqlStats"),
+    path('profiles', views.profiles_index, name="profiles"),
+    path('profileDownload/<str:name>', views.profile_download, name="profileDownload"),
 ]
 
 if settings.DEBUG:
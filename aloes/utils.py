@@ -1,11 +1,20 @@
 """Useful methods for project."""
+import csv
+import hashlib
+import itertools
+from calendar import timegm
+from functools import wraps
+
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.forms import modelform_factory
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from django.views.generic import CreateView, DeleteView, UpdateView
-from lock_tokens.exceptions import AlreadyLockedError
-from lock_tokens.sessions import (check_for_session, lock_for_session,
-                                  unlock_for_session)
+
+from .form import VersionedModelForm
+from .models import VersionConflict
 
 
 class ImprovedCreateView(CreateView): # pylint: disable=too-many-ancestors
@@ -65,48 +74,111 @@ class ImprovedDeleteView(DeleteView): # pylint: disable=too-many-ancestors
         context = super().get_context_data(**kwargs)
         return {**context, **getattr(self, 'context', self.default_context)}
 
-class LockableUpdateView(UpdateView): # pylint: disable=too-many-ancestors
-    """A class Based View with lock system."""
-    default_lock_message = "Impossible d'acceder à la page : l'objet est en cours de modification."
+CONFLICT_MESSAGE = (
+    "Ces données ont été modifiées par quelqu'un d'autre depuis l'ouverture du formulaire : "
+    "vérifiez vos valeurs au regard des valeurs enregistrées, puis enregistrez à nouveau."
+)
+
+
+def conflict_form(request, form):
+    """
+    Return the form of the conflict screen, after form.save raised VersionConflict:
+    form rebased on the current row (see VersionedModelForm.rebase), with a message.
+    """
+    messages.warning(request, CONFLICT_MESSAGE)
+    return form.rebase()
+
+
+class VersionedUpdateView(UpdateView): # pylint: disable=too-many-ancestors
+    """
+    A class Based View to edit a VersionedModel, showing the conflict screen when the
+    instance was saved by someone else meanwhile.
+    """
     default_success_message = "Les modifications ont bien été enregistrées."
     default_context = {}
 
-    def lock(self, request):
-        """Lock the ressource."""
-        try:
-            lock_for_session(self.get_object(), request.session)
-            return True
-        except AlreadyLockedError:
-            messages.error(request, getattr(self, 'lock_message', self.default_lock_message))
-            return False
-
-    def get(self, request, *args, **kwargs):
-        if not self.lock(request):
-            return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/'))
-        return super().get(request, *args, **kwargs)
+    def get_form_class(self):
+        if self.form_class is None:
+            return modelform_factory(self.model, form=VersionedModelForm, fields=self.fields)
+        return super().get_form_class()
 
     def post(self, request, *args, **kwargs):
         if 'cancel' in request.POST:
             messages.success(self.request, "Demande annulée")
-            if self.lock(request):
-                unlock_for_session(self.get_object(), self.request.session)
             return redirect(self.request.POST.get('cancel') or "home")
-        if not self.lock(request):
-            messages.error(request, getattr(self, 'lock_message', self.default_lock_message))
-            return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/'))
         return super().post(request, *args, **kwargs)
 
     def form_valid(self, form):
-        if not check_for_session(self.get_object(), self.request.session):
-            return redirect(self.request.META.get('HTTP_REFERER', '/'))
+        try:
+            form.save()
+        except VersionConflict:
+            form = conflict_form(self.request, form)
+            self.object = form.instance
+            return self.render_to_response(self.get_context_data(form=form))
         messages.success(
             self.request,
             getattr(self, 'success_message', self.default_success_message)
         )
-        form.save()
-        unlock_for_session(self.get_object(), self.request.session)
         return redirect(self.get_success_url())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return {**context, **getattr(self, 'context', self.default_context)}
+
+
+class Echo: # pylint: disable=too-few-public-methods
+    """A pseudo-buffer which returns what is written, used to stream csv files."""
+    def write(self, value): # pylint: disable=no-self-use
+        """Return the value instead of storing it."""
+        return value
+
+def streaming_csv_response(rows, filename):
+    """
+    Return a response streaming rows (iterable of lists) as a csv file.
+
+    The file is written with a BOM and semicolons so that spreadsheet software
+    opens it correctly with a french locale.
+    """
+    writer = csv.writer(Echo(), delimiter=";")
+    response = StreamingHttpResponse(
+        itertools.chain(["\ufeff"], (writer.writerow(row) for row in rows)),
+        content_type="text/csv; charset=utf-8"
+    )
+    response['Content-Disposition'] = 'attachment; filename="' + filename + '"'
+    return response
+
+
+def conditional_page(state):
+    """
+    Decorator answering 304 to a browser which already has the current version of a page.
+
+    state(request, *args, **kwargs) returns (values, last_modified): values of anything
+    the page displays (updated_at of its rows...), last_modified a datetime or None. It
+    may return None to render the page anyway. The ETag also depends on the user, shown
+    by the navbar, and the page is rendered when messages are waiting.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+            current = state(request, *args, **kwargs)
+            if current is None:
+                return view(request, *args, **kwargs)
+            values, last_modified = current
+            user = request.user
+            etag = '"%s"' % hashlib.md5(
+                repr((values, user.pk, user.is_staff, user.is_superuser)).encode()
+            ).hexdigest()
+            timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response['ETag'] = etag
+                    if timestamp:
+                        response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
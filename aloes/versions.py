@@ -0,0 +1,80 @@
+"""Versions of the data kept in the memory of each process (reference tables, home page...).
+
+A process keeps its own copy of such data with the version it was read at, and reads
+it again when the version changes. A version is a random token written in a file of
+VERSIONS_ROOT, replaced by bump when the data is modified: reading it costs a read of a
+small file, no query, and within a request each version is read once. VERSIONS_ROOT
+must be shared by all the processes (web server and run_jobs), like JOBS_ROOT.
+"""
+import os
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+Version = namedtuple('Version', ['token', 'updated_at'])
+Version.__doc__ = """
+Version of some data.
+
+token : random string, changed by each bump
+updated_at : time of the last bump (aware datetime)
+"""
+
+REQUESTS = threading.local()
+
+
+def versions_root():
+    """Return the directory of the versions."""
+    return getattr(settings, 'VERSIONS_ROOT', os.path.join(settings.BASE_DIR, 'versions'))
+
+
+def version_file(name):
+    """Return the absolute path of the file of the version name."""
+    return os.path.join(versions_root(), name)
+
+
+def read(name):
+    """Return the current Version of name, created by the first read."""
+    try:
+        with open(version_file(name)) as source:
+            mtime = os.fstat(source.fileno()).st_mtime
+            return Version(source.read(), datetime.fromtimestamp(mtime, timezone.utc))
+    except FileNotFoundError:
+        bump(name)
+        return read(name)
+
+
+def current(name):
+    """Return the Version of name, read once per request (at each call outside requests)."""
+    versions = getattr(REQUESTS, 'versions', None)
+    if versions is None:
+        return read(name)
+    if name not in versions:
+        versions[name] = read(name)
+    return versions[name]
+
+
+def bump(name):
+    """Give name a new version: the copies of the data kept by the processes are stale."""
+    os.makedirs(versions_root(), exist_ok=True)
+    path = version_file(name)
+    # Written aside then renamed: a process never reads a partial token.
+    temporary = "%s.%s.part" % (path, uuid.uuid4().hex)
+    with open(temporary, "w") as output:
+        output.write(uuid.uuid4().hex)
+    os.replace(temporary, path)
+    versions = getattr(REQUESTS, 'versions', None)
+    if versions is not None:
+        versions.pop(name, None)
+
+
+def start_request(**kwargs): # pylint: disable=unused-argument
+    """Receiver of request_started (connected in AloesConfig.ready): read versions again."""
+    REQUESTS.versions = {}
+
+
+def finish_request(**kwargs): # pylint: disable=unused-argument
+    """Receiver of request_finished: versions are read at each call outside requests."""
+    REQUESTS.versions = None
@@ -1,22 +1,32 @@
 """Views of aloes app."""
+import json
+import os
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
-from lock_tokens.exceptions import AlreadyLockedError
-from lock_tokens.sessions import (check_for_session, lock_for_session,
-                                  unlock_for_session)
-
-from documents.models import Document
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 
 from .acl import SuperuserRequiredMixin, admin_required, superuser_required
 from .form import ChangePasswordForm, HomeTextEditForm, LoginForm
-from .models import GeneralPreferences
-from .utils import ImprovedCreateView, ImprovedDeleteView, ImprovedUpdateView
+from .home import etag as home_etag
+from .home import home_data
+from .home import last_modified as home_last_modified
+from .jobs import result_file
+from .models import GeneralPreferences, Job, VersionConflict, ViewStats
+from .profiling import list_profiles, profiles_root
+from .utils import (ImprovedCreateView, ImprovedDeleteView, ImprovedUpdateView,
+                    conflict_form)
 
 
+@vary_on_cookie
+@condition(etag_func=home_etag, last_modified_func=home_last_modified)
 def home(request):
     """
     Displays the home page
@@ -25,17 +35,14 @@ def home(request):
 
     :template:`home.html`
     """
-    general_preferences, _ = GeneralPreferences.objects.get_or_create()
-    home_text = general_preferences.home_text
-    english_home_text = general_preferences.english_home_text
-    documents = Document.objects.all()
+    data = home_data(request)
     return render(
         request,
         "home.html",
         {
-            'home_text': home_text,
-            'english_home_text': english_home_text,
-            'documents': documents,
+            'home_text': data['home_text'],
+            'english_home_text': data['english_home_text'],
+            'documents': data['documents'],
             'active': 'home'
         }
     )
@@ -47,21 +54,17 @@ def about(request):
 @admin_required
 def edit_home_text(request):
     """Display form to edit home text (french and english)."""
-    text, _ = GeneralPreferences.objects.get_or_create()
-    try:
-        lock_for_session(text, request.session)
-    except AlreadyLockedError:
-        messages.error(request, "Impossible de modifier le texte : il est en modification.")
-        return redirect(request.META.get('HTTP_REFERER', '/'))
+    # Created by the first save only: displaying the form writes nothing.
+    text = GeneralPreferences.objects.first() or GeneralPreferences()
     form = HomeTextEditForm(request.POST or None, instance=text)
     if form.is_valid():
-        if not check_for_session(text, request.session):
-            messages.error(request, "Impossible de modifier le texte : il est en modification.")
-            return redirect(request.META.get('HTTP_REFERER', '/'))
-        messages.success(request, "Le texte d'accueil a bien été modifié")
-        form.save()
-        unlock_for_session(text, request.session)
-        return redirect(reverse('documents:index'))
+        try:
+            form.save()
+        except VersionConflict:
+            form = conflict_form(request, form)
+        else:
+            messages.success(request, "Le texte d'accueil a bien été modifié")
+            return redirect(reverse('documents:index'))
     return render(request, "form.html", {
         "form": form,
         "form_title": "Modification du texte d'accueil",
@@ -195,3 +198,76 @@ def admin_rights(request, pk):
     user.save()
     messages.success(request, "L'utilisateur vient de récupérer les droits administrateurs")
     return redirect(reverse('indexAccounts'))
+
+@admin_required
+def jobs_index(request):
+    """List the last background jobs."""
+    jobs = Job.objects.select_related('user')[:100]
+    return render(request, "jobs.html", {"jobs": jobs, "active": "jobs"})
+
+@admin_required
+def job(request, pk):
+    """Display the status of a background job, refreshed until it is finished."""
+    job = get_object_or_404(Job, pk=pk) # pylint: disable=redefined-outer-name
+    return render(request, "job.html", {"job": job, "active": "jobs"})
+
+@admin_required
+def job_download(request, pk):
+    """Download the result of a finished background job."""
+    job = get_object_or_404(Job, pk=pk, status=Job.DONE) # pylint: disable=redefined-outer-name
+    if not job.result_path:
+        raise Http404
+    try:
+        result = open(result_file(job), 'rb')
+    except FileNotFoundError:
+        raise Http404
+    response = FileResponse(result, content_type=job.result_type)
+    disposition = 'inline' if job.result_inline else 'attachment'
+    response['Content-Disposition'] = disposition + '; filename="' + job.result_name + '"'
+    return response
+
+STATS_SORTS = {
+    "max_queries": ("-max_queries", "Requêtes SQL maximum"),
+    "sql_time": ("-sql_time", "Temps SQL cumulé"),
+    "max_duration": ("-max_duration", "Durée maximum"),
+    "n_plus_one": ("-n_plus_one", "Requêtes N+1"),
+}
+
+@admin_required
+def sql_stats(request):
+    """List the views with the worst SQL statistics (see aloes.instrumentation)."""
+    if request.method == "POST":
+        ViewStats.objects.all().delete()
+        messages.success(request, "Les statistiques SQL ont été réinitialisées")
+        return redirect(reverse('sqlStats'))
+    sort = request.GET.get("sort", "max_queries")
+    if sort not in STATS_SORTS:
+        sort = "max_queries"
+    stats = list(ViewStats.objects.order_by(STATS_SORTS[sort][0])[:50])
+    for view_stats in stats:
+        view_stats.duplicates = json.loads(view_stats.worst_duplicates)
+    return render(request, "sql_stats.html", {
+        "stats": stats,
+        "sort": sort,
+        "sorts": [(key, label) for key, (_, label) in STATS_SORTS.items()],
+        "enabled": getattr(settings, 'SQL_INSTRUMENTATION', False),
+        "threshold": getattr(settings, 'SQL_INSTRUMENTATION_THRESHOLD', 5),
+        "active": "sqlStats",
+    })
+
+@admin_required
+def profiles_index(request):
+    """List the profiles of requests and jobs (see aloes.profiling)."""
+    return render(request, "profiles.html", {"profiles": list_profiles()[:200], "active": "profiles"})
+
+@admin_required
+def profile_download(request, name):
+    """Download the profile name."""
+    if name not in {profile_file.name for profile_file in list_profiles()}:
+        raise Http404
+    response = FileResponse(
+        open(os.path.join(profiles_root(), name), 'rb'),
+        content_type="text/plain" if name.endswith(".folded") else "application/octet-stream"
+    )
+    response['Content-Disposition'] = 'attachment; filename="' + name + '"'
+    return response
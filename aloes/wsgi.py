@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aloes.settings")
 
 application = get_wsgi_application()
+
+# Built before the first request (see gestion.autocomplete).
+from gestion.autocomplete import warm_up  # pylint: disable=wrong-import-position
+warm_up()
@@ -1,8 +1,10 @@
 """Models of documents app."""
 from django.db import models
 
+from aloes.models import VersionedModel
 
-class Document(models.Model):
+
+class Document(VersionedModel):
     """Store a document."""
     name = models.CharField(max_length=255, verbose_name="Nom du document")
     english_name = models.CharField(
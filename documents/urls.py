@@ -11,4 +11,11 @@ urlpatterns = [
     path('editDocument/<int:pk>', views.DocumentEdit.as_view(), name="edit"),
     path('switchActiveDocument/<int:pk>', views.document_switch_active, name="switchActive"),
     path('deleteDocument/<int:pk>', views.DocumentDelete.as_view(), name="delete"),
+    path('download/<int:pk>', views.document_download, name="download"),
+    path(
+        'downloadEnglish/<int:pk>',
+        views.document_download,
+        {'english': True},
+        name="downloadEnglish"
+    ),
 ]
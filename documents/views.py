@@ -1,12 +1,14 @@
 """Views of documents app."""
 import os
 
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView
 from aloes.acl import AdminRequiredMixin, admin_required
+from aloes.files import serve_file
 from aloes.utils import (ImprovedCreateView, ImprovedDeleteView,
-                         LockableUpdateView)
+                         VersionedUpdateView)
 
 from .models import Document
 
@@ -38,14 +40,13 @@ class DocumentCreate(AdminRequiredMixin, ImprovedCreateView): # pylint: disable=
         "active": "documents"
     }
 
-class DocumentEdit(AdminRequiredMixin, LockableUpdateView): # pylint: disable=too-many-ancestors
+class DocumentEdit(AdminRequiredMixin, VersionedUpdateView): # pylint: disable=too-many-ancestors
     """Class based view to edit a document."""
     model = Document
     fields = "__all__"
     template_name = "form.html"
     success_url = reverse_lazy('documents:index')
     success_message = "Le document a bien été modifié"
-    lock_message = "Impossible de modifier le document : il est en cours de modification"
     context = {
         "form_title": "Modification d'un document",
         "form_icon": "pencil-alt",
@@ -55,11 +56,14 @@ class DocumentEdit(AdminRequiredMixin, LockableUpdateView): # pylint: disable=to
     }
 
     def form_valid(self, form):
-        if self.get_object().document:
-            os.remove(self.get_object().document.path)
-        if self.get_object().english_document:
-            os.remove(self.get_object().english_document.path)
-        return super().form_valid(form)
+        former = self.get_object()
+        response = super().form_valid(form)
+        # Not saved on a conflict: self.object is then the current row.
+        for name in ('document', 'english_document'):
+            former_file = getattr(former, name)
+            if former_file and former_file != getattr(self.object, name):
+                os.remove(former_file.path)
+        return response
 
 class DocumentDelete(AdminRequiredMixin, ImprovedDeleteView): # pylint: disable=too-many-ancestors
     """Class based view to delete a document."""
@@ -89,3 +93,10 @@ def document_switch_active(request, pk):
     document.active = 1 - document.active
     document.save()
     return redirect(reverse('documents:index'))
+
+def document_download(request, pk, english=False):
+    """Download the document pk (its english version if english), public if active."""
+    document = get_object_or_404(Document, pk=pk)
+    if not document.active and not request.user.is_staff:
+        raise Http404
+    return serve_file(request, document.english_document if english else document.document)
@@ -0,0 +1,138 @@
+"""Batch generation of a document for many leasings, streamed as a ZIP archive."""
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from gestion.models import Leasing
+
+from . import worker
+from .documents import DocumentError, build
+
+logger = logging.getLogger(__name__)
+
+SELECTIONS = OrderedDict([
+    ('next', "Prochains locataires (chambres réservées)"),
+    ('current', "Locataires actuels"),
+])
+
+
+def select_leasings(selection, building=None):
+    """Return the primary keys of the leasings of selection, in the order of rooms."""
+    if selection == "next":
+        leasings = Leasing.objects.filter(next_rooms__isnull=False)
+    else:
+        leasings = Leasing.objects.filter(current_rooms__isnull=False)
+    if building:
+        leasings = leasings.filter(room__room__startswith=building)
+    return list(leasings.order_by('room__room').values_list('pk', flat=True))
+
+
+def default_workers():
+    """Return the number of processes used to render documents."""
+    return getattr(settings, 'GENERATE_DOCS_WORKERS', min(4, os.cpu_count() or 1))
+
+
+def render_one(document, leasing_pk, user_pk):
+    """
+    Render document for a leasing.
+
+    Return (filename, content, duration, error). filename and content are None if the
+    document can not be generated.
+    """
+    start = time.monotonic()
+    leasing = Leasing.objects.select_related(
+        'room__rent_type',
+        'tenant__school',
+        'tenant__current_leasing__room__rent_type',
+        'tenant__next_leasing__room__rent_type',
+    ).get(pk=leasing_pk)
+    user = User.objects.filter(pk=user_pk).first()
+    try:
+        template, context = build(document, leasing, user)
+        content = template.render_bytes(context)
+    except DocumentError as error:
+        return None, None, time.monotonic() - start, str(error)
+    filename = str(leasing.room) + "_" + template.filename
+    return filename, content, time.monotonic() - start, ""
+
+
+def render_all(document, leasing_pks, user_pk=None, workers=None):
+    """
+    Render document for all leasings, in a pool of processes if workers > 1.
+
+    Yield (leasing pk, result of render_one) as soon as each document is rendered.
+    """
+    workers = default_workers() if workers is None else workers
+    if workers <= 1 or len(leasing_pks) <= workers:
+        for pk in leasing_pks:
+            yield pk, render_one(document, pk, user_pk)
+        return
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=worker.init_worker) as pool:
+        futures = {
+            pool.submit(worker.render_one, document, pk, user_pk): pk for pk in leasing_pks
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+class ZipStream:
+    """Write-only file object keeping what zipfile writes until it is streamed."""
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        """Store data."""
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        """Return the number of bytes written."""
+        return self.offset
+
+    def flush(self):
+        """Nothing to flush, data are returned by pop."""
+
+    def pop(self):
+        """Return and forget the data written since the last call."""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(results):
+    """
+    Yield a ZIP archive containing the rendered documents of results (see render_all).
+
+    A rapport.csv file giving the duration of each document and the errors is added
+    at the end of the archive.
+    """
+    start = time.monotonic()
+    stream = ZipStream()
+    report = io.StringIO()
+    writer = csv.writer(report, delimiter=";")
+    writer.writerow(["Dossier", "Fichier", "Durée (ms)", "Erreur"])
+    count = 0
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+        for pk, (filename, content, duration, error) in results:
+            if content is not None:
+                archive.writestr(filename, content)
+                count += 1
+            writer.writerow([pk, filename or "", int(duration * 1000), error])
+            yield stream.pop()
+        archive.writestr("rapport.csv", "\ufeff" + report.getvalue())
+    yield stream.pop()
+    logger.info("Batch of %d documents generated in %.3fs", count, time.monotonic() - start)
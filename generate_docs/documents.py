@@ -0,0 +1,226 @@
+"""Documents which can be generated, with the logic building their context.
+
+Each builder receives a leasing or a tenant (see the model of the document) and the
+user generating the document, and returns the ODTGenerator and the context to render.
+Builders raise DocumentError when the document can not be generated.
+"""
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from gestion.models import Leasing, Tenant
+
+from .utils import ODTGenerator
+
+
+class DocumentError(Exception):
+    """Raised when a document can not be generated for a leasing or a tenant."""
+
+
+Document = namedtuple('Document', ['label', 'model', 'build'])
+
+
+def odt_name(prefix, tenant, suffix='.odt'):
+    """Return the filename of a generated document for tenant."""
+    return (prefix + tenant.first_name + tenant.name + suffix).replace(" ", "")
+
+
+def gender_words(tenant):
+    """Return the civility and the agreement of "né" for tenant."""
+    if tenant.gender == "F":
+        return "Mme.", "née"
+    return "M.", "né"
+
+
+def apl_infos(leasing, user): # pylint: disable=unused-argument
+    """Build apl_infos.odt."""
+    template = ODTGenerator(
+        'generate_docs/apl_infos.odt',
+        odt_name('apl_infos_', leasing.tenant)
+    )
+    return template, {'leasing': leasing}
+
+
+def rent_contract(leasing, user): # pylint: disable=unused-argument
+    """Build rent_contrat_aloes1.odt or rent_contract_aloes2.odt."""
+    room = leasing.room
+    tenant = leasing.tenant
+    gender, born_accorded = gender_words(tenant)
+    floor = str(room)[1]
+    if floor == "0":
+        floor = "Rez de chaussée"
+    elif floor == "1":
+        floor += "er étage"
+    else:
+        floor += "ieme étage"
+    if room.building == "G":
+        template = ODTGenerator(
+            'generate_docs/rent_contract_aloes2.odt',
+            odt_name('contrat_location_', tenant, '_aloes2.odt')
+        )
+    else:
+        template = ODTGenerator(
+            'generate_docs/rent_contract_aloes1.odt',
+            odt_name('contrat_location_', tenant, '_aloes1.odt')
+        )
+    return template, {
+        'leasing': leasing,
+        'tenant': tenant,
+        'gender': gender,
+        'born_accorded': born_accorded,
+        'room': room,
+        'floor': floor
+    }
+
+
+def civil_status(leasing, user): # pylint: disable=unused-argument
+    """Build civil_status.odt."""
+    tenant = leasing.tenant
+    room = leasing.room
+    total_cheque = room.rent_type.rent + room.rent_type.total_rent + room.rent_type.application_fee
+    template = ODTGenerator(
+        'generate_docs/civil_status.odt',
+        odt_name('etat_civil', tenant)
+    )
+    return template, {
+        'leasing': leasing,
+        'tenant': tenant,
+        'room': room,
+        'total_cheque': total_cheque
+    }
+
+
+def guarantee(leasing, user): # pylint: disable=unused-argument
+    """Build guarantee.odt."""
+    room = leasing.room
+    tenant = leasing.tenant
+    if room.building == "G":
+        address = "2 rue Édouard Belin"
+    else:
+        address = "4 place Édouard Branly"
+    template = ODTGenerator(
+        'generate_docs/guarantee.odt',
+        odt_name('engagement_caution_', tenant)
+    )
+    return template, {
+        'leasing': leasing,
+        'room': room,
+        'address': address,
+        'total_rent': room.rent_type.total_rent,
+        'total_rent_48': room.rent_type.total_rent * 48,
+        'tenant': tenant
+    }
+
+
+def insurance_expiration(leasing, user):
+    """Build insurance_expiration.odt."""
+    tenant = leasing.tenant
+    template = ODTGenerator(
+        'generate_docs/insurance_expiration.odt',
+        odt_name('expiration_assurance_', tenant)
+    )
+    return template, {
+        'leasing': leasing,
+        'tenant': tenant,
+        'now': datetime.now(),
+        'user': user
+    }
+
+
+def lease_end_attestation(leasing, user):
+    """Build lease_end_attestation.odt."""
+    if not leasing.date_of_departure:
+        raise DocumentError(
+            "Impossible de générer le document : le locataire n'a pas fini son bail."
+        )
+    tenant = leasing.tenant
+    gender, born_accorded = gender_words(tenant)
+    template = ODTGenerator(
+        'generate_docs/lease_end_attestation.odt',
+        odt_name('attestationFinDeBail', tenant)
+    )
+    return template, {
+        'leasing': leasing,
+        'now': datetime.now(),
+        'tenant': tenant,
+        'user': user,
+        'born_accorded': born_accorded,
+        'gender': gender
+    }
+
+
+def lease_attestation(tenant, user, template_path='generate_docs/lease_attestation.odt'):
+    """Build lease_attestation.odt."""
+    if not tenant.current_leasing:
+        raise DocumentError(
+            "Impossible de générer le document : le locataire n'a pas de chambre."
+        )
+    gender, born_accorded = gender_words(tenant)
+    template = ODTGenerator(template_path, odt_name('attesationResidence', tenant))
+    return template, {
+        'now': datetime.now(),
+        'tenant': tenant,
+        'user': user,
+        'born_accorded': born_accorded,
+        'gender': gender,
+        'leasing': tenant.current_leasing
+    }
+
+
+def lease_attestation_english(tenant, user):
+    """Build lease_attestation_english.odt."""
+    return lease_attestation(tenant, user, 'generate_docs/lease_attestation_english.odt')
+
+
+def tenant_record(leasing, user): # pylint: disable=unused-argument
+    """Build tenant_record.odt."""
+    tenant = leasing.tenant
+    room = leasing.room
+    template = ODTGenerator(
+        'generate_docs/tenant_record.odt',
+        odt_name('fiche_locataire_', tenant)
+    )
+    return template, {
+        'leasing': leasing,
+        'tenant': tenant,
+        'room': room,
+        'now': datetime.now()
+    }
+
+
+def reservation_attestation(tenant, user):
+    """Build reservation_attestation.odt."""
+    if not tenant.next_leasing:
+        raise DocumentError("Le locataire n'a pas réservé de chambre")
+    template = ODTGenerator(
+        'generate_docs/reservation_attestation.odt',
+        odt_name('attestation_reservation_', tenant)
+    )
+    return template, {'tenant': tenant, 'now': datetime.now(), 'user': user}
+
+
+DOCUMENTS = OrderedDict([
+    ('apl_infos', Document("APL infos", Leasing, apl_infos)),
+    ('rent_contract', Document("Contrat de location", Leasing, rent_contract)),
+    ('civil_status', Document("État civil", Leasing, civil_status)),
+    ('guarantee', Document("Engagement de caution", Leasing, guarantee)),
+    ('insurance_expiration', Document("Expiration assurance", Leasing, insurance_expiration)),
+    ('lease_end_attestation', Document("Attestation de fin de bail", Leasing, lease_end_attestation)),
+    ('lease_attestation', Document("Attestation de résidence", Tenant, lease_attestation)),
+    (
+        'lease_attestation_english',
+        Document("Attestation de résidence anglais", Tenant, lease_attestation_english)
+    ),
+    ('tenant_record', Document("Fiche locataire", Leasing, tenant_record)),
+    (
+        'reservation_attestation',
+        Document("Attestation de réservation", Tenant, reservation_attestation)
+    ),
+])
+
+
+def build(document, leasing, user):
+    """Return the ODTGenerator and the context of document (a key of DOCUMENTS) for leasing."""
+    document = DOCUMENTS[document]
+    if document.model is Tenant:
+        return document.build(leasing.tenant, user)
+    return document.build(leasing, user)
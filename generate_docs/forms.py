@@ -1,6 +1,21 @@
 """Forms of the generate_docs app"""
 from django import forms
 
+from gestion.form import SearchForm
+
+from .batch import SELECTIONS
+from .documents import DOCUMENTS
+
+
 class MailingLabelForm(forms.Form):
     """Form to upload a csv file"""
     file = forms.FileField()
+
+class BatchDocumentsForm(forms.Form):
+    """Form to choose a document and the leasings to generate it for."""
+    document = forms.ChoiceField(
+        choices=[(key, document.label) for key, document in DOCUMENTS.items()],
+        label="Document"
+    )
+    selection = forms.ChoiceField(choices=SELECTIONS.items(), label="Dossiers")
+    building = forms.ChoiceField(choices=SearchForm.BUILDING_CHOICES, label="Bâtiment")
@@ -0,0 +1,80 @@
+"""Command comparing the rendering of the ODT templates with and without the compiled cache."""
+import glob
+import os
+import time
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from secretary import Renderer
+
+from gestion.models import Leasing
+from generate_docs.utils import CachedRenderer, format_date, format_datetime
+
+
+def uncached_render(path, context):
+    """Render path as before the cache: a new secretary renderer for each document."""
+    engine = Renderer()
+    engine.environment.filters['format_date'] = format_date
+    engine.environment.filters['format_datetime'] = format_datetime
+    return engine.render(path, **context)
+
+
+class Command(BaseCommand):
+    """Render every template of generate_docs with and without the cache and print the timings."""
+    help = "Benchmark the rendering of the ODT templates with and without the compiled cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Renders per template")
+
+    def context(self):
+        """Return a context filling the variables used by all templates."""
+        leasing = Leasing.objects.filter(current_rooms__isnull=False).select_related(
+            'room__rent_type', 'tenant__school'
+        ).first()
+        if leasing is None:
+            return {'now': datetime.now()}
+        return {
+            'leasing': leasing,
+            'tenant': leasing.tenant,
+            'room': leasing.room,
+            'user': User.objects.first(),
+            'now': datetime.now(),
+            'gender': "M.",
+            'born_accorded': "né",
+            'floor': "1er étage",
+            'address': "4 place Édouard Branly",
+            'total_rent': leasing.room.rent_type.total_rent,
+            'total_rent_48': leasing.room.rent_type.total_rent * 48,
+            'total_cheque': 0,
+        }
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        context = self.context()
+        renderer = CachedRenderer()
+        directory = os.path.join(os.path.dirname(__file__), '..', '..', 'templates', 'generate_docs')
+        self.stdout.write("%-32s %12s %12s %12s %8s" % (
+            "Template", "avant (ms)", "compil. (ms)", "après (ms)", "gain"
+        ))
+        totals = [0, 0]
+        for path in sorted(glob.glob(os.path.join(directory, '*.odt'))):
+            start = time.monotonic()
+            for _ in range(repeat):
+                uncached_render(path, context)
+            before = (time.monotonic() - start) / repeat
+            start = time.monotonic()
+            renderer.render(path, **context)
+            first = time.monotonic() - start
+            start = time.monotonic()
+            for _ in range(repeat):
+                renderer.render(path, **context)
+            after = (time.monotonic() - start) / repeat
+            totals[0] += before
+            totals[1] += after
+            self.stdout.write("%-32s %12.1f %12.1f %12.1f %7.1fx" % (
+                os.path.basename(path), before * 1000, first * 1000, after * 1000, before / after
+            ))
+        self.stdout.write(self.style.SUCCESS("%-32s %12.1f %12s %12.1f %7.1fx" % (
+            "Total", totals[0] * 1000, "", totals[1] * 1000, totals[0] / totals[1]
+        )))
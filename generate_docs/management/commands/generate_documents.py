@@ -0,0 +1,54 @@
+"""Command to generate a document for many leasings into a ZIP archive."""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from generate_docs.batch import SELECTIONS, render_all, select_leasings, stream_zip
+from generate_docs.documents import DOCUMENTS
+
+
+class Command(BaseCommand):
+    """Generate a document for the leasings of a selection and write them in a ZIP archive."""
+    help = "Generate a document for many leasings into a ZIP archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('document', choices=list(DOCUMENTS))
+        parser.add_argument('output', help="Path of the ZIP archive to write")
+        parser.add_argument('--selection', choices=list(SELECTIONS), default='next')
+        parser.add_argument('--building', help="Only leasings of this building (A, B, ...)")
+        parser.add_argument('--user', help="Username of the user signing the documents")
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help="Number of processes rendering documents (GENERATE_DOCS_WORKERS by default)"
+        )
+
+    def handle(self, *args, **options):
+        user_pk = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError("Unknown user " + options['user'])
+            user_pk = user.pk
+        leasing_pks = select_leasings(options['selection'], options['building'])
+        start = time.monotonic()
+        results = self.report(render_all(
+            options['document'],
+            leasing_pks,
+            user_pk,
+            options['workers']
+        ))
+        with open(options['output'], 'wb') as output:
+            for chunk in stream_zip(results):
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            "%d dossiers traités en %.2fs" % (len(leasing_pks), time.monotonic() - start)
+        ))
+
+    def report(self, results):
+        """Print the duration of each document while passing results through."""
+        for pk, result in results:
+            filename, _, duration, error = result
+            self.stdout.write("%6d ms  %s" % (duration * 1000, filename or str(pk) + " : " + error))
+            yield pk, result
@@ -0,0 +1,16 @@
+"""Background tasks of generate_docs app (see aloes.jobs)."""
+from aloes.jobs import Result, task
+
+from .batch import render_all, select_leasings, stream_zip
+
+
+@task("generate_docs.batch", queue="documents", timeout=1800)
+def batch(job, document, selection, building=None):
+    """Render document for the leasings of selection into a ZIP archive."""
+    leasing_pks = select_leasings(selection, building)
+    return Result(
+        document + ".zip",
+        "application/zip",
+        stream_zip(render_all(document, leasing_pks, job.user_id))
+    )
+
@@ -0,0 +1,70 @@
+"""Tests of generate_docs."""
+import glob
+import io
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+
+from django.test import SimpleTestCase
+
+from generate_docs.management.commands.benchmark_templates import uncached_render
+from generate_docs.utils import CachedRenderer
+
+TEMPLATES = os.path.join(os.path.dirname(__file__), 'templates', 'generate_docs')
+
+CONTEXT = {
+    'now': datetime(2020, 9, 1, 14, 30),
+    'gender': "M.",
+    'born_accorded': "né",
+    'floor': "1er étage",
+    'address': "4 place Édouard Branly",
+    'total_rent': 350,
+    'total_rent_48': 350 * 48,
+    'total_cheque': 0,
+    'text': "Un **loyer** payé\n\n- le 1er\n- avant le 5",
+}
+
+
+def unpack(document):
+    """Return the files of the ODT document, without the dates of the archive."""
+    with zipfile.ZipFile(io.BytesIO(document)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+class CachedRendererTests(SimpleTestCase):
+    """The compiled templates render the same documents as secretary."""
+
+    def assertSameRender(self, path, context): # pylint: disable=invalid-name
+        """Assert path renders the same with CachedRenderer, twice, as with secretary."""
+        expected = unpack(uncached_render(path, context))
+        renderer = CachedRenderer()
+        for _ in range(2):
+            self.assertEqual(unpack(renderer.render(path, **context)), expected)
+
+    def test_templates(self):
+        """Every template renders as with secretary."""
+        paths = sorted(glob.glob(os.path.join(TEMPLATES, '*.odt')))
+        self.assertTrue(paths)
+        for path in paths:
+            with self.subTest(template=os.path.basename(path)):
+                self.assertSameRender(path, CONTEXT)
+
+    def test_markdown(self):
+        """The styles added by the markdown filter to content.xml are kept."""
+        source = os.path.join(TEMPLATES, 'lease_attestation.odt')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'markdown.odt')
+            with zipfile.ZipFile(source) as archive, \
+                    zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as output:
+                for item in archive.infolist():
+                    content = archive.read(item)
+                    if item.filename == 'content.xml':
+                        content = content.replace(
+                            b'</office:text>',
+                            b'<text:p>{{ text|markdown }}</text:p></office:text>'
+                        )
+                    output.writestr(item, content)
+            self.assertSameRender(path, CONTEXT)
+            content = unpack(CachedRenderer().render(path, **CONTEXT))['content.xml']
+            self.assertIn(b'style:name="markdown_bold"', content)
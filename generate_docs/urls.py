@@ -24,5 +24,6 @@ urlpatterns = [
         views.reservation_attestation,
         name="reservationAttestation"
     ),
-    path('mailingLabels', views.mailing_labels, name="mailingLabels")
+    path('mailingLabels', views.mailing_labels, name="mailingLabels"),
+    path('batchDocuments', views.batch_documents, name="batchDocuments"),
 ]
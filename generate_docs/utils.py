@@ -1,10 +1,15 @@
 """Useful method for rendering and generating ODT documents."""
+import hashlib
 import os
-import tempfile
+import threading
+from xml.dom.minidom import parseString
 
 from django.http import HttpResponse
+from django.utils.http import quote_etag
 from secretary import Renderer
 
+ODT_CONTENT_TYPE = 'application/vnd.oasis.opendocument.text; charset=UTF-8'
+
 
 def format_date(value):
     """Filter to display date correctly."""
@@ -20,25 +25,118 @@ def format_datetime(value):
     except:
         return ""
 
+
+class CompiledTemplate(Renderer):
+    """
+    Secretary renderer of one ODT template unpacked, prepared and compiled once.
+
+    Filters such as markdown and image work on the state of the renderer (content,
+    template_images...), so each template has its own renderer and a lock: documents
+    of different templates are rendered concurrently, those of a template in turn.
+
+    mtime : modification time of the file when it was compiled
+    archive : content of the archive, except the compiled files
+    sources : prepared XML of the compiled files, before rendering
+    templates : compiled Jinja templates of content.xml and styles.xml
+    """
+    COMPILED_FILES = ('content.xml', 'styles.xml')
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.environment.filters['format_date'] = format_date
+        self.environment.filters['format_datetime'] = format_datetime
+        self.lock = threading.Lock()
+        self.mtime = os.stat(path).st_mtime
+        self.archive = self._unpack_template(path)
+        self.sources = {}
+        self.templates = {}
+        for name in self.COMPILED_FILES:
+            document = parseString(self.archive.pop(name))
+            self._prepare_document_tags(document)
+            source = document.toxml().encode('ascii', 'xmlcharrefreplace')
+            self.sources[name] = source
+            self.templates[name] = self.environment.from_string(
+                self._unescape_entities(source.decode('utf-8'))
+            )
+
+    def render_compiled(self, name, **kwargs):
+        """Render the compiled file name with the context kwargs and return its document."""
+        self.template_images = {}
+        document = parseString(
+            self.templates[name].render(**kwargs).encode('ascii', 'xmlcharrefreplace')
+        )
+        if self.template_images:
+            self.replace_images(document)
+        return document
+
+    def render_context(self, **kwargs):
+        """Render the template with the context kwargs and return its content, as Renderer.render."""
+        with self.lock:
+            self.files = dict(self.archive)
+            self.render_vars = {}
+            self.content = parseString(self.sources['content.xml'])
+            self.manifest = parseString(self.files['META-INF/manifest.xml'])
+            # As secretary, keep the styles added to content by the markdown filter.
+            rendered_content = self.render_compiled('content.xml', **kwargs)
+            self.content.getElementsByTagName('office:document-content')[0].replaceChild(
+                rendered_content.getElementsByTagName('office:body')[0],
+                self.content.getElementsByTagName('office:body')[0]
+            )
+            self.styles = self.render_compiled('styles.xml', **kwargs)
+            for name, document in (
+                    ('content.xml', self.content), ('styles.xml', self.styles),
+                    ('META-INF/manifest.xml', self.manifest)
+            ):
+                self.files[name] = document.toxml().encode('ascii', 'xmlcharrefreplace')
+            return self._pack_document(self.files).getvalue()
+
+
+class CachedRenderer:
+    """
+    Renderer keeping the compiled templates in memory.
+
+    secretary unpacks, parses and compiles the template on every render, which costs
+    more than rendering the context itself. Compiled templates are kept per path and
+    compiled again when the modification time of the file changes.
+    """
+    def __init__(self):
+        self.compiled = {}
+
+    def compile(self, path):
+        """Return the compiled template of path, from the cache if it is up to date."""
+        compiled = self.compiled.get(path)
+        if compiled is None or compiled.mtime != os.stat(path).st_mtime:
+            # Two threads may compile the same template: the last one is kept.
+            compiled = CompiledTemplate(path)
+            self.compiled[path] = compiled
+        return compiled
+
+    def render(self, template, **kwargs):
+        """Render the template at path template with the context kwargs and return its content."""
+        return self.compile(template).render_context(**kwargs)
+
+
+RENDERER = CachedRenderer()
+
+
 class ODTGenerator: # pylint: disable=too-few-public-methods
     """ODT renderer and generator."""
     def __init__(self, filepath, filename):
         self.template = os.path.dirname(__file__) + '/templates/' + filepath
         self.filename = filename
 
+    def render_bytes(self, context):
+        """Render the document using the compiled template and return its content."""
+        return RENDERER.render(self.template, **context)
+
     def render(self, context):
-        """Render the document using secretary."""
-        engine = Renderer()
-        engine.environment.filters['format_date'] = format_date
-        engine.environment.filters['format_datetime'] = format_datetime
-        result = engine.render(self.template, **context)
+        """Render the document and return it in a response, without copying it."""
+        result = self.render_bytes(context)
         response = HttpResponse(
-            content_type='application/vnd.oasis.opendocument.text; charset=UTF-8'
+            result,
+            content_type=ODT_CONTENT_TYPE
         )
         response['Content-Disposition'] = 'inline; filename=' + self.filename
-        with tempfile.NamedTemporaryFile() as output:
-            output.write(result)
-            output.flush()
-            output = open(output.name, 'rb')
-            response.write(output.read())
+        response['Content-Length'] = len(result)
+        response['ETag'] = quote_etag(hashlib.md5(result).hexdigest())
         return response
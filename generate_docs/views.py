@@ -1,6 +1,4 @@
 """Views of generate_docs app."""
-from datetime import datetime
-import csv
 import openpyxl
 
 from django.contrib import messages
@@ -8,12 +6,31 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
 from aloes.acl import admin_required
+from aloes.jobs import enqueue
 from gestion.models import Leasing, Tenant
 
-from .forms import MailingLabelForm
+from .batch import SELECTIONS
+from .documents import DOCUMENTS, DocumentError
+from .forms import BatchDocumentsForm, MailingLabelForm
 from .utils import ODTGenerator
 
 
+def render_document(request, document, obj):
+    """
+    Render document (a key of DOCUMENTS) for obj, a leasing or a tenant.
+
+    A single document renders in the request: the job queue is kept for the batch
+    generation and the exports. Redirect to the profile of the tenant with an error
+    message if the document can not be generated.
+    """
+    try:
+        template, context = DOCUMENTS[document].build(obj, request.user)
+    except DocumentError as error:
+        messages.error(request, str(error))
+        tenant = obj if isinstance(obj, Tenant) else obj.tenant
+        return redirect(reverse('gestion:tenantProfile', kwargs={'pk': tenant.pk}))
+    return template.render(context)
+
 @admin_required
 def apl_infos(request, pk):
     """
@@ -22,11 +39,7 @@ def apl_infos(request, pk):
     pk : primary key of a leasing
     """
     leasing = get_object_or_404(Leasing, pk=pk)
-    template = ODTGenerator(
-        'generate_docs/apl_infos.odt',
-        ('apl_infos_' + leasing.tenant.first_name + leasing.tenant.name + '.odt').replace(" ", "")
-    )
-    return template.render({'leasing': leasing})
+    return render_document(request, "apl_infos", leasing)
 
 @admin_required
 def rent_contract(request, pk):
@@ -36,39 +49,7 @@ def rent_contract(request, pk):
     pk : primary key of a leasing
     """
     leasing = get_object_or_404(Leasing, pk=pk)
-    room = leasing.room
-    tenant = leasing.tenant
-    if leasing.tenant.gender == "M":
-        gender = "M."
-        born_accorded = "né"
-    else:
-        gender = "Mme."
-        born_accorded = "née"
-    floor = str(room)[1]
-    if floor == "0":
-        floor = "Rez de chaussée"
-    elif floor == "1":
-        floor += "er étage"
-    else:
-        floor += "ieme étage"
-    if room.building == "G":
-        template = ODTGenerator(
-            'generate_docs/rent_contract_aloes2.odt',
-            ('contrat_location_' + leasing.tenant.first_name + leasing.tenant.name + '_aloes2.odt').replace(" ", "")
-        )
-    else:
-        template = ODTGenerator(
-            'generate_docs/rent_contract_aloes1.odt',
-            ('contrat_location_' + leasing.tenant.first_name + leasing.tenant.name + '_aloes1.odt').replace(" ", "")
-        )
-    return template.render({
-        'leasing': leasing,
-        'tenant': tenant,
-        'gender': gender,
-        'born_accorded': born_accorded,
-        'room': room,
-        'floor': floor
-    })
+    return render_document(request, "rent_contract", leasing)
 
 @admin_required
 def civil_status(request, pk):
@@ -78,19 +59,7 @@ def civil_status(request, pk):
     pk : primary key of a leasing
     """
     leasing = get_object_or_404(Leasing, pk=pk)
-    tenant = leasing.tenant
-    room = leasing.room
-    total_cheque = room.rent_type.rent + room.rent_type.total_rent + room.rent_type.application_fee
-    template = ODTGenerator(
-        'generate_docs/civil_status.odt',
-        ('etat_civil' + leasing.tenant.first_name + leasing.tenant.name + '.odt').replace(" ", "")
-    )
-    return template.render({
-        'leasing': leasing,
-        'tenant': tenant,
-        'room': room,
-        'total_cheque': total_cheque
-    })
+    return render_document(request, "civil_status", leasing)
 
 @admin_required
 def guarantee(request, pk):
@@ -100,24 +69,7 @@ def guarantee(request, pk):
     pk : a primary key of a leasing
     """
     leasing = get_object_or_404(Leasing, pk=pk)
-    room = leasing.room
-    tenant = leasing.tenant
-    if room.building == "G":
-        address = "2 rue Édouard Belin"
-    else:
-        address = "4 place Édouard Branly"
-    template = ODTGenerator(
-        'generate_docs/guarantee.odt',
-        ('engagement_caution_' + leasing.tenant.first_name + leasing.tenant.name + '.odt').replace(" ", "")
-    )
-    return template.render({
-        'leasing': leasing,
-        'room': room,
-        'address': address,
-        'total_rent': room.rent_type.total_rent,
-        'total_rent_48': room.rent_type.total_rent * 48,
-        'tenant': tenant
-    })
+    return render_document(request, "guarantee", leasing)
 
 @admin_required
 def insurance_expiration(request, pk):
@@ -127,17 +79,7 @@ def insurance_expiration(request, pk):
     pk : a primary key of a leasing
     """
     leasing = get_object_or_404(Leasing, pk=pk)
-    tenant = leasing.tenant
-    template = ODTGenerator(
-        'generate_docs/insurance_expiration.odt',
-        ('expiration_assurance_' + tenant.first_name + tenant.name + '.odt').replace(" ", "")
-    )
-    return template.render({
-        'leasing': leasing,
-        'tenant': tenant,
-        'now': datetime.now(),
-        'user': request.user
-    })
+    return render_document(request, "insurance_expiration", leasing)
 
 @admin_required
 def lease_end_attestation(request, pk):
@@ -147,31 +89,7 @@ def lease_end_attestation(request, pk):
     pk : primary key of a leasing
     """
     leasing = get_object_or_404(Leasing, pk=pk)
-    if leasing.date_of_departure:
-        tenant = leasing.tenant
-        template = ODTGenerator(
-            'generate_docs/lease_end_attestation.odt',
-            ('attestationFinDeBail' + tenant.first_name + tenant.name + '.odt').replace(" ", "")
-        )
-        if tenant.gender == "F":
-            gender = "Mme."
-            born_accorded = "née"
-        else:
-            gender = "M."
-            born_accorded = "né"
-        return template.render({
-            'leasing': leasing,
-            'now':datetime.now(),
-            'tenant': tenant,
-            'user': request.user,
-            'born_accorded': born_accorded,
-            'gender': gender
-        })
-    messages.error(
-        request,
-        "Impossible de générer le document : le locataire n'a pas fini son bail."
-    )
-    return redirect(reverse('gestion:tenantProfile', kwargs={'pk': pk}))
+    return render_document(request, "lease_end_attestation", leasing)
 
 @admin_required
 def lease_attestation(request, pk):
@@ -181,28 +99,7 @@ def lease_attestation(request, pk):
     pk : primary key of a tenant
     """
     tenant = get_object_or_404(Tenant, pk=pk)
-    if tenant.current_leasing:
-        leasing = tenant.current_leasing
-        if tenant.gender == "F":
-            gender = "Mme."
-            born_accorded = "née"
-        else:
-            gender = "M."
-            born_accorded = "né"
-        template = ODTGenerator(
-            'generate_docs/lease_attestation.odt',
-            ('attesationResidence' + tenant.first_name + tenant.name + '.odt').replace(" ", "")
-        )
-        return template.render({
-            'now': datetime.now(),
-            'tenant': tenant,
-            'user': request.user,
-            'born_accorded': born_accorded,
-            'gender': gender,
-            'leasing': leasing
-        })
-    messages.error(request, "Impossible de générer le document : le locataire n'a pas de chambre.")
-    return redirect(reverse('gestion:tenantProfile', kwargs={'pk': pk}))
+    return render_document(request, "lease_attestation", tenant)
 
 @admin_required
 def lease_attestation_english(request, pk):
@@ -212,28 +109,7 @@ def lease_attestation_english(request, pk):
     pk :primary key of a tenant
     """
     tenant = get_object_or_404(Tenant, pk=pk)
-    if tenant.current_leasing:
-        leasing = tenant.current_leasing
-        if tenant.gender == "F":
-            gender = "Mme."
-            born_accorded = "née"
-        else:
-            gender = "M."
-            born_accorded = "né"
-        template = ODTGenerator(
-            'generate_docs/lease_attestation_english.odt',
-            ('attesationResidence' + tenant.first_name + tenant.name + '.odt').replace(" ", "")
-        )
-        return template.render({
-            'now': datetime.now(),
-            'tenant': tenant,
-            'user': request.user,
-            'born_accorded': born_accorded,
-            'gender': gender,
-            'leasing': leasing
-        })
-    messages.error(request, "Impossible de générer le document : le locataire n'a pas de chambre.")
-    return redirect(reverse('gestion:tenantProfile', kwargs={'pk': pk}))
+    return render_document(request, "lease_attestation_english", tenant)
 
 @admin_required
 def tenant_record(request, pk):
@@ -243,19 +119,7 @@ def tenant_record(request, pk):
     pk : primary key of a leasing
     """
     leasing = get_object_or_404(Leasing, pk=pk)
-    tenant = leasing.tenant
-    room = leasing.room
-    template = ODTGenerator(
-        'generate_docs/tenant_record.odt',
-        ('fiche_locataire_' + tenant.first_name + tenant.name + '.odt').replace(" ", "")
-    )
-    return template.render({
-        'leasing': leasing,
-        'tenant': tenant,
-        'room': room,
-        'now': datetime.now()
-    })
-
+    return render_document(request, "tenant_record", leasing)
 
 @admin_required
 def reservation_attestation(request, pk):
@@ -265,14 +129,39 @@ def reservation_attestation(request, pk):
     pk : Primary key of a user
     """
     tenant = get_object_or_404(Tenant, pk=pk)
-    if not tenant.next_leasing:
-        messages.error(request, "Le locataire n'a pas réservé de chambre")
-        return redirect(reverse('gestion:tenantProfile', kwargs={'pk': tenant.pk}))
-    template = ODTGenerator(
-        'generate_docs/reservation_attestation.odt',
-        ('attestation_reservation_' + tenant.first_name + tenant.name + '.odt').replace(" ", "")
-    )
-    return template.render({'tenant': tenant, 'now': datetime.now(), 'user': request.user})
+    return render_document(request, "reservation_attestation", tenant)
+
+@admin_required
+def batch_documents(request):
+    """
+    Queue the generation of a document for a set of leasings into a ZIP archive.
+
+    The archive contains a rapport.csv file with the duration of each document and the
+    leasings for which the document could not be generated.
+    """
+    form = BatchDocumentsForm(request.POST or None)
+    if 'cancel' in request.POST:
+        messages.success(request, "Demande annulée")
+        return redirect(request.POST.get('cancel') or "home")
+    if form.is_valid():
+        document = form.cleaned_data['document']
+        selection = form.cleaned_data['selection']
+        building = form.cleaned_data['building']
+        job = enqueue(
+            "generate_docs.batch",
+            DOCUMENTS[document].label + " - " + SELECTIONS[selection],
+            request.user,
+            document=document,
+            selection=selection,
+            building=None if building == "I" else building
+        )
+        return redirect(reverse('job', kwargs={'pk': job.pk}))
+    return render(request, "form.html", {
+        "form_title": "Génération de documents en lot",
+        "form_icon": "file-archive",
+        "form_button": "Générer",
+        "form": form,
+    })
 
 @admin_required
 def mailing_labels(request):
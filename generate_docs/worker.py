@@ -0,0 +1,17 @@
+"""Entry points of the processes rendering documents in batch.
+
+This module must not import models at load time: it is imported by spawned
+processes before Django is set up.
+"""
+import django
+
+
+def init_worker():
+    """Initialize Django in a worker process."""
+    django.setup()
+
+
+def render_one(document, leasing_pk, user_pk):
+    """Render document for a leasing (see generate_docs.batch.render_one)."""
+    from .batch import render_one as render # pylint: disable=import-outside-toplevel
+    return render(document, leasing_pk, user_pk)
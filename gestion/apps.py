@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class GestionConfig(AppConfig):
     name = 'gestion'
+
+    def ready(self):
+        from .autocomplete import INDEXES, update_sender # pylint: disable=import-outside-toplevel
+        from .reference import MODELS, invalidate_sender # pylint: disable=import-outside-toplevel
+        for model in MODELS:
+            post_save.connect(invalidate_sender, sender=model)
+            post_delete.connect(invalidate_sender, sender=model)
+        for model in INDEXES:
+            post_save.connect(update_sender, sender=model)
+            post_delete.connect(update_sender, sender=model)
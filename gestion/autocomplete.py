@@ -0,0 +1,291 @@
+"""In-memory index of the autocomplete views of rooms and tenants.
+
+Each process keeps the rooms (number) and the tenants (words of the normalized name
+and first name, see normalize_search) in a list of (word, pk) sorted by word: the
+entries beginning with a prefix are found by bisection, without any query. The index
+is built when the WSGI application starts (aloes.wsgi).
+
+The post_save and post_delete signals of Room and Tenant (connected in
+GestionConfig.ready) record each change as an AutocompleteChange after the commit, and
+bump the version of the model (see aloes.versions). Comparing versions reads a file:
+a search makes no query while nothing changed. When the version of its model changed,
+an index reads again the rows changed since the last change it applied, and only them.
+Code writing rooms or tenants without signals (bulk_create, bulk_update,
+queryset.update) must call invalidate: every index is rebuilt in the background, and
+the views run their query meanwhile.
+"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Max
+
+from aloes import versions
+
+from .models import AutocompleteChange, Room, Tenant, normalize_search
+
+# The changes older than the last KEEP_CHANGES are deleted every PRUNE_EVERY changes.
+KEEP_CHANGES = 10000
+PRUNE_EVERY = 1000
+# Changes applied again: a change may be committed after a change of greater key.
+OVERLAP = 20
+# Beyond this number of changed rows, rebuilding the index is cheaper.
+MAX_CHANGED_ROWS = 500
+
+
+def record(model, pk=None):
+    """Record the change of the row pk of model (all rows if None) and bump its version."""
+    change = AutocompleteChange.objects.create(model=model._meta.label_lower, object_pk=pk)
+    if change.pk % PRUNE_EVERY == 0:
+        AutocompleteChange.objects.filter(pk__lte=change.pk - KEEP_CHANGES).delete()
+    versions.bump(version_name(model))
+
+
+def version_name(model):
+    """Return the name of the version of the rows of model."""
+    return "gestion.autocomplete." + model._meta.model_name
+
+
+def result_limit():
+    """Return the maximum number of results of a search."""
+    return getattr(settings, 'AUTOCOMPLETE_LIMIT', 20)
+
+
+class AutocompleteIndex:
+    """Entries of a model by primary key, and their words sorted for prefix searches."""
+    model = None
+    fields = ()
+
+    def __init__(self):
+        self.entries = None
+        self.words = []
+        # Key of the last change applied, and token of the version when it was read.
+        self.version = 0
+        self.token = None
+        self.lock = threading.Lock()
+        self.building = threading.Lock()
+
+    def entry(self, instance):
+        """Return the entry of instance: a dictionary with its label and its "words"."""
+        raise NotImplementedError
+
+    def rank(self, entry, words):
+        """Return the sort key of entry in the results of a search of words."""
+        raise NotImplementedError
+
+    @staticmethod
+    def query_words(query):
+        """Return the words of query as they are indexed."""
+        return normalize_search(query).split()
+
+    def build(self, wait=False):
+        """Read the rows of the model and replace the index (unless already building)."""
+        if not self.building.acquire(blocking=wait):
+            return
+        try:
+            # Read before the rows: a change made meanwhile is applied afterwards.
+            token = versions.current(version_name(self.model)).token
+            last = AutocompleteChange.objects.aggregate(last=Max('pk'))['last'] or 0
+            entries = {
+                instance.pk: self.entry(instance)
+                for instance in self.model.objects.only(*self.fields).iterator()
+            }
+            words = sorted(
+                (word, pk) for pk, entry in entries.items() for word in entry["words"]
+            )
+            with self.lock:
+                self.entries, self.words = entries, words
+                self.version, self.token = last, token
+        except DatabaseError:
+            # Tables not created yet (migrate): the views keep their queries.
+            pass
+        finally:
+            self.building.release()
+
+    def build_in_background(self):
+        """Build the index in a thread of its own, and close the connection of the thread."""
+        try:
+            self.build()
+        finally:
+            connections.close_all()
+
+    def apply_changes(self, token):
+        """
+        Apply the changes recorded since the last one applied, read with the version
+        token. Return False if the index must be rebuilt instead: rows written without
+        signals, changes already deleted, or too many rows changed.
+        """
+        changes = list(AutocompleteChange.objects.filter(
+            model=self.model._meta.label_lower, pk__gt=self.version - OVERLAP
+        ).values_list('pk', 'object_pk'))
+        first = AutocompleteChange.objects.order_by('pk').values_list('pk', flat=True).first()
+        if first is not None and first > self.version + 1:
+            return False
+        if any(object_pk is None for pk, object_pk in changes if pk > self.version):
+            return False
+        pks = {object_pk for _, object_pk in changes if object_pk is not None}
+        if len(pks) > MAX_CHANGED_ROWS:
+            return False
+        instances = self.model.objects.only(*self.fields).filter(pk__in=pks) if pks else []
+        instances = {instance.pk: instance for instance in instances}
+        with self.lock:
+            for pk in pks:
+                self.remove(pk)
+                if pk in instances:
+                    self.add(instances[pk])
+            self.version = max([self.version] + [pk for pk, _ in changes])
+            self.token = token
+        return True
+
+    def refresh(self):
+        """
+        Bring the index up to date with the changes made by every process, and return
+        True if it is warm. A missing index, or one that must be rebuilt, is built in
+        the background and False is returned meanwhile.
+        """
+        token = versions.current(version_name(self.model)).token
+        if self.entries is not None and self.token == token:
+            return True
+        if self.entries is not None and self.building.acquire(blocking=False):
+            try:
+                if self.apply_changes(token):
+                    return True
+            finally:
+                self.building.release()
+        if not self.building.locked():
+            threading.Thread(target=self.build_in_background, daemon=True).start()
+        return False
+
+    def remove(self, pk):
+        """Remove the entry pk from the index (the lock being held)."""
+        former = self.entries.pop(pk, None)
+        if former:
+            for word in former["words"]:
+                index = bisect_left(self.words, (word, pk))
+                if index < len(self.words) and self.words[index] == (word, pk):
+                    del self.words[index]
+
+    def add(self, instance):
+        """Add the entry of instance to the index (the lock being held)."""
+        entry = self.entry(instance)
+        self.entries[instance.pk] = entry
+        for word in entry["words"]:
+            insort(self.words, (word, instance.pk))
+
+    def prefixed(self, prefix):
+        """Return the primary keys of the entries having a word beginning with prefix."""
+        pks = set()
+        index = bisect_left(self.words, (prefix,))
+        while index < len(self.words) and self.words[index][0].startswith(prefix):
+            pks.add(self.words[index][1])
+            index += 1
+        return pks
+
+    def search(self, query, **filters):
+        """
+        Return the (pk, label) of the entries matching query and filters, best first.
+
+        An entry matches if each word of query begins one of its words, and if its
+        values are those of filters. Return None if the index is cold.
+        """
+        if not self.refresh():
+            return None
+        words = self.query_words(query)
+        with self.lock:
+            if words:
+                candidates = (
+                    (pk, self.entries[pk]) for pk in self.prefixed(max(words, key=len))
+                )
+            else:
+                candidates = self.entries.items()
+            matches = [
+                (pk, entry) for pk, entry in candidates
+                if all(entry[field] == value for field, value in filters.items()) and all(
+                    any(word.startswith(query_word) for word in entry["words"])
+                    for query_word in words
+                )
+            ]
+        best = heapq.nsmallest(
+            result_limit(), matches, key=lambda match: self.rank(match[1], words)
+        )
+        return [(pk, entry["label"]) for pk, entry in best]
+
+
+class RoomIndex(AutocompleteIndex):
+    """Index of the rooms by number."""
+    model = Room
+    fields = ('room', 'is_active', 'current_leasing', 'next_leasing')
+
+    def entry(self, instance):
+        return {
+            "label": str(instance),
+            "words": (instance.room.casefold(),),
+            "is_active": instance.is_active,
+            "current_leasing_id": instance.current_leasing_id,
+            "next_leasing_id": instance.next_leasing_id,
+        }
+
+    @staticmethod
+    def query_words(query):
+        # A room number is a single word, punctuation included.
+        return query.casefold().split()[:1]
+
+    def rank(self, entry, words):
+        # The room typed first, then the following numbers.
+        return (entry["words"][0] not in words, entry["words"][0])
+
+
+class TenantIndex(AutocompleteIndex):
+    """Index of the tenants by the words of their name and first name."""
+    model = Tenant
+    fields = (
+        'gender', 'name', 'first_name', 'search_name', 'search_first_name',
+        'current_leasing', 'next_leasing'
+    )
+
+    def entry(self, instance):
+        names = instance.search_name.split()
+        return {
+            "label": str(instance),
+            "names": names,
+            "sort": (instance.search_name, instance.search_first_name, instance.pk),
+            "words": tuple(names + instance.search_first_name.split()),
+            "current_leasing_id": instance.current_leasing_id,
+            "next_leasing_id": instance.next_leasing_id,
+        }
+
+    def rank(self, entry, words):
+        # Whole words first, then the tenants whose name begins like the query.
+        exact = sum(word in entry["words"] for word in words)
+        by_name = any(name.startswith(words[0]) for name in entry["names"]) if words else True
+        return (-exact, not by_name, entry["sort"])
+
+
+ROOMS = RoomIndex()
+
+TENANTS = TenantIndex()
+
+INDEXES = {Room: ROOMS, Tenant: TENANTS}
+
+
+def warm_up():
+    """Build the indexes of this process."""
+    for index in INDEXES.values():
+        index.build(wait=True)
+
+
+def invalidate():
+    """Make every index rebuild itself, after writes made without signals."""
+    def record_all():
+        for model in INDEXES:
+            record(model)
+    transaction.on_commit(record_all)
+
+
+def update_sender(sender, instance, **kwargs): # pylint: disable=unused-argument
+    """Receiver of post_save and post_delete of Room and Tenant."""
+    # Read now: the primary key of a deleted instance is cleared after the signal.
+    pk = instance.pk
+    transaction.on_commit(lambda: record(sender, pk))
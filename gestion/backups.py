@@ -0,0 +1,149 @@
+"""Compressed and rotated backups of the database, made by the gestion.backup job.
+
+The dump made by the connector of django-dbbackup for the database engine is
+compressed with gzip block by block into a temporary file (on disk in DBBACKUP_TMP_DIR
+beyond DBBACKUP_TMP_FILE_MAX_SIZE), then written in the storage of dbbackup
+(DBBACKUP_STORAGE) under its usual name followed by .gz: "dbrestore -z" restores it.
+
+The compressed backups are then rotated. The last backup of each of the last days,
+weeks and months having a backup is kept, as many as BACKUP_RETENTION says. The others
+are deleted. A gap in the backups (server stopped) thus never deletes the older ones.
+"""
+import gzip
+import logging
+import tempfile
+import time
+from collections import namedtuple
+
+from dbbackup import settings as dbbackup_settings
+from dbbackup import utils as dbbackup_utils
+from dbbackup.db.base import get_connector
+from dbbackup.storage import get_storage
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from django.utils.formats import number_format
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION = {
+    "daily": 7,
+    "weekly": 4,
+    "monthly": 12,
+}
+
+PERIODS = {
+    "daily": lambda date: date.date(),
+    "weekly": lambda date: date.isocalendar()[:2],
+    "monthly": lambda date: (date.year, date.month),
+}
+
+BLOCK_SIZE = 1 << 20
+
+BackupReport = namedtuple(
+    'BackupReport', ['filename', 'size', 'compressed_size', 'duration', 'deleted']
+)
+BackupReport.__doc__ = """
+Report of a backup.
+
+size, compressed_size : sizes of the dump in bytes, before and after compression
+duration : duration of the dump, compression and writing in seconds
+deleted : names of the former backups deleted by the rotation
+"""
+
+
+def retention():
+    """Return the number of backups kept by period: BACKUP_RETENTION over the defaults."""
+    return dict(DEFAULT_RETENTION, **getattr(settings, 'BACKUP_RETENTION', {}))
+
+
+def to_keep(dates, kept=None):
+    """
+    Return the dates, among the dates of backups, whose backups are kept: the last one of
+    each of the kept[period] last periods (see PERIODS) having a backup.
+    """
+    kept = retention() if kept is None else kept
+    keep = set()
+    for period, count in kept.items():
+        seen = set()
+        for date in sorted(dates, reverse=True):
+            key = PERIODS[period](date)
+            if key in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(key)
+            keep.add(date)
+    return keep
+
+
+def compress(source, output, filename):
+    """Write source compressed with gzip in output, and return the size of source."""
+    size = 0
+    with gzip.GzipFile(filename=filename, fileobj=output, mode="wb") as compressed:
+        for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+            compressed.write(block)
+            size += len(block)
+    return size
+
+
+def rotate(storage, database_name):
+    """
+    Delete the compressed backups of database_name not kept by to_keep; return their names.
+
+    Files whose name has no valid date (copied by hand...) are left alone.
+    """
+    dates = {}
+    for filename in storage.list_backups(
+            compressed=True, content_type='db', database=database_name
+    ):
+        try:
+            date = dbbackup_utils.filename_to_date(filename)
+        except ValueError:
+            date = None
+        if date is not None:
+            dates[filename] = date
+    keep = to_keep(set(dates.values()))
+    deleted = sorted(filename for filename, date in dates.items() if date not in keep)
+    for filename in deleted:
+        storage.delete_file(filename)
+    return deleted
+
+
+def backup():
+    """Make a compressed backup of the database, rotate the backups and return a BackupReport."""
+    start = time.monotonic()
+    connector = get_connector()
+    storage = get_storage()
+    filename = connector.generate_filename()
+    with tempfile.SpooledTemporaryFile(
+            max_size=dbbackup_settings.TMP_FILE_MAX_SIZE, dir=dbbackup_settings.TMP_DIR
+    ) as output:
+        dump = connector.create_dump()
+        try:
+            size = compress(dump, output, filename)
+        finally:
+            dump.close()
+        compressed_size = output.tell()
+        output.seek(0)
+        storage.write_file(output, filename + ".gz")
+    report = BackupReport(
+        filename + ".gz", size, compressed_size, time.monotonic() - start,
+        rotate(storage, connector.database_name)
+    )
+    logger.info(
+        "Backup %s: %d bytes, %d compressed, in %.1fs, %d deleted",
+        report.filename, report.size, report.compressed_size, report.duration,
+        len(report.deleted)
+    )
+    return report
+
+
+def describe(report):
+    """Return the summary of report shown on the page of the job."""
+    summary = "%s : %s (%s avant compression), en %s s." % (
+        report.filename, filesizeformat(report.compressed_size),
+        filesizeformat(report.size), number_format(report.duration, 1)
+    )
+    if report.deleted:
+        summary += "\nAnciennes sauvegardes supprimées : " + ", ".join(report.deleted)
+    return summary
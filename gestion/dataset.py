@@ -0,0 +1,242 @@
+"""Generation of a synthetic residence, to develop and benchmark without the real data.
+
+Every room has a history of leasings going back a number of years: the tenants stay
+one to four school years, some of them then move into another room, some rooms stay
+empty for a while, and some current tenants leaving at the end of the year already
+have a successor (next leasing). The tenants which are not needed by the histories
+have no room. Everything is written with
+bulk_create and explicit primary keys, in one transaction.
+"""
+import random
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from . import autocomplete, reference
+from .legacy import reset_sequences
+from .models import Leasing, Renovation, Rent, Room, RoomOccupancy, School, Tenant
+
+BUILDINGS = "ABCDEFG"
+
+FLOORS = 5
+
+FIRST_NAMES = {
+    "M": ["Adrien", "Baptiste", "Clément", "Émile", "Hugo", "Jérôme", "Louis", "Mathéo",
+          "Nathan", "Théo", "Yanis", "Zoran"],
+    "F": ["Agathe", "Camille", "Chloé", "Élise", "Hélène", "Inès", "Léa", "Manon",
+          "Noémie", "Sarah", "Zoé", "Anaïs"],
+}
+
+LAST_NAMES = ["Bernard", "Dubois", "Durand", "Fournier", "Girard", "Lefèvre", "Martin",
+              "Mercier", "Morel", "Petit", "Roux", "Thomas", "Vincent", "N'Diaye", "Nguyen"]
+
+CITIES = [("Metz", "57000", "57"), ("Nancy", "54000", "54"), ("Rennes", "35000", "35"),
+          ("Lyon", "69003", "69"), ("Strasbourg", "67000", "67"), ("Lille", "59000", "59")]
+
+RENOVATIONS = [
+    ("Non rénovée", "#FF0000"),
+    ("Partiellement rénovée", "#FFA500"),
+    ("Rénovée", "#00AA00"),
+    ("Neuve", "#0000FF"),
+]
+
+PAYMENTS = [choice for choice, _ in Leasing.PAYMENT_CHOICES]
+
+
+def school_year_start(year):
+    """Return the first day of the school year beginning in year."""
+    return date(year, 9, 1)
+
+
+def room_names(count):
+    """Return count room names: building, floor and number ("A012", "G415")."""
+    per_floor = -(-count // (len(BUILDINGS) * FLOORS))
+    width = max(2, len(str(per_floor - 1)))
+    return [
+        "%s%d%0*d" % (building, floor, width, number)
+        for building in BUILDINGS
+        for floor in range(FLOORS)
+        for number in range(per_floor)
+    ][:count]
+
+
+class DatasetGenerator:
+    """
+    Generate a residence of rooms rooms and at least tenants tenants, with years years
+    of history. Generating twice with the same seed gives the same data.
+    """
+    def __init__(self, rooms=3000, tenants=20000, years=15, schools=40, seed=0, log=None):
+        self.rooms = rooms
+        self.tenants = tenants
+        self.years = years
+        self.schools = schools
+        self.random = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.today = date.today()
+        self.objects = {model: [] for model in (School, Renovation, Rent, Tenant, Room, Leasing)}
+        # Tenants having left a room at the end of a school year (by year), who can move
+        # into another room at the beginning of the next one.
+        self.movers = {}
+
+    @staticmethod
+    def flush():
+        """Delete the rooms, tenants, leasings, rents, renovations and schools."""
+        with transaction.atomic():
+            Room.objects.update(current_leasing=None, next_leasing=None)
+            Tenant.objects.update(current_leasing=None, next_leasing=None)
+            for model in (Leasing, Tenant, RoomOccupancy, Room, Rent, Renovation, School):
+                model.objects.all().delete()
+
+    def run(self):
+        """Generate and write the residence, then return the number of objects by model."""
+        self.build_references()
+        self.build_rooms()
+        while len(self.objects[Tenant]) < self.tenants:
+            self.new_tenant(None)
+        with transaction.atomic():
+            # Tenants and rooms point to leasings written after them: the foreign keys
+            # are only checked at the end of the transaction.
+            for model, objects in self.objects.items():
+                model.objects.bulk_create(objects)
+                self.log("%-10s %7d" % (model.__name__, len(objects)))
+            reset_sequences([School, Renovation, Rent, Tenant, Room, Leasing])
+            RoomOccupancy.update_rooms(room.pk for room in self.objects[Room])
+            reference.invalidate()
+            autocomplete.invalidate()
+        return {model.__name__: len(objects) for model, objects in self.objects.items()}
+
+    def build_references(self):
+        """Build schools, renovation levels and rent types."""
+        self.objects[School] = [
+            School(pk=pk, name="École %d" % pk) for pk in range(1, self.schools + 1)
+        ]
+        self.objects[Renovation] = [
+            Renovation(pk=pk, name=name, description="", color=color)
+            for pk, (name, color) in enumerate(RENOVATIONS, 1)
+        ]
+        self.objects[Rent] = [
+            Rent(
+                pk=pk,
+                type="T%d" % pk,
+                rent=230 + 35 * pk,
+                service=15,
+                charges=30,
+                application_fee=50,
+                surface=9 + 3 * pk
+            ) for pk in range(1, 7)
+        ]
+
+    def build_rooms(self):
+        """Build the rooms and the history of their leasings."""
+        for pk, name in enumerate(room_names(self.rooms), 1):
+            room = Room(
+                pk=pk,
+                lot=pk,
+                room=name,
+                rent_type=self.random.choice(self.objects[Rent]),
+                renovation=self.random.choice(self.objects[Renovation]),
+                is_active=self.random.random() > 0.02
+            )
+            self.objects[Room].append(room)
+            if room.is_active:
+                self.build_history(room)
+
+    def build_history(self, room):
+        """Build the leasings of room, from the oldest one to the current and next ones."""
+        first_year = self.today.year - self.years
+        year = first_year + self.random.randint(0, 1)
+        current_year = self.today.year if self.today.month >= 9 else self.today.year - 1
+        while year <= current_year:
+            if self.random.random() < 0.05:
+                # The room stays empty for a year.
+                year += 1
+                continue
+            stay = self.random.choice((1, 1, 2, 2, 3, 4))
+            if self.movers.get(year) and self.random.random() < 0.15:
+                tenant = self.movers[year].pop()
+            else:
+                tenant = self.new_tenant(year)
+            leasing = self.new_leasing(room, tenant, school_year_start(year))
+            if year + stay <= current_year:
+                leasing.date_of_departure = school_year_start(year + stay) - timedelta(days=1)
+                tenant.date_of_departure = leasing.date_of_departure
+                self.movers.setdefault(year + stay, []).append(tenant)
+            elif self.random.random() < 0.97:
+                room.current_leasing_id = tenant.current_leasing_id = leasing.pk
+                tenant.leaving = self.random.random() < 0.15
+                tenant.temporary = self.random.random() < 0.05
+                if tenant.leaving and self.random.random() < 0.5:
+                    successor = self.new_tenant(current_year + 1)
+                    next_leasing = self.new_leasing(room, successor, None)
+                    room.next_leasing_id = successor.next_leasing_id = next_leasing.pk
+                return
+            else:
+                # Left during the year, the room is empty.
+                leasing.date_of_departure = self.today - timedelta(days=self.random.randint(1, 60))
+                tenant.date_of_departure = leasing.date_of_departure
+                return
+            year += stay
+
+    def new_tenant(self, year):
+        """Build a tenant entering the residence in year (None if never)."""
+        pk = len(self.objects[Tenant]) + 1
+        gender = self.random.choice("MF")
+        city, zipcode, departement = self.random.choice(CITIES)
+        tenant = Tenant(
+            pk=pk,
+            name="%s%d" % (self.random.choice(LAST_NAMES), pk),
+            first_name=self.random.choice(FIRST_NAMES[gender]),
+            gender=gender,
+            school=self.random.choice(self.objects[School]),
+            school_year=self.random.randint(1, 5),
+            date_of_entry=school_year_start(year) if year else None,
+            cellphone="06%08d" % self.random.randint(0, 99999999),
+            birthday=date((year or self.today.year) - self.random.randint(18, 24), 1, 1) +
+            timedelta(days=self.random.randint(0, 364)),
+            birthcity=city,
+            birthdepartement=departement,
+            birthcountry="France",
+            street_number=str(self.random.randint(1, 120)),
+            street="rue Édouard Belin",
+            zipcode=zipcode,
+            city=city,
+            country="France",
+            email="locataire%d@example.org" % pk,
+            waterproof_undersheet=self.random.random() < 0.5,
+            pillow=self.random.random() < 0.5,
+            pillowcase=self.random.random() < 0.5,
+            blanket=self.random.random() < 0.5,
+            sheet=self.random.random() < 0.5,
+        )
+        # bulk_create does not call save, which fills the search fields.
+        tenant.update_search_fields()
+        self.objects[Tenant].append(tenant)
+        return tenant
+
+    def new_leasing(self, room, tenant, date_of_entry):
+        """Build a leasing of tenant in room."""
+        leasing = Leasing(
+            pk=len(self.objects[Leasing]) + 1,
+            room_id=room.pk,
+            tenant_id=tenant.pk,
+            bail=room.rent_type.rent,
+            payment=self.random.choice(PAYMENTS),
+            rib=self.random.random() < 0.9,
+            insuranceDeadline=date_of_entry and date_of_entry + timedelta(days=365),
+            contract_signed=date_of_entry is not None,
+            contract_date=date_of_entry and date_of_entry - timedelta(days=20),
+            caution_rib=self.random.random() < 0.9,
+            idgarant=self.random.random() < 0.9,
+            payinslip=self.random.random() < 0.8,
+            tax_notice=self.random.random() < 0.8,
+            stranger=self.random.random() < 0.1,
+            guarantee=self.random.random() < 0.9,
+            photo=self.random.random() < 0.9,
+            internal_rules_signed=self.random.random() < 0.9,
+            school_certificate=self.random.random() < 0.9,
+            debit_authorization=self.random.random() < 0.7,
+            issue=self.random.random() < 0.03,
+            date_of_entry=date_of_entry,
+        )
+        self.objects[Leasing].append(leasing)
+        return leasing
@@ -0,0 +1,92 @@
+"""Exports of gestion app, built with the export engine of aloes."""
+from aloes.export import Column, Export, Section
+
+from .models import Room, RoomOccupancy, Tenant
+
+ROOM_COLORS = {
+    Room.EMPTY_CC: "#ffeeba",
+    Room.TEMPORARY_CC: "#b8daff",
+    Room.LEAVING_CC: "#c3e6cb",
+    Room.PROBLEM_CC: "#f5c6cb",
+    "other_tenant": "#f5c6cb",
+}
+
+
+def tenant_display(gender, first_name, name):
+    """Same as Tenant.__str__, from values."""
+    return ("M." if gender == "M" else "Mme.") + " " + first_name + " " + name
+
+
+def with_email(name, email):
+    """Return tenant name followed by its email."""
+    if not name:
+        return "Pas de locataire actuel"
+    return name + "(" + (email or "") + ")"
+
+
+def room_columns(tenant_column):
+    """Return the columns of rooms, with tenant_column as second column."""
+    return [
+        Column('Chambre (lot)', ('room_name',)),
+        tenant_column,
+        Column('Réservation', ('next_tenant_name',), lambda name: name or "Pas réservée"),
+        Column('Réparation', ('renovation_name',), lambda name: name or "Non indiqué"),
+        Column('Loyer', ('rent_label',), lambda label: label or "Non indiqué"),
+        Column('Observations', ('observations',)),
+        Column('Statut', ('color_class',), lambda cc: Room.COLOR_CLASS_LABELS.get(cc, "")),
+    ]
+
+
+def other_tenants_section(tenants):
+    """Return the section listing tenants without room."""
+    return Section(
+        tenants,
+        [
+            Column('Chambre (lot)', (), lambda: "Pas de chambre"),
+            Column('Locataire', ('gender', 'first_name', 'name'), tenant_display),
+            Column('Réservation'),
+            Column('Réparation'),
+            Column('Loyer'),
+            Column('Observations'),
+            Column('Statut', (), lambda: "Sans chambre"),
+        ],
+        color=Column('', (), lambda: "other_tenant")
+    )
+
+
+def search_export(rooms, other_tenants):
+    """Export of the result of the search form (RoomOccupancy and Tenant querysets)."""
+    return Export(
+        "export",
+        [
+            Section(
+                rooms,
+                room_columns(Column(
+                    'Locataire',
+                    ('current_tenant_name',),
+                    lambda name: name or "Pas de locataire actuel"
+                )),
+                color=Column('', ('color_class',))
+            ),
+            other_tenants_section(other_tenants),
+        ],
+        colors=ROOM_COLORS
+    )
+
+
+def full_export():
+    """Export of all rooms with email of tenants, and all tenants without room."""
+    return Export(
+        "export",
+        [
+            Section(
+                RoomOccupancy.objects.order_by('room_name'),
+                room_columns(Column(
+                    'Locataire (email)',
+                    ('current_tenant_name', 'room__current_leasing__tenant__email'),
+                    with_email
+                )),
+            ),
+            other_tenants_section(Tenant.objects.filter(current_leasing=None)),
+        ]
+    )
@@ -3,15 +3,18 @@ from dal import autocomplete
 import json
 from django import forms
 
+from aloes.form import VersionedModelForm
 from aloes.widgets import DatePicker
 
-from .models import Leasing, Renovation, Room, School, Tenant
+from .models import Leasing, Renovation, Room, Tenant
+from .reference import ReferenceChoiceField
 
 
 class SearchForm(forms.Form):
     """Search form wich is displayed in sidebar."""
     SORTING_CHOICES = (
         ('room', 'Chambre'),
+        ('lot', 'Lot'),
         ('first_name', 'Prénom'),
         ('last_name', 'Nom'),
     )
@@ -68,7 +71,7 @@ class SearchForm(forms.Form):
         label="",
         required=False
     )
-    renovation = forms.ModelChoiceField(
+    renovation = ReferenceChoiceField(
         queryset=Renovation.objects.all(),
         label="Renovation",
         required=False
@@ -118,12 +121,13 @@ class CreateTenantForm(forms.ModelForm):
             'email',
             'phone'
         ]
+        field_classes = {'school': ReferenceChoiceField}
         widgets = {
             'date_of_entry': DatePicker(),
             'birthday': DatePicker(),
         }
 
-class TenantForm(forms.ModelForm):
+class TenantForm(VersionedModelForm):
     """Form to edit a tenant."""
     class Meta:
         model = Tenant
@@ -156,6 +160,7 @@ class TenantForm(forms.ModelForm):
             'leaving',
             'blanket',
         ]
+        field_classes = {'school': ReferenceChoiceField}
         widgets = {
             'date_of_entry': DatePicker(),
             'date_of_departure': DatePicker(),
@@ -163,7 +168,7 @@ class TenantForm(forms.ModelForm):
         }
 
 
-class RoomForm(forms.ModelForm):
+class RoomForm(VersionedModelForm):
     """Class to create and edit a room."""
     class Meta:
         model = Room
@@ -175,8 +180,12 @@ class RoomForm(forms.ModelForm):
             'observations',
             'map',
         ]
+        field_classes = {
+            'rent_type': ReferenceChoiceField,
+            'renovation': ReferenceChoiceField,
+        }
 
-class LeasingForm(forms.ModelForm):
+class LeasingForm(VersionedModelForm):
     """Class to edit a leasing."""
     class Meta:
         model = Leasing
@@ -223,6 +232,13 @@ class LeaveForm(forms.ModelForm):
             'date_of_departure': DatePicker()
         }
 
+class AddOneYearForm(forms.Form):
+    """Form to confirm the rollover of the school year."""
+    reset_leaving = forms.BooleanField(
+        required=False,
+        label="Réinitialiser les indicateurs « Sur le départ » des résidents"
+    )
+
 class DateForm(forms.Form):
     """A generic dateform."""
     date = forms.DateField(widget=DatePicker(), required=True)
@@ -266,15 +282,29 @@ class RoomMoveInDirectForm(forms.Form):
     date = forms.DateField(widget=DatePicker(), required=True)
 
 class ImportTenantForm(forms.Form):
-    """Load json data to create a tenant."""
-    jsonfield = forms.CharField(max_length=32768, label="Données JSON")
+    """Load json data (pasted or uploaded) to create one or several tenants."""
+    jsonfield = forms.CharField(
+        widget=forms.Textarea,
+        label="Données JSON",
+        required=False
+    )
+    file = forms.FileField(label="Fichier JSON", required=False)
 
-    def clean_jsonfield(self):
-        """Clean field"""
-        jdata = self.cleaned_data['jsonfield']
+    def clean(self):
+        """Return the list of records of the pasted data or of the file."""
+        cleaned_data = super().clean()
+        if cleaned_data.get("file"):
+            data = cleaned_data["file"].read()
+        elif cleaned_data.get("jsonfield"):
+            data = cleaned_data["jsonfield"]
+        else:
+            raise forms.ValidationError("Copiez-collez les données JSON ou choisissez un fichier")
         try:
-            json_data = json.loads(jdata)
-            return json_data
-        except:
-           raise forms.ValidationError("Invalid data in jsonfield")
+            records = json.loads(data)
+        except ValueError:
+            raise forms.ValidationError("Les données ne sont pas au format JSON")
+        if not isinstance(records, list):
+            records = [records]
+        cleaned_data["records"] = records
+        return cleaned_data
             
\ No newline at end of file
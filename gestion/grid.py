@@ -0,0 +1,168 @@
+"""Search of the main page (the grid of rooms), and its pages for incremental loading.
+
+The grid is read by pages in the order of the room numbers or of the lots, with
+keyset pagination: a page begins after the sort key of the last row of the previous
+one (the cursor), so that every page costs the same, however far it is. The rooms
+are followed by the tenants without room matching a name search, ordered by pk.
+Rows are lists of values, whose names are given by COLUMNS.
+"""
+import json
+
+from django.db.models import Q
+
+from .exports import tenant_display
+from .models import RoomOccupancy, Tenant
+
+COLUMNS = (
+    "room_id", "room_name", "lot", "color_class", "current_tenant_pk", "current_tenant_name",
+    "observations", "renovation_name", "renovation_color", "next_tenant_pk",
+    "next_tenant_name", "rent_label",
+)
+
+TENANT_COLUMNS = ("pk", "name")
+
+ORDERS = {
+    "room": ("room_name",),
+    "lot": ("lot", "room_name"),
+}
+
+PAGE_SIZE = 100
+
+MAX_PAGE_SIZE = 500
+
+NAME_FILTERS = (
+    ('last_name', ("search_name",)),
+    ('first_name', ("search_first_name",)),
+    ('name', ("search_name", "search_first_name")),
+)
+
+
+def search(data):
+    """
+    Return the rooms (RoomOccupancy) and the tenants without room matching data, the
+    cleaned_data of a SearchForm, in the order it asks.
+    """
+    res = RoomOccupancy.objects.all()
+    other_tenants = Tenant.objects.none()
+    tenants = Tenant.objects.all()
+    searched_name = False
+    for form_field, search_fields in NAME_FILTERS:
+        if data[form_field]:
+            tenants = tenants.filter(Tenant.search_filter(data[form_field], search_fields))
+            searched_name = True
+    if searched_name:
+        tenant_pks = tenants.values('pk')
+        res = res.filter(Q(current_tenant_pk__in=tenant_pks) | Q(next_tenant_pk__in=tenant_pks))
+        other_tenants = tenants.filter(current_leasing=None).filter(next_leasing=None)
+    if data['observations']:
+        res = res.filter(observations__icontains=data['observations'])
+    if data['room']:
+        res = res.filter(room_name__istartswith=data['room'])
+    if data['lot']:
+        res = res.filter(lot=data['lot'])
+    if data['gender'] != "I":
+        res = res.filter(current_tenant_gender=data['gender'])
+    if data['school']:
+        res = res.filter(current_tenant_school__icontains=data['school'])
+    if data['empty_rooms_only']:
+        res = res.filter(current_tenant_pk=None)
+    if data['exclude_temporary']:
+        res = res.filter(current_tenant_temporary=False)
+    if data['exclude_empty_rooms']:
+        res = res.exclude(current_tenant_pk=None)
+    if data['renovation']:
+        res = res.filter(room__renovation=data['renovation'])
+    if data['building'] != "I":
+        res = res.filter(room_name__istartswith=data['building'])
+    if data['sort'] in ORDERS:
+        res = res.order_by(*ORDERS[data['sort']])
+    if data['sort'] == "first_name":
+        res = res.order_by("current_tenant_first_name")
+    if data['sort'] == "last_name":
+        res = res.order_by("current_tenant_last_name")
+    return res, other_tenants
+
+
+def default_rooms():
+    """Return the rooms of the main page without search: the active ones."""
+    return RoomOccupancy.objects.filter(is_active=True).order_by(*ORDERS["room"])
+
+
+def as_dicts(rows, columns):
+    """Return rows (lists of values) as dictionaries, for the templates."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def all_rows(rooms, other_tenants):
+    """Return the whole grid like page, for the orders without keyset (tenant names)."""
+    tenants = other_tenants.order_by('pk').values_list('pk', 'gender', 'first_name', 'name')
+    return {
+        "rooms": list(rooms.values_list(*COLUMNS)),
+        "tenants": [(row[0], tenant_display(*row[1:])) for row in tenants],
+        "next": None,
+    }
+
+
+def encode_cursor(kind, values):
+    """Return the cursor of the row of kind ("room" or "tenant") having values as key."""
+    return json.dumps([kind] + list(values), separators=(",", ":"))
+
+
+def decode_cursor(cursor):
+    """Return (kind, values) of cursor, or raise ValueError."""
+    decoded = json.loads(cursor)
+    if not isinstance(decoded, list) or not decoded or decoded[0] not in ("room", "tenant"):
+        raise ValueError("Invalid cursor")
+    # Key values are strings, integers or null: anything else would fail in the query.
+    if any(
+            value is not None and (isinstance(value, bool) or not isinstance(value, (str, int)))
+            for value in decoded[1:]
+    ):
+        raise ValueError("Invalid cursor")
+    return decoded[0], decoded[1:]
+
+
+def after(queryset, fields, values):
+    """Filter queryset to the rows whose fields come after values, in this order."""
+    if len(values) != len(fields):
+        raise ValueError("Invalid cursor")
+    condition = Q()
+    for index, field in enumerate(fields):
+        step = Q(**{field + "__gt": values[index]})
+        for previous, value in zip(fields[:index], values):
+            step &= Q(**{previous: value})
+        condition |= step
+    return queryset.filter(condition)
+
+
+def page(rooms, other_tenants, order="room", cursor=None, size=PAGE_SIZE):
+    """
+    Return a page of the grid: a dictionary with the rows of "rooms" and of "tenants"
+    and the "next" cursor (None on the last page).
+
+    rooms and other_tenants are the querysets of search. Raise ValueError if the
+    cursor is invalid.
+    """
+    fields = ORDERS[order]
+    kind, values = decode_cursor(cursor) if cursor else ("room", None)
+    result = {"rooms": [], "tenants": [], "next": None}
+    if kind == "room":
+        rooms = rooms.order_by(*fields)
+        if values is not None:
+            rooms = after(rooms, fields, values)
+        rows = list(rooms.values_list(*COLUMNS)[:size + 1])
+        result["rooms"] = rows[:size]
+        if len(rows) > size:
+            last = dict(zip(COLUMNS, rows[size - 1]))
+            result["next"] = encode_cursor("room", [last[field] for field in fields])
+            return result
+        size -= len(result["rooms"])
+        values = None
+    tenants = other_tenants.order_by('pk')
+    if values is not None:
+        tenants = after(tenants, ("pk",), values)
+    rows = list(tenants.values_list('pk', 'gender', 'first_name', 'name')[:size + 1])
+    result["tenants"] = [(row[0], tenant_display(*row[1:])) for row in rows[:size]]
+    if len(rows) > size:
+        result["next"] = encode_cursor("tenant", [rows[size - 1][0]] if size else [0])
+    return result
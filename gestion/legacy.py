@@ -0,0 +1,515 @@
+"""Import of the data of the former software, exported as a JSON file (data.json).
+
+The file is an object whose keys are the tables of the former software ("ecoles",
+"loyer", "locataire", "chambre", "dossier", "historique"), each one an array of
+records. It is read by chunks (see stream_records) once per stage, so that the memory
+used does not depend on the size of the dump. Foreign keys are resolved with
+dictionaries built from the database at the beginning of each stage, and records are
+written with bulk_create by batches, each batch in a transaction. The number of
+records of the stage already written is saved in a checkpoint file after each batch:
+an interrupted import starts again from there.
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import autocomplete, reference
+from .models import Leasing, Renovation, Rent, Room, RoomOccupancy, School, Tenant
+
+STAGES = ("renovations", "schools", "rents", "tenants", "rooms", "leasings", "history")
+
+DEDUPLICATED_STAGES = ("renovations", "schools")
+
+PAYMENTS = {
+    "P": "direct_debit",
+    "V": "bank_transfer",
+    "C": "check",
+    "E": "cash",
+    "S": "special",
+    "": "special",
+    " ": "special"
+}
+
+UNKNOWN_SCHOOL = "École inconnue"
+
+
+class LegacyImportError(Exception):
+    """Raised when the JSON file can not be read."""
+
+
+def stream_records(path, sections, chunk_size=1 << 16):
+    """
+    Yield (section, record) for each record of the arrays named in sections.
+
+    path is read by chunks of chunk_size characters; only one record is decoded at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as data:
+        reader = ChunkReader(data, decoder, chunk_size)
+        reader.expect("{")
+        while reader.peek() != "}":
+            key = reader.decode()
+            reader.expect(":")
+            if reader.peek() != "[":
+                reader.decode()
+            else:
+                reader.expect("[")
+                while reader.peek() != "]":
+                    record = reader.decode()
+                    if key in sections:
+                        yield key, record
+                    if reader.peek() == ",":
+                        reader.expect(",")
+                reader.expect("]")
+            if reader.peek() == ",":
+                reader.expect(",")
+
+
+class ChunkReader:
+    """Decode JSON values one by one from a text file read by chunks."""
+    def __init__(self, data, decoder, chunk_size):
+        self.data = data
+        self.decoder = decoder
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        """Read the next chunk, dropping what was already decoded."""
+        chunk = self.data.read(self.chunk_size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+
+    def peek(self):
+        """Return the next non blank character, without consuming it."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                raise LegacyImportError("Fin de fichier inattendue")
+            self.fill()
+
+    def expect(self, char):
+        """Consume char, which must be the next non blank character."""
+        if self.peek() != char:
+            raise LegacyImportError(
+                "'" + char + "' attendu, '" + self.buffer[self.position] + "' trouvé"
+            )
+        self.position += 1
+
+    def decode(self):
+        """Decode and return the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                if self.eof:
+                    raise LegacyImportError(str(error))
+            else:
+                # A number may continue in the next chunk.
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            self.fill()
+
+
+def reset_sequences(models):
+    """Reset the sequences of the tables of models, written with explicit primary keys."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def legacy_date(value):
+    """Return value, or None for the empty dates of the former software (0000-00-00)."""
+    if not value or "0000" in value:
+        return None
+    return value
+
+
+def flag(value):
+    """Return the boolean stored as "0" or "1"."""
+    return bool(int(value))
+
+
+def batches(records, size):
+    """Yield lists of size records (the last one may be shorter)."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """File storing the stage being imported and the number of records already written."""
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return (stage, records done), or (None, 0) if there is no checkpoint."""
+        try:
+            with open(self.path) as checkpoint:
+                state = json.load(checkpoint)
+        except FileNotFoundError:
+            return None, 0
+        return state["stage"], state["done"]
+
+    def save(self, stage, done):
+        """Record that done records of stage are written."""
+        with open(self.path + ".tmp", "w") as checkpoint:
+            json.dump({"stage": stage, "done": done}, checkpoint)
+        os.replace(self.path + ".tmp", self.path)
+
+    def clear(self):
+        """Delete the checkpoint once the import is finished."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class LegacyImporter:
+    """
+    Import a dump of the former software, stage by stage (see STAGES).
+
+    Each stage has a records_<stage> method yielding the source records and a
+    write_<stage> method writing a batch of them. stats maps each stage to
+    (records, seconds) and ignored counts the records which could not be imported.
+    """
+    def __init__(self, path, batch_size=1000, checkpoint=None, log=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint or path + ".checkpoint")
+        self.log = log or (lambda message: None)
+        self.stats = OrderedDict()
+        self.ignored = {"tenant": 0, "room": 0}
+        self.maps = {}
+
+    def run(self):
+        """Run the stages not finished yet, then rebuild what bulk_create skips."""
+        stage, done = self.checkpoint.load()
+        if stage is not None:
+            self.log("Reprise à l'étape " + stage + " après " + str(done) + " enregistrements")
+        start = STAGES.index(stage) if stage else 0
+        for current in STAGES[start:]:
+            self.run_stage(current, done if current == stage else 0)
+        reset_sequences([Renovation, School, Rent, Tenant, Room, Leasing])
+        RoomOccupancy.update_rooms(Room.objects.values_list('pk', flat=True))
+        reference.invalidate()
+        autocomplete.invalidate()
+        self.checkpoint.clear()
+        return self.stats
+
+    def run_stage(self, stage, skip):
+        """Write the records of stage by batches, after the skip first ones."""
+        if stage in DEDUPLICATED_STAGES:
+            # Their records are filtered with the database, which already has the skipped ones.
+            skip = 0
+        begin = time.monotonic()
+        getattr(self, "prepare_" + stage)()
+        records = getattr(self, "records_" + stage)()
+        write = getattr(self, "write_" + stage)
+        done = 0
+        for batch in batches(records, self.batch_size):
+            if done + len(batch) > skip:
+                with transaction.atomic():
+                    write(batch[max(skip - done, 0):])
+            done += len(batch)
+            self.checkpoint.save(stage, done)
+        written = max(done - skip, 0)
+        duration = time.monotonic() - begin
+        self.stats[stage] = (written, duration)
+        self.log("%-12s %7d enregistrements en %6.2fs (%.0f/s)" % (
+            stage, written, duration, written / duration if duration else 0
+        ))
+
+    def section(self, name):
+        """Yield the records of the section name."""
+        for _, record in stream_records(self.path, (name,)):
+            yield record
+
+    ########## Renovations ##########
+
+    def prepare_renovations(self):
+        """Load the existing renovation names."""
+        self.maps["renovations"] = set(Renovation.objects.values_list('name', flat=True))
+
+    def records_renovations(self):
+        """Yield the renovation levels used by rooms, once."""
+        for room in self.section("chambre"):
+            if room["Renovation"] not in self.maps["renovations"]:
+                self.maps["renovations"].add(room["Renovation"])
+                yield room["Renovation"]
+
+    def write_renovations(self, names): # pylint: disable=no-self-use
+        """Create renovation levels."""
+        Renovation.objects.bulk_create([
+            Renovation(name=name, description="Niveau de rénovation " + name) for name in names
+        ])
+
+    ########## Schools ##########
+
+    def prepare_schools(self):
+        """Load the existing school names."""
+        self.maps["schools"] = set(School.objects.values_list('name', flat=True))
+
+    def records_schools(self):
+        """Yield the names of schools and of the schools of tenants, once."""
+        for section, record in stream_records(self.path, ("ecoles", "locataire")):
+            name = (record["Ecole"] if section == "ecoles" else record["Ecole_et_Annee"]) \
+                or UNKNOWN_SCHOOL
+            if name not in self.maps["schools"]:
+                self.maps["schools"].add(name)
+                yield name
+
+    def write_schools(self, names): # pylint: disable=no-self-use
+        """Create schools."""
+        School.objects.bulk_create([School(name=name) for name in names])
+
+    ########## Rents ##########
+
+    def prepare_rents(self):
+        """Nothing to load: rents keep their primary key."""
+
+    def records_rents(self):
+        """Yield the rent types."""
+        return self.section("loyer")
+
+    def write_rents(self, rents): # pylint: disable=no-self-use
+        """Create rent types with their former code as primary key."""
+        Rent.objects.bulk_create([
+            Rent(
+                pk=rent["CodeGenre"],
+                type=rent["Genre"],
+                rent=rent["Loyer"],
+                service=rent["Supplement"],
+                charges=rent["Charges"],
+                application_fee=rent["FraisDossier"],
+                surface=rent["Superficie"]
+            ) for rent in rents
+        ])
+
+    ########## Tenants ##########
+
+    def prepare_tenants(self):
+        """Load the primary keys of schools by name."""
+        self.maps["schools"] = dict(School.objects.values_list('name', 'pk'))
+
+    def records_tenants(self):
+        """Yield the tenants."""
+        return self.section("locataire")
+
+    def write_tenants(self, tenants):
+        """Create tenants with their former code as primary key."""
+        new_tenants = []
+        for tenant in tenants:
+            new_tenant = Tenant(
+                pk=int(tenant["CodeLocataire"]),
+                name=tenant["Nom"],
+                first_name=tenant["Prenom"],
+                gender=tenant["Sexe"],
+                school_id=self.maps["schools"][tenant["Ecole_et_Annee"] or UNKNOWN_SCHOOL],
+                date_of_entry=legacy_date(tenant["DateEntreeRez"]),
+                date_of_departure=legacy_date(tenant["DateSortieRez"]),
+                observations=tenant["Observations"],
+                temporary=flag(tenant["Passager"]),
+                cellphone=tenant["Mobile"].replace(" ", "")[:10],
+                leaving=flag(tenant["Va_partir"]),
+                waterproof_undersheet=flag(tenant["alese"]),
+                pillow=flag(tenant["oreiller"]),
+                pillowcase=flag(tenant["taie"]),
+                blanket=flag(tenant["couverture"]),
+                sheet=flag(tenant["drap"]),
+                birthday=legacy_date(tenant["DateNaissance"]),
+                birthcity=tenant["VilleNaissance"],
+                birthdepartement=tenant["DeptNaissance"],
+                birthcountry=tenant["PaysNaissance"],
+                street_number=tenant["N"] or None,
+                street=tenant["Rue"],
+                zipcode=int(tenant["CP"]),
+                city=tenant["Ville"],
+                country=tenant["Pays"],
+                email=tenant["Email"],
+                phone=tenant["Fixe"].replace(" ", "")[:10],
+            )
+            # bulk_create does not call save, which fills the search fields.
+            new_tenant.update_search_fields()
+            new_tenants.append(new_tenant)
+        Tenant.objects.bulk_create(new_tenants)
+
+    ########## Rooms ##########
+
+    def prepare_rooms(self):
+        """Load the primary keys of renovations by name."""
+        self.maps["renovations"] = dict(Renovation.objects.values_list('name', 'pk'))
+
+    def records_rooms(self):
+        """Yield the rooms."""
+        return self.section("chambre")
+
+    def write_rooms(self, rooms):
+        """Create rooms."""
+        Room.objects.bulk_create([
+            Room(
+                lot=room["Lot"],
+                room=room["Chambre"].replace(" ", ""),
+                rent_type_id=room["CodeGenre"],
+                renovation_id=self.maps["renovations"][room["Renovation"]],
+                observations=room["Observations"]
+            ) for room in rooms
+        ])
+
+    ########## Leasings ##########
+
+    def next_leasing_pk(self):
+        """Return a new primary key for a leasing (bulk_create does not return them)."""
+        self.maps["leasing_pk"] += 1
+        return self.maps["leasing_pk"]
+
+    def prepare_leasings(self):
+        """Load tenants, rooms by lot and the lot of each tenant."""
+        self.maps["tenants"] = set(Tenant.objects.values_list('pk', flat=True))
+        self.maps["rooms"] = dict(Room.objects.values_list('lot', 'pk'))
+        self.maps["lots"] = {
+            int(tenant["CodeLocataire"]): int(tenant["Lot"]) for tenant in self.section("locataire")
+        }
+        self.maps["leasing_pk"] = Leasing.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def records_leasings(self):
+        """Yield the current leasings."""
+        return self.section("dossier")
+
+    def room_of_lot(self, lot):
+        """Return the primary key of the room of lot, created if it does not exist."""
+        if lot not in self.maps["rooms"]:
+            room = Room.objects.create(lot=lot, room=("?" + str(lot))[:6], rent_type_id=1)
+            self.maps["rooms"][lot] = room.pk
+        return self.maps["rooms"][lot]
+
+    def write_leasings(self, leasings):
+        """Create current leasings and make them the current leasing of their tenant and room."""
+        new_leasings = []
+        tenants = {}
+        rooms = {}
+        now = timezone.now()
+        for leasing in leasings:
+            tenant_pk = int(leasing["CodeLocataire"])
+            if tenant_pk not in self.maps["tenants"]:
+                self.ignored["tenant"] += 1
+                continue
+            room_pk = self.room_of_lot(self.maps["lots"][tenant_pk])
+            new_leasing = Leasing(
+                pk=self.next_leasing_pk(),
+                tenant_id=tenant_pk,
+                room_id=room_pk,
+                bail=leasing["Caution"],
+                apl=legacy_date(leasing["APL"]),
+                payment=PAYMENTS[leasing["Reglement"]],
+                rib=flag(leasing["RIB"]),
+                insuranceDeadline=legacy_date(leasing["EcheanceAssurance"]),
+                contract_signed=flag(leasing["ContratSigne"]),
+                contract_date=legacy_date(leasing["DateContrat"]),
+                caution_rib=flag(leasing["CautionRIB"]),
+                idgarant=flag(leasing["IdGarant"]),
+                payinslip=flag(leasing["bulletinSalaire"]),
+                tax_notice=flag(leasing["AvisImposition"]),
+                stranger=flag(leasing["Etranger"]),
+                caf=leasing["CAF"],
+                residence_certificate=flag(leasing["CertifDom"]),
+                check_guarantee=flag(leasing["ChequeGarantie"]),
+                guarantee=leasing["Garantie"] != "0.00",
+                issue=flag(leasing["Probleme"]),
+                missing_documents=leasing["documentsnonfournis"] or ""
+            )
+            new_leasings.append(new_leasing)
+            tenants[tenant_pk] = Tenant(
+                pk=tenant_pk, current_leasing_id=new_leasing.pk, updated_at=now
+            )
+            rooms[room_pk] = Room(pk=room_pk, current_leasing_id=new_leasing.pk, updated_at=now)
+        Leasing.objects.bulk_create(new_leasings)
+        # bulk_update does not set updated_at (auto_now).
+        Tenant.objects.bulk_update(tenants.values(), ['current_leasing', 'updated_at'])
+        Room.objects.bulk_update(rooms.values(), ['current_leasing', 'updated_at'])
+
+    ########## History ##########
+
+    def prepare_history(self):
+        """Load the current leasing (and its room) of tenants and rooms by lot."""
+        self.maps["tenants"] = {
+            pk: (leasing_pk, room_pk) for pk, leasing_pk, room_pk in Tenant.objects.values_list(
+                'pk', 'current_leasing', 'current_leasing__room'
+            )
+        }
+        self.maps["rooms"] = dict(Room.objects.values_list('lot', 'pk'))
+        self.maps["leasing_pk"] = Leasing.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def records_history(self):
+        """Yield the previous leasings."""
+        return self.section("historique")
+
+    def write_history(self, previous_leasings):
+        """Create previous leasings, or set the dates of the current leasing they describe."""
+        new_leasings = []
+        current_leasings = {}
+        for previous_leasing in previous_leasings:
+            tenant_pk = int(previous_leasing["CodeLocataire"])
+            room_pk = self.maps["rooms"].get(int(previous_leasing["CodeChambre"]))
+            if tenant_pk not in self.maps["tenants"]:
+                self.ignored["tenant"] += 1
+                continue
+            if room_pk is None:
+                self.ignored["room"] += 1
+                continue
+            current_leasing_pk, current_room_pk = self.maps["tenants"][tenant_pk]
+            leasing = Leasing(
+                tenant_id=tenant_pk,
+                room_id=room_pk,
+                date_of_entry=legacy_date(previous_leasing["DateEntreeChambre"]),
+                date_of_departure=legacy_date(previous_leasing["DateSortieChambre"])
+            )
+            if current_leasing_pk and current_room_pk == room_pk:
+                leasing.pk = current_leasing_pk
+                current_leasings[current_leasing_pk] = leasing
+            else:
+                leasing.pk = self.next_leasing_pk()
+                new_leasings.append(leasing)
+        Leasing.objects.bulk_create(new_leasings)
+        now = timezone.now()
+        for leasing in current_leasings.values():
+            leasing.updated_at = now
+        # bulk_update does not set updated_at (auto_now).
+        Leasing.objects.bulk_update(
+            current_leasings.values(),
+            ['date_of_entry', 'date_of_departure', 'updated_at']
+        )
+
+
+def check_bails(path):
+    """Yield the current leasings whose bail does not fit in the database (ex validate_data)."""
+    for _, leasing in stream_records(path, ("dossier",)):
+        if len(leasing["Caution"].split(".")[0]) > 3:
+            yield leasing
+
+
+def reservations(path):
+    """Yield (room, reservation) for the rooms reserved in the former software."""
+    for _, room in stream_records(path, ("chambre",)):
+        if room["Reservation"]:
+            yield room["Chambre"], room["Reservation"]
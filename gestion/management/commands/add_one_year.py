@@ -0,0 +1,29 @@
+"""Command adding one to the school year of current and next residents."""
+from django.core.management.base import BaseCommand
+
+from gestion.models import Tenant
+
+
+class Command(BaseCommand):
+    """Roll the school year of residents over, or preview it with --dry-run."""
+    help = "Add one to the school year of current and next residents"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset-leaving',
+            action='store_true',
+            help="Also clear the leaving flags of residents"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only count the tenants which would be modified"
+        )
+
+    def handle(self, *args, **options):
+        counts = Tenant.add_one_year(options['reset_leaving'], options['dry_run'])
+        prefix = "[simulation] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            "%s%d locataires augmentés d'une année, %d sans année d'étude, %d plus sur le départ"
+            % (prefix, counts["promoted"], counts["skipped"], counts["leaving"])
+        ))
@@ -0,0 +1,79 @@
+"""Command importing the data of the former software (replaces migration.py)."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.legacy import (LegacyImporter, LegacyImportError, check_bails,
+                            reservations)
+
+
+class Command(BaseCommand):
+    """Import data.json by batches, resuming an interrupted import from its checkpoint."""
+    help = "Import the JSON dump of the former software"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='data.json', help="JSON dump to import")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of records written in each transaction"
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file (path of the dump + .checkpoint by default)"
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help="Ignore the checkpoint of a previous run"
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only list the leasings whose bail is too large, without importing"
+        )
+        parser.add_argument(
+            '--reservations',
+            action='store_true',
+            help="Only list the rooms reserved in the former software, without importing"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['check']:
+                for leasing in check_bails(options['path']):
+                    self.stdout.write(
+                        "Caution invalide, locataire " + leasing["CodeLocataire"] + " : " +
+                        leasing["Caution"]
+                    )
+                return
+            if options['reservations']:
+                for room, reservation in reservations(options['path']):
+                    self.stdout.write("Chambre " + room + " - " + reservation)
+                return
+            importer = LegacyImporter(
+                options['path'],
+                options['batch_size'],
+                options['checkpoint'],
+                self.stdout.write
+            )
+            if options['restart']:
+                importer.checkpoint.clear()
+            start = time.monotonic()
+            stats = importer.run()
+        except (OSError, LegacyImportError) as error:
+            raise CommandError(str(error))
+        records = sum(count for count, _ in stats.values())
+        duration = time.monotonic() - start
+        self.stdout.write(
+            str(importer.ignored["tenant"]) +
+            " opérations ont été ignorées car le locataire était introuvable"
+        )
+        self.stdout.write(
+            str(importer.ignored["room"]) +
+            " opérations ont été ignorées car la chambre était introuvable"
+        )
+        self.stdout.write(self.style.SUCCESS("%d enregistrements importés en %.2fs (%.0f/s)" % (
+            records, duration, records / duration if duration else 0
+        )))
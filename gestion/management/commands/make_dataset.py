@@ -0,0 +1,50 @@
+"""Command generating a synthetic residence (see gestion.dataset)."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.dataset import DatasetGenerator
+from gestion.models import Room, Tenant
+
+
+class Command(BaseCommand):
+    """Fill an empty database (or one emptied with --flush) with a synthetic residence."""
+    help = "Generate a synthetic residence: rooms, tenants, leasings, rents and renovations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=3000, help="Number of rooms")
+        parser.add_argument(
+            '--tenants',
+            type=int,
+            default=20000,
+            help="Minimum number of tenants (more are created if the histories need them)"
+        )
+        parser.add_argument('--years', type=int, default=15, help="Years of history")
+        parser.add_argument('--schools', type=int, default=40, help="Number of schools")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator")
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help="Delete the existing rooms, tenants, leasings, rents, renovations and schools"
+        )
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            DatasetGenerator.flush()
+        elif Room.objects.exists() or Tenant.objects.exists():
+            raise CommandError(
+                "La base contient déjà des chambres ou des locataires : utiliser --flush"
+            )
+        generator = DatasetGenerator(
+            rooms=options['rooms'],
+            tenants=options['tenants'],
+            years=options['years'],
+            schools=options['schools'],
+            seed=options['seed'],
+            log=self.stdout.write
+        )
+        start = time.monotonic()
+        counts = generator.run()
+        self.stdout.write(self.style.SUCCESS("%d objets créés en %.2fs" % (
+            sum(counts.values()), time.monotonic() - start
+        )))
@@ -0,0 +1,140 @@
+"""Command writing a synthetic dump in the format of the former software."""
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+
+def school_record(i):
+    """Return a record of the ecoles table."""
+    return {"Ecole": "École %d" % i}
+
+
+def rent_record(i):
+    """Return a record of the loyer table."""
+    return {
+        "CodeGenre": str(i),
+        "Genre": "Type %d" % i,
+        "Loyer": "%d.00" % (250 + 20 * i),
+        "Supplement": "15.00",
+        "Charges": "30.00",
+        "FraisDossier": "50.00",
+        "Superficie": "%d.50" % (12 + i),
+    }
+
+
+def room_record(lot, rents):
+    """Return a record of the chambre table."""
+    return {
+        "Lot": str(lot),
+        "Chambre": "%s%03d" % ("ABCDEFG"[lot % 7], lot // 7),
+        "CodeGenre": str(1 + lot % rents),
+        "Renovation": str(1 + lot % 3),
+        "Observations": "",
+        "Reservation": "",
+    }
+
+
+def tenant_record(code, lot, schools):
+    """Return a record of the locataire table."""
+    return {
+        "CodeLocataire": str(code),
+        "Lot": str(lot),
+        "Nom": "Nom%d" % code,
+        "Prenom": random.choice(["Émile", "Hélène", "Jérôme", "Zoé"]),
+        "Sexe": random.choice("MF"),
+        "Ecole_et_Annee": "École %d" % (code % schools) if code % 10 else "",
+        "DateEntreeRez": "2015-09-01",
+        "DateSortieRez": "0000-00-00",
+        "Observations": "",
+        "Passager": "0",
+        "Mobile": "06 12 34 56 78",
+        "Va_partir": str(int(code % 13 == 0)),
+        "alese": "1", "oreiller": "0", "taie": "0", "couverture": "1", "drap": "1",
+        "DateNaissance": "1998-03-12",
+        "VilleNaissance": "Rennes",
+        "DeptNaissance": "35",
+        "PaysNaissance": "France",
+        "N": "2",
+        "Rue": "rue Édouard Belin",
+        "CP": "57070",
+        "Ville": "Metz",
+        "Pays": "France",
+        "Email": "locataire%d@example.org" % code,
+        "Fixe": "",
+    }
+
+
+def leasing_record(code):
+    """Return a record of the dossier table."""
+    return {
+        "CodeLocataire": str(code),
+        "Caution": "500.00",
+        "APL": "0000-00-00",
+        "Reglement": random.choice("PVCES "),
+        "RIB": "1",
+        "EcheanceAssurance": "2020-09-30",
+        "ContratSigne": "1",
+        "DateContrat": "2019-08-20",
+        "CautionRIB": "1", "IdGarant": "1", "bulletinSalaire": "0", "AvisImposition": "1",
+        "Etranger": "0",
+        "CAF": "",
+        "CertifDom": "0", "ChequeGarantie": "1",
+        "Garantie": "0.00",
+        "Probleme": "0",
+        "documentsnonfournis": "",
+    }
+
+
+def history_record(code, lot, year):
+    """Return a record of the historique table."""
+    return {
+        "CodeLocataire": str(code),
+        "CodeChambre": str(lot),
+        "DateEntreeChambre": "%d-09-01" % year,
+        "DateSortieChambre": "%d-06-30" % (year + 1),
+    }
+
+
+class Command(BaseCommand):
+    """Write a dump with one current leasing per room and previous leasings up to --leasings."""
+    help = "Write a synthetic dump of the former software to benchmark import_legacy"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Path of the JSON file to write")
+        parser.add_argument('--leasings', type=int, default=50000, help="Number of leasings")
+        parser.add_argument('--rooms', type=int, default=1000, help="Number of rooms")
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        rooms = options['rooms']
+        leasings = max(options['leasings'], rooms)
+        schools = 20
+        rents = 5
+        # Tenant code of leasing i: the last rooms tenants are the current ones.
+        tables = [
+            ("ecoles", (school_record(i) for i in range(schools))),
+            ("loyer", (rent_record(i) for i in range(1, rents + 1))),
+            ("chambre", (room_record(lot, rents) for lot in range(1, rooms + 1))),
+            ("locataire", (
+                tenant_record(code, 1 + code % rooms, schools) for code in range(1, leasings + 1)
+            )),
+            ("dossier", (leasing_record(code) for code in range(leasings - rooms + 1, leasings + 1))),
+            ("historique", (
+                history_record(code, 1 + code % rooms, 2000 + code * 18 // leasings)
+                for code in range(1, leasings + 1)
+            )),
+        ]
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.write("{")
+            for i, (name, records) in enumerate(tables):
+                output.write((",\n" if i else "\n") + json.dumps(name) + ": [")
+                for j, record in enumerate(records):
+                    output.write((",\n" if j else "\n") + json.dumps(record, ensure_ascii=False))
+                output.write("\n]")
+            output.write("\n}\n")
+        self.stdout.write(self.style.SUCCESS(
+            "%d locataires, %d chambres, %d dossiers écrits dans %s" % (
+                leasings, rooms, leasings, options['output']
+            )
+        ))
@@ -0,0 +1,35 @@
+"""Command moving every tenant having a next leasing into its room."""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.autocomplete import invalidate
+from gestion.models import Leasing
+
+
+class Command(BaseCommand):
+    """Do all the move-ins of next tenants at a date, or preview them with --dry-run."""
+    help = "Move every tenant having a next leasing into its room"
+
+    def add_arguments(self, parser):
+        parser.add_argument('date', help="Date of entry (YYYY-MM-DD)")
+        parser.add_argument('--dry-run', action='store_true', help="Only print the report")
+
+    def handle(self, *args, **options):
+        try:
+            date = datetime.strptime(options['date'], "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError("Date invalide : " + options['date'])
+        report = Leasing.move_in_all(date, options['dry_run'])
+        if not options['dry_run']:
+            invalidate()
+        for move_in in report:
+            self.stdout.write("%-6s %-40s %s" % (
+                move_in.room, move_in.tenant, "OK" if move_in.moved else move_in.reason
+            ))
+        moved = sum(1 for move_in in report if move_in.moved)
+        self.stdout.write(self.style.SUCCESS(
+            "%s%d emménagements, %d bloqués" % (
+                "[simulation] " if options['dry_run'] else "", moved, len(report) - moved
+            )
+        ))
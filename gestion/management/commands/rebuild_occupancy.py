@@ -0,0 +1,17 @@
+"""Command to rebuild the snapshot table of the main page."""
+from django.core.management.base import BaseCommand
+
+from gestion.models import Room, RoomOccupancy
+
+
+class Command(BaseCommand):
+    """Rebuild RoomOccupancy for every room.
+
+    Useful after modifications made outside of gestion views (admin site, shell).
+    """
+    help = "Rebuild the occupancy snapshot of every room"
+
+    def handle(self, *args, **options):
+        pks = Room.objects.values_list('pk', flat=True)
+        RoomOccupancy.update_rooms(pks)
+        self.stdout.write(self.style.SUCCESS(str(len(pks)) + " chambres mises à jour"))
@@ -0,0 +1,87 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def tenant_display(tenant):
+    """Same as Tenant.__str__, which is not available on historical models."""
+    pre = "M." if tenant.gender == "M" else "Mme."
+    return pre + " " + tenant.first_name + " " + tenant.name
+
+
+def color_class(room):
+    """Same as Room.color_class, which is not available on historical models."""
+    if room.current_leasing:
+        if room.current_leasing.issue:
+            return "table-danger"
+        if room.current_leasing.tenant.leaving:
+            return "table-success"
+        if room.current_leasing.tenant.temporary:
+            return "table-primary"
+        return ""
+    return "table-warning"
+
+
+def fill_occupancies(apps, schema_editor):
+    """Build the snapshot of every existing room."""
+    Room = apps.get_model('gestion', 'Room')
+    RoomOccupancy = apps.get_model('gestion', 'RoomOccupancy')
+    rooms = Room.objects.select_related(
+        'current_leasing__tenant',
+        'next_leasing__tenant',
+        'renovation',
+        'rent_type'
+    )
+    occupancies = []
+    for room in rooms:
+        current_tenant = room.current_leasing.tenant if room.current_leasing else None
+        next_tenant = room.next_leasing.tenant if room.next_leasing else None
+        occupancies.append(RoomOccupancy(
+            room=room,
+            room_name=room.room,
+            lot=room.lot,
+            is_active=room.is_active,
+            observations=room.observations,
+            current_tenant_pk=current_tenant.pk if current_tenant else None,
+            current_tenant_name=tenant_display(current_tenant) if current_tenant else "",
+            next_tenant_pk=next_tenant.pk if next_tenant else None,
+            next_tenant_name=tenant_display(next_tenant) if next_tenant else "",
+            renovation_name=room.renovation.name if room.renovation else "",
+            renovation_color=room.renovation.color if room.renovation else "",
+            rent_label=room.rent_type.type + " (" + str(room.rent_type.surface) + " m2)",
+            color_class=color_class(room),
+        ))
+    RoomOccupancy.objects.bulk_create(occupancies)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0002_auto_20190702_2247'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomOccupancy',
+            fields=[
+                ('room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='gestion.Room', verbose_name='Chambre')),
+                ('room_name', models.CharField(db_index=True, max_length=6, verbose_name='Chambre')),
+                ('lot', models.PositiveIntegerField(verbose_name='Lot')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Chambre active ?')),
+                ('observations', models.TextField(blank=True, verbose_name='Observations')),
+                ('current_tenant_pk', models.PositiveIntegerField(blank=True, null=True)),
+                ('current_tenant_name', models.CharField(blank=True, max_length=255, verbose_name='Locataire actuel')),
+                ('next_tenant_pk', models.PositiveIntegerField(blank=True, null=True)),
+                ('next_tenant_name', models.CharField(blank=True, max_length=255, verbose_name='Locataire suivant')),
+                ('renovation_name', models.CharField(blank=True, max_length=255, verbose_name='Niveau de rénovation')),
+                ('renovation_color', models.CharField(blank=True, max_length=18, verbose_name='Couleur')),
+                ('rent_label', models.CharField(blank=True, max_length=255, verbose_name='Loyer')),
+                ('color_class', models.CharField(blank=True, max_length=20, verbose_name='Statut')),
+            ],
+            options={
+                'verbose_name': 'Occupation',
+            },
+        ),
+        migrations.RunPython(fill_occupancies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:48
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def normalize_search(value):
+    """Same as gestion.models.normalize_search when this migration was written."""
+    value = unicodedata.normalize('NFKD', value or "")
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", " ", value.casefold()).strip()
+
+
+def fill_search_fields(apps, schema_editor):
+    """Fill the search columns of existing tenants, BATCH_SIZE tenants by UPDATE."""
+    Tenant = apps.get_model('gestion', 'Tenant')
+    batch = []
+    for tenant in Tenant.objects.only('pk', 'name', 'first_name').iterator(BATCH_SIZE):
+        tenant.search_name = normalize_search(tenant.name)
+        tenant.search_first_name = normalize_search(tenant.first_name)
+        batch.append(tenant)
+        if len(batch) == BATCH_SIZE:
+            Tenant.objects.bulk_update(batch, ['search_name', 'search_first_name'])
+            batch = []
+    Tenant.objects.bulk_update(batch, ['search_name', 'search_first_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0003_roomoccupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='search_first_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='search_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0004_tenant_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leasing',
+            index=models.Index(fields=['room', 'date_of_entry'], name='gestion_lea_room_id_8476f2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leasing',
+            index=models.Index(fields=['tenant', 'date_of_entry'], name='gestion_lea_tenant__38e3ff_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0005_leasing_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roomoccupancy',
+            index=models.Index(fields=['lot', 'room_name'], name='gestion_roo_lot_846e58_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0006_occupancy_lot_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leasing',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Dernière modification'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Dernière modification'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Dernière modification'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.28 on 2026-10-19 09:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_tenant_columns(apps, schema_editor):
+    """Copy the current tenant of every room into its snapshot, with a single UPDATE."""
+    Room = apps.get_model('gestion', 'Room')
+    RoomOccupancy = apps.get_model('gestion', 'RoomOccupancy')
+    rooms = Room.objects.filter(pk=OuterRef('room_id'))
+
+    def tenant(field):
+        return Subquery(rooms.values('current_leasing__tenant__' + field)[:1])
+
+    RoomOccupancy.objects.update(
+        current_tenant_last_name=Coalesce(tenant('name'), Value("")),
+        current_tenant_first_name=Coalesce(tenant('first_name'), Value("")),
+        current_tenant_gender=Coalesce(tenant('gender'), Value("")),
+        current_tenant_school=Coalesce(tenant('school__name'), Value("")),
+        current_tenant_temporary=tenant('temporary'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='current_tenant_first_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='current_tenant_gender',
+            field=models.CharField(blank=True, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='current_tenant_last_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='current_tenant_school',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='roomoccupancy',
+            name='current_tenant_temporary',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.RunPython(fill_tenant_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    """Create the single row of the version."""
+    AutocompleteVersion = apps.get_model('gestion', 'AutocompleteVersion')
+    AutocompleteVersion.objects.create(pk=1, value=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0009_occupancy_tenant_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutocompleteVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': "Version de l'autocomplétion",
+            },
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
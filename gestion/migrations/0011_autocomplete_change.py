@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0010_autocomplete_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutocompleteChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_pk', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': "Modification pour l'autocomplétion",
+            },
+        ),
+        migrations.DeleteModel(
+            name='AutocompleteVersion',
+        ),
+        migrations.AddIndex(
+            model_name='autocompletechange',
+            index=models.Index(fields=['model', 'id'], name='gestion_aut_model_dcd24b_idx'),
+        ),
+    ]
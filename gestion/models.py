@@ -1,9 +1,27 @@
 """Models of gestion app."""
+import re
+import unicodedata
+from collections import OrderedDict, namedtuple
+
 from colorfield.fields import ColorField
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from aloes.models import VersionedModel
+
+
+def normalize_search(value):
+    """Return value folded to lower case, without accents and with words separated by one space.
+
+    Used to fill and query the search columns of tenants.
+    """
+    value = unicodedata.normalize('NFKD', value or "")
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", " ", value.casefold()).strip()
 
 
-class School(models.Model):
+class School(VersionedModel):
     """Store a school."""
     class Meta:
         verbose_name = "Ecole"
@@ -12,7 +30,7 @@ class School(models.Model):
     def __str__(self):
         return self.name
 
-class Renovation(models.Model):
+class Renovation(VersionedModel):
     """Store a renovation level."""
     name = models.CharField(max_length=255, verbose_name="Nom du niveau")
     description = models.TextField()
@@ -21,7 +39,7 @@ class Renovation(models.Model):
     def __str__(self):
         return self.name
 
-class Rent(models.Model):
+class Rent(VersionedModel):
     """Store a rent type."""
     class Meta:
         verbose_name = "Loyer"
@@ -50,7 +68,7 @@ class Rent(models.Model):
         """Return the total rent which is the rent + supplements."""
         return self.rent + self.supplements
 
-class Tenant(models.Model):
+class Tenant(VersionedModel):
     """Store a tenant."""
     class Meta:
         verbose_name = "Locataire"
@@ -119,6 +137,14 @@ class Tenant(models.Model):
         null=True,
         related_name="next_tenant"
     )
+    search_name = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    search_first_name = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
 
     def __str__(self):
         if self.gender == "M":
@@ -127,6 +153,76 @@ class Tenant(models.Model):
             pre = "Mme."
         return pre + " " + self.first_name + " " + self.name
 
+    def save(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        self.update_search_fields()
+        super().save(*args, **kwargs)
+
+    def update_search_fields(self):
+        """Fill search_name and search_first_name from name and first_name."""
+        self.search_name = normalize_search(self.name)
+        self.search_first_name = normalize_search(self.first_name)
+
+    @staticmethod
+    def search_filter(value, fields=("search_name", "search_first_name")):
+        """Return a Q object matching tenants for which each word of value is the beginning
+        of a word of one of the search fields (case and accent insensitive).
+        """
+        query = models.Q()
+        for word in normalize_search(value).split():
+            word_query = models.Q()
+            for field in fields:
+                word_query |= models.Q(**{field + "__startswith": word})
+                word_query |= models.Q(**{field + "__contains": " " + word})
+            query &= word_query
+        return query
+
+    @classmethod
+    def residents(cls):
+        """Return the current and next residents."""
+        return cls.objects.filter(
+            models.Q(current_leasing__isnull=False) | models.Q(next_leasing__isnull=False)
+        )
+
+    @classmethod
+    def add_one_year(cls, reset_leaving=False, dry_run=False):
+        """
+        Add one to the school year of current and next residents, in one transaction.
+
+        Former residents and tenants without school year are left untouched. If
+        reset_leaving is True, the "leaving" flags of residents are cleared for the new year.
+        Return a dictionary with the number of tenants promoted, skipped (no school year)
+        and whose leaving flag is (or would be with dry_run) cleared.
+        """
+        residents = cls.residents()
+        if dry_run:
+            counts = residents.aggregate(
+                promoted=models.Count('pk', filter=models.Q(school_year__isnull=False)),
+                skipped=models.Count('pk', filter=models.Q(school_year__isnull=True)),
+                leaving=models.Count('pk', filter=models.Q(leaving=True)),
+            )
+            if not reset_leaving:
+                counts["leaving"] = 0
+            return counts
+        counts = {"leaving": 0}
+        # queryset.update does not set updated_at (auto_now) nor version.
+        now = timezone.now()
+        version = models.F('version') + 1
+        with transaction.atomic():
+            counts["promoted"] = residents.filter(school_year__isnull=False).update(
+                school_year=models.F('school_year') + 1,
+                updated_at=now,
+                version=version
+            )
+            counts["skipped"] = residents.filter(school_year__isnull=True).count()
+            if reset_leaving:
+                counts["leaving"] = residents.filter(leaving=True).update(
+                    leaving=False,
+                    updated_at=now,
+                    version=version
+                )
+                RoomOccupancy.reset_leaving()
+        return counts
+
     @property
     def room(self):
         """Return current room (if exists)."""
@@ -141,21 +237,20 @@ class Tenant(models.Model):
             return self.next_leasing.room
         return None
 
+    @cached_property
+    def timeline(self):
+        """Return the Timeline of the leasings of the tenant (see Leasing.timeline)."""
+        return Leasing.timeline(self)
+
     @property
     def previous_leasings(self):
         """Return all leasings of the tenant, except for current and next (if they exist)."""
-        leasings = Leasing.objects.filter(tenant=self)
-        if self.current_leasing:
-            leasings = leasings.exclude(pk=self.current_leasing.pk)
-        if self.next_leasing:
-            leasings = leasings.exclude(pk=self.next_leasing.pk)
-        return leasings.order_by('-date_of_entry')
+        return self.timeline.previous
 
     @property
     def previous_rooms(self):
-        """Return all roomss of the tenant, excpet for current and next (if they exist)."""
-        pks = [leasing.room.pk for leasing in self.previous_leasings]
-        return Room.objects.filter(pk__in=pks)
+        """Return all rooms of the tenant, except for current and next (if they exist)."""
+        return list(OrderedDict.fromkeys(leasing.room for leasing in self.previous_leasings))
 
     @property
     def civil_status_completed(self):
@@ -184,13 +279,20 @@ class Tenant(models.Model):
         return (bool(self.civil_status_completed) and bool(self.birth_completed)
                 and bool(self.address_completed) and bool(self.phone_mail_completed))
 
-class Room(models.Model):
+class Room(VersionedModel):
     """Store a room."""
     EMPTY_CC = "table-warning"
     TEMPORARY_CC = "table-primary"
     LEAVING_CC = "table-success"
     PROBLEM_CC = "table-danger"
     NONE_CC = ""
+    COLOR_CLASS_LABELS = {
+        EMPTY_CC: "Vide",
+        TEMPORARY_CC: "Passager",
+        LEAVING_CC: "Sur le départ",
+        PROBLEM_CC: "Problème",
+        NONE_CC: "",
+    }
 
     class Meta:
         verbose_name = "Chambre"
@@ -224,6 +326,7 @@ class Room(models.Model):
         related_name="next_rooms"
     )
     is_active = models.BooleanField(default=True, verbose_name="Chambre active ?")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
 
     def __str__(self):
         return self.room
@@ -248,21 +351,20 @@ class Room(models.Model):
         else:
             return Leasing
 
+    @cached_property
+    def timeline(self):
+        """Return the Timeline of the leasings of the room (see Leasing.timeline)."""
+        return Leasing.timeline(self)
+
     @property
     def previous_leasings(self):
         """Return all leasings of the room, except for current and next (if they exist)."""
-        leasings = Leasing.objects.filter(room=self)
-        if self.current_leasing:
-            leasings = leasings.exclude(pk=self.current_leasing.pk)
-        if self.next_leasing:
-            leasings = leasings.exclude(pk=self.next_leasing.pk)
-        return leasings.order_by('-date_of_entry')
+        return self.timeline.previous
 
     @property
     def previous_tenants(self):
         """Return all tenants of the room, except for current and next (if they exist)."""
-        pks = [leasing.tenant.pk for leasing in self.previous_leasings]
-        return Tenant.objects.filter(pk__in=pks)
+        return list(OrderedDict.fromkeys(leasing.tenant for leasing in self.previous_leasings))
 
     @property
     def color_class(self):
@@ -280,10 +382,14 @@ class Room(models.Model):
             return self.EMPTY_CC
 
 
-class Leasing(models.Model):
+class Leasing(VersionedModel):
     """Store a leasing."""
     class Meta:
         verbose_name = "Location"
+        indexes = [
+            models.Index(fields=['room', 'date_of_entry']),
+            models.Index(fields=['tenant', 'date_of_entry']),
+        ]
 
     PAYMENT_CHOICES = (
         ('direct_debit', 'Prélèvement'),
@@ -348,6 +454,7 @@ class Leasing(models.Model):
     missing_documents = models.TextField(verbose_name="Documents manquants", blank=True)
     date_of_entry = models.DateField(verbose_name="Date d'entrée", blank=True, null=True)
     date_of_departure = models.DateField(verbose_name="Date de sortie", blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
 
     def __str__(self):
         date1 = date2 = "?"
@@ -360,7 +467,277 @@ class Leasing(models.Model):
         " (" + date1 + \
         " - " + date2 + ")"
 
-class Map(models.Model):
+    @classmethod
+    def timeline(cls, owner):
+        """
+        Return the Timeline of the leasings of owner, a Room or a Tenant.
+
+        All leasings are read with one query using the index on (room, date_of_entry) or
+        (tenant, date_of_entry). The current and next leasings found are also cached on
+        owner, so that owner.current_leasing and owner.next_leasing do not query them again.
+        """
+        if isinstance(owner, Room):
+            leasings = cls.objects.filter(room=owner).select_related('tenant')
+        else:
+            leasings = cls.objects.filter(tenant=owner).select_related('room')
+        current = next_leasing = None
+        previous = []
+        for leasing in leasings.order_by('date_of_entry'):
+            if isinstance(owner, Room):
+                leasing.room = owner
+            else:
+                leasing.tenant = owner
+            if leasing.pk == owner.current_leasing_id:
+                current = owner.current_leasing = leasing
+            elif leasing.pk == owner.next_leasing_id:
+                next_leasing = owner.next_leasing = leasing
+            else:
+                previous.append(leasing)
+        previous.reverse()
+        return Timeline(previous, current, next_leasing)
+
+    @classmethod
+    def move_in_all(cls, date, dry_run=False):
+        """
+        Move every tenant having a next leasing into its room, in one transaction.
+
+        A move-in is blocked (like move_in view) if the room is not empty, if the tenant
+        still has a room, or if the room does not point to the same next leasing. Leasings,
+        tenants, rooms and their snapshots are written with one bulk_update each.
+        Return the list of MoveIn reports, ordered by room.
+        """
+        report = []
+        with transaction.atomic():
+            leasings = cls.objects.filter(next_tenant__isnull=False).select_related(
+                'tenant__school', 'room'
+            ).select_for_update().order_by('room__room')
+            moved = []
+            rooms = set()
+            for leasing in leasings:
+                room = leasing.room
+                tenant = leasing.tenant
+                if room.current_leasing_id is not None:
+                    reason = "La chambre n'est pas vide"
+                elif tenant.current_leasing_id is not None:
+                    reason = "Le locataire a encore une chambre"
+                elif room.next_leasing_id != leasing.pk or room.pk in rooms:
+                    reason = "La chambre est réservée par un autre dossier"
+                else:
+                    reason = ""
+                    rooms.add(room.pk)
+                    moved.append(leasing)
+                report.append(MoveIn(str(room), str(tenant), not reason, reason))
+            if dry_run or not moved:
+                return report
+            # bulk_update does not set updated_at (auto_now) nor version. The rows are
+            # locked by select_for_update, so their version can be incremented here.
+            now = timezone.now()
+            for leasing in moved:
+                leasing.date_of_entry = date
+                leasing.updated_at = leasing.tenant.updated_at = leasing.room.updated_at = now
+                for instance in (leasing, leasing.tenant, leasing.room):
+                    instance.version += 1
+                leasing.tenant.current_leasing = leasing
+                leasing.tenant.next_leasing = None
+                leasing.room.current_leasing = leasing
+                leasing.room.next_leasing = None
+            cls.objects.bulk_update(
+                moved, ['date_of_entry', 'updated_at', 'version'], batch_size=500
+            )
+            Tenant.objects.bulk_update(
+                [leasing.tenant for leasing in moved],
+                ['current_leasing', 'next_leasing', 'updated_at', 'version'],
+                batch_size=500
+            )
+            Room.objects.bulk_update(
+                [leasing.room for leasing in moved],
+                ['current_leasing', 'next_leasing', 'updated_at', 'version'],
+                batch_size=500
+            )
+            RoomOccupancy.move_in(moved)
+        return report
+
+
+MoveIn = namedtuple('MoveIn', ['room', 'tenant', 'moved', 'reason'])
+
+Timeline = namedtuple('Timeline', ['previous', 'current', 'next'])
+Timeline.__doc__ = """
+Leasings of a room or a tenant.
+
+previous : leasings other than the current and next ones, the most recent first
+current, next : current and next leasings, None if there is none
+"""
+
+class RoomOccupancy(models.Model):
+    """Store a denormalized snapshot of a room, read by the main page and its export.
+
+    The snapshot must be refreshed (see update_room and update_tenant) each time a
+    room, its leasings or its tenants are modified.
+    """
+    class Meta:
+        verbose_name = "Occupation"
+        indexes = [
+            # Keyset pagination of the main page by lot (see gestion.grid).
+            models.Index(fields=['lot', 'room_name']),
+        ]
+
+    room = models.OneToOneField(
+        'Room',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="occupancy",
+        verbose_name="Chambre"
+    )
+    room_name = models.CharField(max_length=6, verbose_name="Chambre", db_index=True)
+    lot = models.PositiveIntegerField(verbose_name="Lot")
+    is_active = models.BooleanField(default=True, verbose_name="Chambre active ?")
+    observations = models.TextField(verbose_name="Observations", blank=True)
+    current_tenant_pk = models.PositiveIntegerField(blank=True, null=True)
+    current_tenant_name = models.CharField(
+        max_length=255,
+        verbose_name="Locataire actuel",
+        blank=True
+    )
+    # Searched and sorted by the main page (see gestion.grid), instead of joining tenants.
+    current_tenant_last_name = models.CharField(max_length=255, blank=True)
+    current_tenant_first_name = models.CharField(max_length=255, blank=True)
+    current_tenant_gender = models.CharField(max_length=1, blank=True)
+    current_tenant_school = models.CharField(max_length=255, blank=True)
+    current_tenant_temporary = models.BooleanField(null=True)
+    next_tenant_pk = models.PositiveIntegerField(blank=True, null=True)
+    next_tenant_name = models.CharField(
+        max_length=255,
+        verbose_name="Locataire suivant",
+        blank=True
+    )
+    renovation_name = models.CharField(
+        max_length=255,
+        verbose_name="Niveau de rénovation",
+        blank=True
+    )
+    renovation_color = models.CharField(max_length=18, verbose_name="Couleur", blank=True)
+    rent_label = models.CharField(max_length=255, verbose_name="Loyer", blank=True)
+    color_class = models.CharField(max_length=20, verbose_name="Statut", blank=True)
+
+    def __str__(self):
+        return self.room_name
+
+    @property
+    def status(self):
+        """Return the label of the color class."""
+        return Room.COLOR_CLASS_LABELS.get(self.color_class, "")
+
+    @staticmethod
+    def rooms():
+        """Return the rooms with everything their snapshots are made from."""
+        return Room.objects.select_related(
+            'current_leasing__tenant__school',
+            'next_leasing__tenant',
+            'renovation',
+            'rent_type'
+        )
+
+    @classmethod
+    def snapshot(cls, room):
+        """Return the snapshot (not saved) of room, read with rooms()."""
+        current_tenant = room.current_leasing.tenant if room.current_leasing else None
+        next_tenant = room.next_leasing.tenant if room.next_leasing else None
+        return cls(
+            room=room,
+            room_name=room.room,
+            lot=room.lot,
+            is_active=room.is_active,
+            observations=room.observations,
+            current_tenant_pk=current_tenant.pk if current_tenant else None,
+            current_tenant_name=str(current_tenant) if current_tenant else "",
+            current_tenant_last_name=current_tenant.name if current_tenant else "",
+            current_tenant_first_name=current_tenant.first_name if current_tenant else "",
+            current_tenant_gender=current_tenant.gender if current_tenant else "",
+            current_tenant_school=(
+                current_tenant.school.name if current_tenant and current_tenant.school else ""
+            ),
+            current_tenant_temporary=current_tenant.temporary if current_tenant else None,
+            next_tenant_pk=next_tenant.pk if next_tenant else None,
+            next_tenant_name=str(next_tenant) if next_tenant else "",
+            renovation_name=room.renovation.name if room.renovation else "",
+            renovation_color=room.renovation.color if room.renovation else "",
+            rent_label=str(room.rent_type),
+            color_class=room.color_class,
+        )
+
+    @classmethod
+    def update_room(cls, room):
+        """Rebuild the snapshot of a room (Room instance or primary key)."""
+        pk = room.pk if isinstance(room, Room) else room
+        occupancy = cls.snapshot(cls.rooms().get(pk=pk))
+        # An UPDATE, or an INSERT if the room had no snapshot yet.
+        occupancy.save()
+        return occupancy
+
+    @classmethod
+    def update_rooms(cls, rooms, batch_size=500):
+        """
+        Rebuild the snapshots of several rooms (queryset or iterable of rooms or pks), with
+        three queries by batch_size rooms: the rooms, then the snapshots replaced in bulk.
+        """
+        if isinstance(rooms, models.QuerySet):
+            rooms = rooms.values_list('pk', flat=True)
+        pks = [room.pk if isinstance(room, Room) else room for room in rooms]
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            snapshots = [cls.snapshot(room) for room in cls.rooms().filter(pk__in=batch)]
+            # Faster than bulk_update, whose CASE expressions are built in Python.
+            with transaction.atomic():
+                cls.objects.filter(pk__in=batch).delete()
+                cls.objects.bulk_create(snapshots)
+
+    @classmethod
+    def update_tenant(cls, tenant):
+        """Rebuild the snapshots of the rooms where tenant lives or will live."""
+        cls.update_rooms(
+            Room.objects.filter(
+                models.Q(current_leasing__tenant=tenant) | models.Q(next_leasing__tenant=tenant)
+            ).values_list('pk', flat=True)
+        )
+
+    @classmethod
+    def move_in(cls, leasings):
+        """Update the snapshots of the rooms of leasings, whose tenants just moved in."""
+        occupancies = cls.objects.in_bulk([leasing.room_id for leasing in leasings])
+        for leasing in leasings:
+            occupancy = occupancies.get(leasing.room_id)
+            if occupancy is None:
+                cls.update_room(leasing.room_id)
+                continue
+            tenant = leasing.tenant
+            occupancy.current_tenant_pk = tenant.pk
+            occupancy.current_tenant_name = str(tenant)
+            occupancy.current_tenant_last_name = tenant.name
+            occupancy.current_tenant_first_name = tenant.first_name
+            occupancy.current_tenant_gender = tenant.gender
+            occupancy.current_tenant_school = tenant.school.name if tenant.school else ""
+            occupancy.current_tenant_temporary = tenant.temporary
+            occupancy.next_tenant_pk = None
+            occupancy.next_tenant_name = ""
+            occupancy.color_class = leasing.room.color_class
+        cls.objects.bulk_update(
+            occupancies.values(),
+            ['current_tenant_pk', 'current_tenant_name', 'current_tenant_last_name',
+             'current_tenant_first_name', 'current_tenant_gender', 'current_tenant_school',
+             'current_tenant_temporary', 'next_tenant_pk', 'next_tenant_name', 'color_class'],
+            batch_size=500
+        )
+
+    @classmethod
+    def reset_leaving(cls):
+        """Update the status of rooms whose current tenant was leaving once no tenant is."""
+        leaving = cls.objects.filter(color_class=Room.LEAVING_CC)
+        leaving.filter(current_tenant_temporary=True).update(
+            color_class=Room.TEMPORARY_CC
+        )
+        leaving.update(color_class=Room.NONE_CC)
+
+class Map(VersionedModel):
     """Store a general map."""
     class Meta:
         verbose_name = "Plan"
@@ -369,3 +746,18 @@ class Map(models.Model):
 
     def __str__(self):
         return self.name
+
+class AutocompleteChange(models.Model):
+    """Store a change of a room or a tenant, applied by the autocomplete indexes.
+
+    The indexes of the other processes read again the rows changed since the last
+    change they applied (see gestion.autocomplete). object_pk is None when rows were
+    written without signals: the indexes are rebuilt.
+    """
+    class Meta:
+        verbose_name = "Modification pour l'autocomplétion"
+        indexes = [
+            models.Index(fields=['model', 'id']),
+        ]
+    model = models.CharField(max_length=50)
+    object_pk = models.PositiveIntegerField(blank=True, null=True)
@@ -0,0 +1,111 @@
+"""Copies of the reference tables: schools, rents and renovation levels.
+
+These tables change a few times a year but are read by almost every page (choices of
+the search and edit forms, labels of rooms and tenants, snapshots of the main page).
+Each process keeps their rows in memory, with their version (see aloes.versions): the
+rows are read again when the version changed, which costs no query and is checked once
+per request. The version is bumped by the post_save and post_delete signals of the
+models, connected in GestionConfig.ready. Code writing them without signals
+(queryset.update, bulk_create) must call invalidate.
+"""
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.fields import CallableChoiceIterator
+
+from aloes import versions
+
+from .models import Renovation, Rent, School
+
+MODELS = (School, Rent, Renovation)
+
+
+ROWS = {}
+
+
+def version_name(model):
+    """Return the name of the version of the rows of model."""
+    return "gestion.reference." + model._meta.model_name
+
+
+def rows(model):
+    """Return a dictionary of all rows of model (a reference model) by primary key."""
+    # Read before the rows: a change made meanwhile makes them stale again.
+    token = versions.current(version_name(model)).token
+    cached = ROWS.get(model)
+    if cached is None or cached[0] != token:
+        cached = (token, {obj.pk: obj for obj in model.objects.order_by('pk')})
+        ROWS[model] = cached
+    return cached[1]
+
+
+def get(model, pk):
+    """Return the row pk of model, or None."""
+    if pk is None:
+        return None
+    return rows(model).get(pk)
+
+
+def values(model, pk):
+    """Return the values of the row pk of model, to tell when it changes."""
+    obj = get(model, pk)
+    if obj is None:
+        return None
+    return tuple(getattr(obj, field.attname) for field in obj._meta.concrete_fields)
+
+
+def attach(instances, *fields):
+    """Fill the foreign keys fields (to reference models) of instances from the copies."""
+    for instance in instances:
+        for name in fields:
+            field = instance._meta.get_field(name)
+            value = get(field.related_model, getattr(instance, field.attname))
+            if value is not None:
+                field.set_cached_value(instance, value)
+
+
+def invalidate(model=None):
+    """Make the rows of model (all reference models if None) stale, now and at commit."""
+    names = [version_name(reference) for reference in ((model,) if model else MODELS)]
+
+    def bump():
+        for name in names:
+            versions.bump(name)
+
+    bump()
+    # A request reading the table before the commit would keep the former rows.
+    transaction.on_commit(bump)
+
+
+def invalidate_sender(sender, **kwargs): # pylint: disable=unused-argument
+    """Receiver of post_save and post_delete."""
+    invalidate(sender)
+
+
+def choices(model, empty_label="---------"):
+    """Return the choices of a select of model, with an empty choice if empty_label."""
+    values = [(obj.pk, str(obj)) for obj in rows(model).values()]
+    if empty_label is not None:
+        values.insert(0, ("", empty_label))
+    return values
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField reading its choices and its value from the copies, without query."""
+    def _get_choices(self):
+        # Lazy, like the choices of ModelChoiceField: forms are built at import time.
+        model = self.queryset.model
+        return CallableChoiceIterator(lambda: choices(model, self.empty_label))
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            obj = get(self.queryset.model, int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return obj
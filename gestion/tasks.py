@@ -0,0 +1,28 @@
+"""Background tasks of gestion app (see aloes.jobs)."""
+from aloes.export import FORMATS
+from aloes.jobs import Result, task
+
+from . import backups
+from .exports import full_export
+from .views import copy_backups
+
+
+@task("gestion.export", queue="exports", max_attempts=2, timeout=600)
+def export(job, file_format="xlsx"): # pylint: disable=unused-argument
+    """Write the export of all rooms and tenants in file_format (csv, xlsx or ods)."""
+    if file_format not in FORMATS:
+        file_format = "xlsx"
+    full = full_export()
+    return Result(
+        full.name + "." + file_format,
+        FORMATS[file_format],
+        lambda output: full.write(output, file_format)
+    )
+
+
+@task("gestion.backup", queue="backup", max_attempts=3, timeout=3600, retry_delay=300)
+def backup(job):
+    """Save the database compressed, rotate the backups and copy them (see backups)."""
+    report = backups.backup()
+    copy_backups()
+    job.summary = backups.describe(report)
@@ -0,0 +1,139 @@
+"""Import of tenants from the JSON export of the admissions website.
+
+Every record is validated before anything is written: schools are resolved with one
+query, duplicates (same name, first name and birthday, in the file or in the database)
+are found with one query, and the valid tenants are inserted with one bulk_create.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import autocomplete
+from .models import School, Tenant, normalize_search
+
+GENDERS = {"H": "M", "M": "M", "F": "F"}
+
+REPORT_HEADERS = ["Ligne", "Nom", "Prénom", "Statut", "Erreur"]
+
+IMPORTED = "Importé"
+DUPLICATE = "Doublon"
+INVALID = "Erreur"
+
+
+def record_fields(record):
+    """Return the fields of record, a serialized object ({"fields": {...}}) or a dictionary."""
+    if isinstance(record, dict) and isinstance(record.get("fields"), dict):
+        return record["fields"]
+    if isinstance(record, dict):
+        return record
+    raise ValidationError("L'enregistrement n'est pas un objet JSON")
+
+
+def split_street(street):
+    """Return (street number, street) from an address like "2 rue Édouard Belin"."""
+    number, _, rest = (street or "").strip().partition(" ")
+    if rest and any(char.isdigit() for char in number):
+        return number, rest
+    return None, (street or "").strip()
+
+
+def duplicate_key(name, first_name, birthday):
+    """Return the key identifying a tenant to find duplicates."""
+    return normalize_search(name), normalize_search(first_name), str(birthday or "")
+
+
+def error_text(error):
+    """Return the messages of a ValidationError, prefixed by their field if any."""
+    if hasattr(error, 'error_dict'):
+        return " ".join(
+            field + " : " + " ".join(messages) for field, messages in error.message_dict.items()
+        )
+    return " ".join(error.messages)
+
+
+def build_tenant(fields, schools):
+    """Return an unsaved Tenant for fields, schools mapping names to School instances."""
+    try:
+        gender = GENDERS[fields.get("gender")]
+    except KeyError:
+        raise ValidationError("Sexe inconnu : " + str(fields.get("gender")))
+    street_number, street = split_street(fields.get("street"))
+    tenant = Tenant(
+        name=fields.get("last_name") or "",
+        first_name=fields.get("first_name") or "",
+        gender=gender,
+        school=schools.get(fields.get("school") or fields.get("other_school")),
+        school_year=1,
+        cellphone=fields.get("phone_number") or "",
+        birthday=fields.get("birthdate") or None,
+        birthcity=fields.get("birthplace") or "",
+        birthdepartement=fields.get("birth_departement") or "",
+        birthcountry=fields.get("birth_country") or "",
+        street_number=street_number,
+        street=street,
+        city=fields.get("city") or "",
+        zipcode=fields.get("zip_code") or "",
+        email=fields.get("email") or "",
+    )
+    # The school is already resolved: do not let full_clean query it again.
+    tenant.full_clean(exclude=["school", "current_leasing", "next_leasing"])
+    tenant.update_search_fields()
+    return tenant
+
+
+def import_tenants(records):
+    """
+    Validate records and insert the valid tenants which are not duplicates.
+
+    Return (created tenants, report), report being a list of rows (see REPORT_HEADERS).
+    """
+    fields_list = []
+    report = []
+    for line, record in enumerate(records, 1):
+        try:
+            fields_list.append((line, record_fields(record)))
+        except ValidationError as error:
+            report.append([line, "", "", INVALID, error_text(error)])
+    names = {fields.get("school") or fields.get("other_school") for _, fields in fields_list}
+    # Ordered by decreasing pk so that the oldest school wins when names are duplicated.
+    schools = {
+        school.name: school
+        for school in School.objects.filter(name__in=names).order_by('-pk')
+    }
+    candidates = []
+    for line, fields in fields_list:
+        try:
+            tenant = build_tenant(fields, schools)
+        except ValidationError as error:
+            report.append([
+                line, fields.get("last_name", ""), fields.get("first_name", ""), INVALID,
+                error_text(error)
+            ])
+            continue
+        candidates.append((line, tenant))
+    existing = set(
+        duplicate_key(*values) for values in Tenant.objects.filter(
+            search_name__in=[tenant.search_name for _, tenant in candidates]
+        ).values_list('name', 'first_name', 'birthday')
+    )
+    seen = set()
+    tenants = []
+    for line, tenant in candidates:
+        key = duplicate_key(tenant.name, tenant.first_name, tenant.birthday)
+        if key in existing or key in seen:
+            report.append([
+                line, tenant.name, tenant.first_name, DUPLICATE,
+                "Déjà présent dans la base" if key in existing else "Déjà présent dans le fichier"
+            ])
+            continue
+        seen.add(key)
+        tenants.append(tenant)
+        report.append([line, tenant.name, tenant.first_name, IMPORTED, ""])
+    if len(tenants) == 1:
+        # bulk_create does not set the primary key on every database.
+        tenants[0].save()
+    else:
+        with transaction.atomic():
+            Tenant.objects.bulk_create(tenants)
+        autocomplete.invalidate()
+    report.sort(key=lambda row: row[0])
+    return tenants, report
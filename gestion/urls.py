@@ -14,7 +14,9 @@ urlpatterns = [
          views.RenovationDelete.as_view(), name="deleteRenovation"),
     path('indexRenovation', views.renovations_index, name="indexRenovation"),
     path('gestionIndex', views.gestion_index, name="indexGestion"),
+    path('roomGrid', views.room_grid, name="roomGrid"),
     path('tenantProfile/<int:pk>', views.tenant_profile, name="tenantProfile"),
+    path('tenantTimeline/<int:pk>', views.tenant_timeline, name="tenantTimeline"),
     path('editTenant/<int:pk>', views.edit_tenant, name="editTenant"),
     path('createTenant', views.TenantCreate.as_view(), name="createTenant"),
     path('createSchool', views.SchoolCreate.as_view(), name="createSchool"),
@@ -27,6 +29,7 @@ urlpatterns = [
     path('deleleRent/<int:pk>', views.RentDelete.as_view(), name="deleteRent"),
     path('indexRent', views.rents_index, name="indexRent"),
     path('roomProfile/<int:pk>', views.room_profile, name="roomProfile"),
+    path('roomTimeline/<int:pk>', views.room_timeline, name="roomTimeline"),
     path('editRoom/<int:pk>', views.edit_room, name="editRoom"),
     path('createRoom', views.RoomCreate.as_view(), name="createRoom"),
     path('leasingProfile/<int:pk>', views.leasing_profile,
@@ -35,6 +38,7 @@ urlpatterns = [
     path('addOneYear', views.add_one_year, name="addOneYear"),
     path('leave/<int:pk>', views.leave, name="leave"),
     path('moveIn/<str:mode>/<int:pk>', views.move_in, name="moveIn"),
+    path('moveInAll', views.move_in_all, name="moveInAll"),
     path('moveOut/<str:mode>/<int:pk>', views.move_out, name="moveOut"),
     path('addNextTenant/<int:pk>', views.add_next_tenant, name="addNextTenant"),
     path('addNextRoom/<int:pk>', views.add_next_room, name="addNextRoom"),
@@ -48,6 +52,14 @@ urlpatterns = [
     path('editMap/<int:pk>', views.MapEdit.as_view(), name="editMap"),
     path('deleleMap/<int:pk>', views.MapDelete.as_view(), name="deleteMap"),
     path('indexMap', views.map_index, name="indexMap"),
+    path('mapDownload/<int:pk>', views.map_download, name="mapDownload"),
+    path('roomMapDownload/<int:pk>', views.room_map_download, name="roomMapDownload"),
+    path('mapRendition/<int:pk>/<str:size>', views.map_rendition, name="mapRendition"),
+    path(
+        'roomMapRendition/<int:pk>/<str:size>',
+        views.room_map_rendition,
+        name="roomMapRendition"
+    ),
     path('changeRoomMap/<int:pk>',
          views.ChangeRoomMap.as_view(), name="changeRoomMap"),
     path('exportCSV', views.export_xls, name="exportCSV"),
@@ -77,4 +89,5 @@ urlpatterns = [
     path('roomSwitchActivate/<int:pk>', views.room_switch_activate, name="roomSwitchActivate"),
     path('inactiveRooms', views.inactive_rooms, name="inactiveRooms"),
     path('importTenant', views.import_tenant, name="importTenant"),
+    path('importTenantReport', views.import_tenant_report, name="importTenantReport"),
 ]
@@ -1,172 +1,98 @@
 """Views of gestion app.""" # pylint: disable=too-many-lines
 import os
-import xlsxwriter
 
 from dal import autocomplete
 from django.contrib import messages
-from django.core import management
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db.models import Count, Max
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django_cron import CronJobBase, Schedule
-from lock_tokens.exceptions import AlreadyLockedError
-from lock_tokens.sessions import (check_for_session, lock_for_session,
-                                  unlock_for_session)
 
 from aloes.acl import AdminRequiredMixin, admin_required
+from aloes.files import serve_file
+from aloes.jobs import enqueue
+from aloes.models import Job, VersionConflict
+from aloes.renditions import serve_rendition
 from aloes.utils import (ImprovedCreateView, ImprovedDeleteView,
-                         LockableUpdateView)
+                         VersionedUpdateView, conditional_page, conflict_form,
+                         streaming_csv_response)
 
-from .form import (CreateTenantForm, DateForm, LeasingForm,
-                   LeaveForm, RoomForm, SearchForm, TenantForm,
+from .exports import search_export
+from .form import (AddOneYearForm, CreateTenantForm, DateForm,
+                   LeasingForm, LeaveForm, RoomForm, SearchForm, TenantForm,
                    RoomMoveInDirectForm, SelectRoomWNTForm,
                    SelectTenantWNRForm, TenantMoveInDirectForm,
                    ImportTenantForm)
-from .models import Leasing, Map, Renovation, Rent, Room, School, Tenant
+from . import grid, reference
+from .autocomplete import ROOMS, TENANTS
+from .autocomplete import invalidate as invalidate_autocomplete
+from .models import (Leasing, Map, Renovation, Rent, Room, RoomOccupancy,
+                     School, Tenant)
+from .tenant_import import REPORT_HEADERS, import_tenants
 
 from django.db import connection
 
 
 @admin_required
-def gestion_index(request):  # pylint : disable=too-many-branches
-    """Main page of gestion app."""
+def gestion_index(request):
+    """Main page of gestion app: the first page of the grid of rooms (see room_grid)."""
     search_form = SearchForm(request.GET or None)
     other_tenants = Tenant.objects.none()
+    order = "room"
     if search_form.is_valid():
-        res = Room.objects.select_related('current_leasing').select_related('next_leasing').select_related('renovation').select_related('rent_type')
-        if search_form.cleaned_data['last_name']:
-            res = res.filter(Q(current_leasing__tenant__name__icontains=\
-                    search_form.cleaned_data['last_name']) | Q(next_leasing__tenant__name__icontains=\
-                    search_form.cleaned_data['last_name']))
-            other_tenants = Tenant.objects.filter(current_leasing=None).filter(next_leasing=None).filter(name__icontains=\
-                    search_form.cleaned_data['last_name'])
-        if search_form.cleaned_data['first_name']:
-            res = res.filter(
-                Q(current_leasing__tenant__first_name__icontains=\
-                    search_form.cleaned_data['first_name'])|Q(next_leasing__tenant__first_name__icontains=\
-                    search_form.cleaned_data['first_name']))
-            other_tenants = Tenant.objects.filter(current_leasing=None).filter(next_leasing=None).filter(name__icontains=\
-                    search_form.cleaned_data['first_name'])
-        if search_form.cleaned_data['name']:
-            res = res.filter(Q(current_leasing__tenant__name__icontains=\
-                search_form.cleaned_data['name']) | Q(
-                    current_leasing__tenant__first_name__icontains=\
-                        search_form.cleaned_data['name'])| Q(next_leasing__tenant__name__icontains=\
-                search_form.cleaned_data['name']) | Q(
-                    next_leasing__tenant__first_name__icontains=search_form.cleaned_data['name']))
-            other_tenants = Tenant.objects.filter(current_leasing=None).filter(next_leasing=None).filter(Q(name__icontains=\
-                    search_form.cleaned_data['name'])|Q(first_name__icontains=search_form.cleaned_data['name']))
-        if search_form.cleaned_data['observations']:
-            res = res.filter(observations__icontains=\
-                search_form.cleaned_data['observations'])
-        if search_form.cleaned_data['room']:
-            res = res.filter(
-                room__istartswith=search_form.cleaned_data['room'])
-        if search_form.cleaned_data['lot']:
-            res = res.filter(lot=search_form.cleaned_data['lot'])
-        if search_form.cleaned_data['gender'] != "I":
-            res = res.filter(
-                current_leasing__tenant__gender=search_form.cleaned_data['gender'])
-        if search_form.cleaned_data['school']:
-            res = res.filter(
-                current_leasing__tenant__school__name__icontains=search_form.cleaned_data['school'])
-        if search_form.cleaned_data['empty_rooms_only']:
-            res = res.filter(current_leasing__tenant=None)
-        if search_form.cleaned_data['exclude_temporary']:
-            res = res.filter(current_leasing__tenant__temporary=False)
-        if search_form.cleaned_data['exclude_empty_rooms']:
-            res = res.exclude(current_leasing__tenant=None)
-        if search_form.cleaned_data['renovation']:
-            res = res.filter(renovation=search_form.cleaned_data['renovation'])
-        if search_form.cleaned_data['building'] != "I":
-            res = res.filter(
-                room__istartswith=search_form.cleaned_data['building'])
-        if search_form.cleaned_data['sort']:
-            if search_form.cleaned_data['sort'] == "room":
-                res = res.order_by("room")
-            if search_form.cleaned_data['sort'] == "first_name":
-                res = res.order_by("current_leasing__tenant__first_name")
-            if search_form.cleaned_data['sort'] == "last_name":
-                res = res.order_by("current_leasing__tenant__name")
+        res, other_tenants = grid.search(search_form.cleaned_data)
+        order = search_form.cleaned_data['sort']
         mode = "search" if "search" in request.GET else "csv"
         search_form = SearchForm()
     else:
-        res = Room.objects.filter(is_active=True).select_related('current_leasing').select_related('next_leasing').select_related('renovation').select_related('rent_type').order_by("room")
+        res = grid.default_rooms()
         mode = "search"
-    if mode == "search":
-        return render(
-            request,
-            "gestion/gestion_index.html",
-            {
-                "search_form": search_form,
-                "sidebar": True,
-                "active": "default",
-                "rooms": res,
-                "other_tenants": other_tenants,
-            }
-        )
+    if mode != "search":
+        return search_export(res, other_tenants).response(request.GET.get("csv"))
+    if order in grid.ORDERS:
+        first_page = grid.page(res, other_tenants, order)
     else:
-        response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="export.xslx"'
-        workbook = xlsxwriter.Workbook(response, {"in_memory": True})
-        empty_format = workbook.add_format({"bg_color": "#ffeeba"})
-        temporary_format = workbook.add_format({"bg_color": "#b8daff"})
-        leaving_format = workbook.add_format({"bg_color": "#c3e6cb"})
-        problem_format = workbook.add_format({"bg_color": "#f5c6cb"})
-        other_tenant_format = workbook.add_format({"bg_color": "#f5c6cb"})
-        worksheet = workbook.add_worksheet()
-        items = [
-            'Chambre (lot)',
-            'Locataire',
-            'Réservation',
-            'Réparation',
-            'Loyer',
-            'Observations'
-        ]
-        for i, item in enumerate(items):
-            worksheet.write(0, i, item)
-        for i, room in enumerate(res):
-            if room.current_leasing:
-                tenant_text = str(room.current_leasing.tenant)
-            else:
-                tenant_text = "Pas de locataire actuel"
-            items = [
-                str(room),
-                tenant_text,
-                str(room.next_leasing.tenant if room.next_leasing else "Pas réservée"),
-                str(room.renovation or "Non indiqué"),
-                str(room.rent_type or "Non indiqué"),
-                str(room.observations)
-            ]
-            if room.color_class == Room.EMPTY_CC:
-                cell_format = empty_format
-            elif room.color_class == Room.TEMPORARY_CC:
-                cell_format = temporary_format
-            elif room.color_class == Room.LEAVING_CC:
-                cell_format = leaving_format
-            elif room.color_class == Room.PROBLEM_CC:
-                cell_format = problem_format
-            else:
-                cell_format = None
-            for j, item in enumerate(items):
-                worksheet.write(i + 1, j, item, cell_format)
-        last_written = i + 1
-        for i, tenant in enumerate(other_tenants):
-            items = [
-                "Pas de chambre",
-                str(tenant),
-                "",
-                "",
-                "",
-                ""
-            ]
-            for j, item in enumerate(items):
-                worksheet.write(i + last_written, j, item, other_tenant_format)
-        workbook.close()   
-    return response
+        # Sorted by tenant names: no keyset, everything at once.
+        first_page = grid.all_rows(res, other_tenants)
+    return render(
+        request,
+        "gestion/gestion_index.html",
+        {
+            "search_form": search_form,
+            "sidebar": True,
+            "active": "default",
+            "rooms": grid.as_dicts(first_page["rooms"], grid.COLUMNS),
+            "other_tenants": grid.as_dicts(first_page["tenants"], grid.TENANT_COLUMNS),
+            "next_cursor": first_page["next"],
+        }
+    )
+
+
+@admin_required
+def room_grid(request):
+    """
+    Return a page of the grid of rooms in JSON, for the incremental loading of the main
+    page. Accept the parameters of SearchForm (the active rooms without them), "after",
+    the cursor returned by the previous page, and "size", the number of rows.
+    """
+    search_form = SearchForm(request.GET)
+    if search_form.is_valid():
+        res, other_tenants = grid.search(search_form.cleaned_data)
+        order = search_form.cleaned_data['sort']
+    else:
+        res, other_tenants = grid.default_rooms(), Tenant.objects.none()
+        order = "room"
+    if order not in grid.ORDERS:
+        return JsonResponse({"error": "Tri par nom : pas de pagination"}, status=400)
+    try:
+        size = min(int(request.GET.get("size", grid.PAGE_SIZE)), grid.MAX_PAGE_SIZE)
+        result = grid.page(res, other_tenants, order, request.GET.get("after"), max(size, 1))
+    except ValueError:
+        return JsonResponse({"error": "Paramètres de pagination invalides"}, status=400)
+    result["columns"] = grid.COLUMNS
+    result["tenant_columns"] = grid.TENANT_COLUMNS
+    return JsonResponse(result)
 
 
 ########## Renovations ##########
@@ -175,7 +101,7 @@ def gestion_index(request):  # pylint : disable=too-many-branches
 def renovations_index(request):
     """List of all renovation levels."""
     search_form = SearchForm()
-    renovations = Renovation.objects.all()
+    renovations = Renovation.objects.annotate(rooms=Count('room'))
     return render(
         request,
         "gestion/renovations_index.html",
@@ -211,15 +137,13 @@ class RenovationCreate(AdminRequiredMixin, ImprovedCreateView): # pylint: disabl
         }
 
 
-class RenovationEdit(AdminRequiredMixin, LockableUpdateView): # pylint: disable=too-many-ancestors
+class RenovationEdit(AdminRequiredMixin, VersionedUpdateView): # pylint: disable=too-many-ancestors
     """Class based view to edit a renovation level."""
     model = Renovation
     fields = "__all__"
     template_name = "form.html"
     success_url = reverse_lazy("gestion:indexRenovation")
     success_message = "Le niveau de rénovation a bien été modifié"
-    lock_message = "Impossible de modifier le niveau de rénovation :\
-                    il est en cours de modification"
     context = {
         "form_title": "Modification d'un niveau de rénovation",
         "form_icon": "pencil-alt",
@@ -227,6 +151,11 @@ class RenovationEdit(AdminRequiredMixin, LockableUpdateView): # pylint: disable=
         "color": True,
         "active": "renovations"}
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        RoomOccupancy.update_rooms(Room.objects.filter(renovation=self.object))
+        return response
+
 
 class RenovationDelete(AdminRequiredMixin, ImprovedDeleteView): # pylint: disable=too-many-ancestors
     """Class based view to confirm suppression a renovation level."""
@@ -248,7 +177,7 @@ class RenovationDelete(AdminRequiredMixin, ImprovedDeleteView): # pylint: disabl
 def schools_index(request):
     """List all schools."""
     search_form = SearchForm()
-    schools = School.objects.all()
+    schools = School.objects.annotate(tenants=Count('tenant'))
     return render(request,
                   "gestion/schools_index.html",
                   {"schools": schools,
@@ -278,20 +207,24 @@ class SchoolCreate(AdminRequiredMixin, ImprovedCreateView): # pylint: disable=to
         }
 
 
-class SchoolEdit(AdminRequiredMixin, LockableUpdateView): # pylint: disable=too-many-ancestors
+class SchoolEdit(AdminRequiredMixin, VersionedUpdateView): # pylint: disable=too-many-ancestors
     """Class based view to edit a school."""
     model = School
     fields = "__all__"
     template_name = "form.html"
     success_url = reverse_lazy('gestion:indexSchool')
     success_message = "L'école a bien été modifiée"
-    lock_message = "Impossible de modifier l'école : elle est en cours de modification"
     context = {
         "form_title": "Modification d'une école",
         "form_icon": "pencil-alt",
         "form_button": "Modifier",
         "active": "schools"}
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        RoomOccupancy.update_rooms(Room.objects.filter(current_leasing__tenant__school=self.object))
+        return response
+
 
 class SchoolDelete(AdminRequiredMixin, ImprovedDeleteView): # pylint: disable=too-many-ancestors
     """Class based view to confirm the suppression of a school."""
@@ -314,7 +247,7 @@ class SchoolDelete(AdminRequiredMixin, ImprovedDeleteView): # pylint: disable=to
 def rents_index(request):
     """List all rents."""
     search_form = SearchForm()
-    rents = Rent.objects.all()
+    rents = Rent.objects.annotate(rooms=Count('room'))
     return render(
         request,
         "gestion/rents_index.html",
@@ -348,20 +281,24 @@ class RentCreate(AdminRequiredMixin, ImprovedCreateView): # pylint: disable=too-
         }
 
 
-class RentEdit(AdminRequiredMixin, LockableUpdateView): # pylint: disable=too-many-ancestors
+class RentEdit(AdminRequiredMixin, VersionedUpdateView): # pylint: disable=too-many-ancestors
     """Class based view to edit a rent."""
     model = Rent
     fields = "__all__"
     template_name = "form.html"
     success_url = reverse_lazy('gestion:indexRent')
     success_message = "Le loyer a bien été modifié"
-    lock_message = "Impossible de modifier le loyer : il est en cours de modification"
     context = {
         "form_title": "Modification d'un loyer",
         "form_icon": "pencil-alt",
         "form_button": "Modifier",
         "active": "rents"}
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        RoomOccupancy.update_rooms(Room.objects.filter(rent_type=self.object))
+        return response
+
 
 class RentDelete(AdminRequiredMixin, ImprovedDeleteView): # pylint: disable=too-many-ancestors
     """Class based view to confirm the suppression of a rent."""
@@ -380,17 +317,65 @@ class RentDelete(AdminRequiredMixin, ImprovedDeleteView): # pylint: disable=too-
 ########## Rooms ##########
 
 
+def latest(*dates):
+    """Return the most recent of dates (None are ignored), or None."""
+    return max((date for date in dates if date is not None), default=None)
+
+
+def room_state(request, pk): # pylint: disable=unused-argument
+    """State of the room profile (see conditional_page): the room, its leasings and tenants."""
+    state = Room.objects.filter(pk=pk).annotate(
+        leasings=Count('leasing'),
+        leasings_updated_at=Max('leasing__updated_at'),
+        tenants_updated_at=Max('leasing__tenant__updated_at'),
+    ).values_list(
+        'updated_at', 'leasings', 'leasings_updated_at', 'tenants_updated_at',
+        'rent_type', 'renovation', 'map'
+    ).first()
+    if state is None:
+        return None
+    references = (reference.values(Rent, state[4]), reference.values(Renovation, state[5]))
+    return (state, references), latest(state[0], state[2], state[3])
+
+
+def tenant_state(request, pk): # pylint: disable=unused-argument
+    """State of the tenant profile (see conditional_page): the tenant, its leasings and rooms."""
+    state = Tenant.objects.filter(pk=pk).annotate(
+        leasings=Count('leasing'),
+        leasings_updated_at=Max('leasing__updated_at'),
+        rooms_updated_at=Max('leasing__room__updated_at'),
+    ).values_list(
+        'updated_at', 'leasings', 'leasings_updated_at', 'rooms_updated_at', 'school'
+    ).first()
+    if state is None:
+        return None
+    return (state, reference.values(School, state[4])), latest(state[0], state[2], state[3])
+
+
+def leasing_state(request, pk): # pylint: disable=unused-argument
+    """State of the leasing profile (see conditional_page): the leasing, its room and tenant."""
+    state = Leasing.objects.filter(pk=pk).values_list(
+        'updated_at', 'room__updated_at', 'tenant__updated_at'
+    ).first()
+    if state is None:
+        return None
+    return state, latest(*state)
+
+
 @admin_required
+@conditional_page(room_state)
 def room_profile(request, pk):
     """Display room profile."""
     search_form = SearchForm()
     room = get_object_or_404(Room, pk=pk)
+    reference.attach([room], 'rent_type', 'renovation')
     return render(
         request,
         "gestion/room_profile.html",
         {
             "sidebar": True,
             "room": room,
+            "timeline": room.timeline,
             "search_form": search_form
         }
     )
@@ -405,31 +390,21 @@ def edit_room(request, pk):
     """
     search_form = SearchForm()
     room = get_object_or_404(Room, pk=pk)
-    try:
-        lock_for_session(room, request.session)
-    except AlreadyLockedError:
-        messages.error(
-            request,
-            "Impossible de modifier la chambre : elle est en cours de modification."
-        )
-        return redirect(request.META.get('HTTP_REFERER', '/'))
+    reference.attach([room], 'rent_type', 'renovation')
     room_form = RoomForm(request.POST or None, instance=room)
     if 'cancel' in request.POST:
         messages.success(request, "Demande annulée")
-        unlock_for_session(room, request.session)
         return redirect(request.POST.get('cancel') or "home")
     if room_form.is_valid():
-        if not check_for_session(room, request.session):
-            messages.error(
-                request,
-                "Impossible de modifier la chambre : elle est en cours de modification."
-            )
-            return redirect(request.META.get('HTTP_REFERER', '/'))
-        room_form.save()
-        messages.success(
-            request, "Les modifications ont bien été enregistrées")
-        unlock_for_session(room, request.session)
-        return redirect(reverse('gestion:roomProfile', kwargs={'pk': room.pk}))
+        try:
+            room_form.save()
+        except VersionConflict:
+            room_form = conflict_form(request, room_form)
+        else:
+            RoomOccupancy.update_room(room)
+            messages.success(
+                request, "Les modifications ont bien été enregistrées")
+            return redirect(reverse('gestion:roomProfile', kwargs={'pk': room.pk}))
     return render(
         request,
         "gestion/edit_room.html",
@@ -453,6 +428,11 @@ class RoomCreate(AdminRequiredMixin, ImprovedCreateView): # pylint: disable=too-
         "form_button": "Créer la chambre"
     }
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        RoomOccupancy.update_room(self.object)
+        return response
+
     def get_success_url(self):
         return reverse("gestion:roomProfile", kwargs={'pk': self.object.pk})
 
@@ -479,6 +459,7 @@ def add_next_tenant(request, pk):
             room.save()
             tenant.next_leasing = leasing
             tenant.save()
+            RoomOccupancy.update_room(room)
             messages.success(request, "La chambre a bien été réservée")
         return redirect(reverse('gestion:roomProfile', kwargs={'pk': pk}))
     message = "Choisir un locataire pour réserver la chambre"
@@ -524,6 +505,7 @@ def room_move_in_direct(request, pk):
             room.save()
             tenant.current_leasing = leasing
             tenant.save()
+            RoomOccupancy.update_room(room)
             messages.success(request, "Le locataire a bien été emménagé")
         return redirect(reverse('gestion:roomProfile', kwargs={"pk": pk}))
     message = "Choisir un locataire et la date d'entrée dans la chambre"
@@ -540,13 +522,12 @@ def room_move_in_direct(request, pk):
     )
 
 
-class ChangeRoomMap(AdminRequiredMixin, LockableUpdateView):
+class ChangeRoomMap(AdminRequiredMixin, VersionedUpdateView):
     """Class based view to change map of a room."""
     model = Room
     fields = ("map",)
     template_name = "form.html"
     success_message = "Le plan a bien été modifié"
-    lock_message = "Impossible de modifier le plan : il est en cours de modification"
     context = {
         "form_title": "Modification d'un plan",
         "form_icon": "pencil-alt",
@@ -556,9 +537,12 @@ class ChangeRoomMap(AdminRequiredMixin, LockableUpdateView):
     }
 
     def form_valid(self, form):
-        if self.get_object().map:
-            os.remove(self.get_object().map.path)
-        return super().form_valid(form)
+        former_map = self.get_object().map
+        response = super().form_valid(form)
+        # Not saved on a conflict: self.object is then the current row.
+        if former_map and former_map != self.object.map:
+            os.remove(former_map.path)
+        return response
 
     def get_success_url(self):
         return reverse("gestion:roomProfile", kwargs={'pk': self.object.pk})
@@ -568,6 +552,7 @@ def room_switch_activate(request, pk):
     room = get_object_or_404(Room, pk=pk)
     room.is_active = 1 - room.is_active
     room.save()
+    RoomOccupancy.update_room(room)
     messages.success(request, "Le statut a bien été changé.")
     return redirect(reverse('gestion:roomProfile', kwargs={'pk': pk}))
 
@@ -587,6 +572,7 @@ def inactive_rooms(request):
 ########## Tenants ##########
 
 @admin_required
+@conditional_page(tenant_state)
 def tenant_profile(request, pk):
     """
     Display profile of a tenant
@@ -595,12 +581,14 @@ def tenant_profile(request, pk):
     """
     search_form = SearchForm()
     tenant = get_object_or_404(Tenant, pk=pk)
+    reference.attach([tenant], 'school')
     return render(
         request,
         "gestion/tenant_profile.html",
         {
             "sidebar": True,
             "tenant": tenant,
+            "timeline": tenant.timeline,
             "search_form": search_form
         }
     )
@@ -615,30 +603,20 @@ def edit_tenant(request, pk):
     """
     search_form = SearchForm()
     tenant = get_object_or_404(Tenant, pk=pk)
-    try:
-        lock_for_session(tenant, request.session)
-    except AlreadyLockedError:
-        messages.error(
-            request,
-            "Impossible de modifier le locataire : il est en cours de modification."
-        )
-        return redirect(request.META.get('HTTP_REFERER', '/'))
+    reference.attach([tenant], 'school')
     tenant_form = TenantForm(request.POST or None, instance=tenant)
     if 'cancel' in request.POST:
         messages.success(request, "Demande annulée")
-        unlock_for_session(tenant, request.session)
         return redirect(request.POST.get('cancel') or "home")
     if tenant_form.is_valid():
-        if not check_for_session(tenant, request.session):
-            messages.error(
-                request,
-                "Impossible de modifier le locataire : il est en cours de modification."
-            )
-            return redirect(request.META.get('HTTP_REFERER', '/'))
-        tenant_form.save()
-        messages.success(request, "Les modifications ont été enregistrées")
-        unlock_for_session(tenant, request.session)
-        return redirect(reverse('gestion:tenantProfile', kwargs={'pk': tenant.pk}))
+        try:
+            tenant_form.save()
+        except VersionConflict:
+            tenant_form = conflict_form(request, tenant_form)
+        else:
+            RoomOccupancy.update_tenant(tenant)
+            messages.success(request, "Les modifications ont été enregistrées")
+            return redirect(reverse('gestion:tenantProfile', kwargs={'pk': tenant.pk}))
     return render(
         request,
         "gestion/edit_tenant.html",
@@ -665,56 +643,48 @@ class TenantCreate(AdminRequiredMixin, ImprovedCreateView): # pylint: disable=to
     def get_success_url(self):
         return reverse("gestion:tenantProfile", kwargs={'pk': self.object.pk})
 
+@admin_required
 def import_tenant(request):
-    """Import tenant in json format"""
-    form = ImportTenantForm(request.POST or None)
+    """
+    Import tenants from JSON data (an object or an array of objects), pasted or uploaded.
+
+    Every record is validated before the valid ones are inserted. The report of the
+    import is kept in the session to be downloaded (see import_tenant_report).
+    """
+    form = ImportTenantForm(request.POST or None, request.FILES or None)
     if 'cancel' in request.POST:
-            messages.success(request, "Demande annulée")
-            return redirect(request.POST.get('cancel') or "home")
+        messages.success(request, "Demande annulée")
+        return redirect(request.POST.get('cancel') or "home")
     if form.is_valid():
-        json_data = form.cleaned_data["jsonfield"]
-        fields = json_data[0]["fields"]
-        if fields["school"]:
-            school = fields["school"]
-        else:
-            school = fields["other_school"]
-        school = School.objects.filter(name=school)
-        if school:
-            school = school[0]
-        else:
-            school = None
-        tenant = Tenant(
-            name=fields["last_name"],
-            first_name=fields["first_name"],
-            gender={"H": "M", "F": "F"}[fields["gender"]],
-            school=school,
-            school_year=1,
-            cellphone=fields["phone_number"],
-            birthday=fields["birthdate"],
-            birthcity=fields["birthplace"],
-            birthdepartement=fields["birth_departement"],
-            birthcountry=fields["birth_country"],
-            street_number=fields["street"][:fields["street"].index(" ")],
-            street=fields["street"][fields["street"].index(" ")+1:],
-            city=fields["city"],
-            zipcode=fields["zip_code"],
-            email=fields["email"]
-        )
-        tenant.save()
-        messages.success(request, "Le locataire a bien été importé. Pensez à vérifier l'école, aisni que le pays de résidence actuel.")
-        return redirect(reverse("gestion:tenantProfile", kwargs={"pk": tenant.pk}))
+        tenants, report = import_tenants(form.cleaned_data["records"])
+        request.session["tenant_import_report"] = report
+        if len(tenants) == 1 and len(report) == 1:
+            messages.success(request, "Le locataire a bien été importé. Pensez à vérifier l'école, aisni que le pays de résidence actuel.")
+            return redirect(reverse("gestion:tenantProfile", kwargs={"pk": tenants[0].pk}))
+        return render(request, "gestion/import_tenant.html", {
+            "report": report,
+            "imported": len(tenants),
+            "rejected": len(report) - len(tenants),
+        })
     return render(
         request,
         "form.html",
         {
             "form": form,
-            "form_title": "Importation d'un locataire",
-            "p": "Copiez-collez les données JSON",
+            "form_title": "Importation de locataires",
+            "p": "Copiez-collez les données JSON ou choisissez un fichier (un locataire ou une liste de locataires)",
             "form_button": "Importer",
-            "form_icon": "user-plus"
+            "form_icon": "user-plus",
+            "file": True,
         }
     )
 
+@admin_required
+def import_tenant_report(request):
+    """Download the report of the last tenant import as a csv file."""
+    report = request.session.get("tenant_import_report", [])
+    return streaming_csv_response([REPORT_HEADERS] + report, "rapport_import.csv")
+
 @admin_required
 def add_next_room(request, pk):
     """
@@ -741,6 +711,7 @@ def add_next_room(request, pk):
             room.save()
             tenant.next_leasing = leasing
             tenant.save()
+            RoomOccupancy.update_room(room)
             messages.success(request, "Le locataire a bien réservé la chambre")
         return redirect(reverse('gestion:tenantProfile', kwargs={'pk': pk}))
     message = "Choisir une chambre non réservée"
@@ -787,6 +758,7 @@ def tenant_move_in_direct(request, pk):
             room.save()
             tenant.current_leasing = leasing
             tenant.save()
+            RoomOccupancy.update_room(room)
             messages.success(request, "Le locataire a bien été emménagé")
         return redirect(reverse('gestion:tenantProfile', kwargs={"pk": pk}))
     message = "Choisir une chambre vide et la date d'entrée dans la chambre"
@@ -819,6 +791,7 @@ def homeless_tenants(request):
 
 
 @admin_required
+@conditional_page(leasing_state)
 def leasing_profile(request, pk):
     """
     Display profile of a leasing
@@ -837,6 +810,56 @@ def leasing_profile(request, pk):
         }
     )
 
+def leasing_json(leasing):
+    """Return a leasing of a timeline as a dictionary serializable in JSON."""
+    if leasing is None:
+        return None
+    return {
+        "pk": leasing.pk,
+        "url": reverse('gestion:leasingProfile', kwargs={'pk': leasing.pk}),
+        "date_of_entry": leasing.date_of_entry and leasing.date_of_entry.isoformat(),
+        "date_of_departure": leasing.date_of_departure and leasing.date_of_departure.isoformat(),
+        "room": {
+            "pk": leasing.room.pk,
+            "name": str(leasing.room),
+            "url": reverse('gestion:roomProfile', kwargs={'pk': leasing.room.pk}),
+        },
+        "tenant": {
+            "pk": leasing.tenant.pk,
+            "name": str(leasing.tenant),
+            "url": reverse('gestion:tenantProfile', kwargs={'pk': leasing.tenant.pk}),
+        },
+    }
+
+def timeline_response(owner):
+    """Return the timeline of a room or a tenant as a JSON response."""
+    timeline = owner.timeline
+    return JsonResponse({
+        "previous": [leasing_json(leasing) for leasing in timeline.previous],
+        "current": leasing_json(timeline.current),
+        "next": leasing_json(timeline.next),
+    })
+
+@admin_required
+@conditional_page(room_state)
+def room_timeline(request, pk):
+    """
+    Return the previous, current and next leasings of a room in JSON
+
+    pk : primary key of a room
+    """
+    return timeline_response(get_object_or_404(Room, pk=pk))
+
+@admin_required
+@conditional_page(tenant_state)
+def tenant_timeline(request, pk):
+    """
+    Return the previous, current and next leasings of a tenant in JSON
+
+    pk : primary key of a tenant
+    """
+    return timeline_response(get_object_or_404(Tenant, pk=pk))
+
 @admin_required
 def edit_leasing(request, pk):
     """
@@ -846,30 +869,20 @@ def edit_leasing(request, pk):
     """
     search_form = SearchForm()
     leasing = get_object_or_404(Leasing, pk=pk)
-    try:
-        lock_for_session(leasing, request.session)
-    except AlreadyLockedError:
-        messages.error(
-            request,
-            "Impossible de modifier le dossier : il est en cours de modification."
-        )
-        return redirect(request.META.get('HTTP_REFERER', '/'))
     leasing_form = LeasingForm(request.POST or None, instance=leasing)
     if 'cancel' in request.POST:
         messages.success(request, "Demande annulée")
-        unlock_for_session(leasing, request.session)
         return redirect(request.POST.get('cancel') or "home")
     if leasing_form.is_valid():
-        if not check_for_session(leasing, request.session):
-            messages.error(
-                request,
-                "Impossible de modifier le dossier : il est en cours de modification.")
-            return redirect(request.META.get('HTTP_REFERER', '/'))
-        leasing_form.save()
-        messages.success(
-            request, "Les modifications ont bien été enregistrées")
-        unlock_for_session(leasing, request.session)
-        return redirect(reverse('gestion:leasingProfile', kwargs={'pk': leasing.pk}))
+        try:
+            leasing_form.save()
+        except VersionConflict:
+            leasing_form = conflict_form(request, leasing_form)
+        else:
+            RoomOccupancy.update_room(leasing.room)
+            messages.success(
+                request, "Les modifications ont bien été enregistrées")
+            return redirect(reverse('gestion:leasingProfile', kwargs={'pk': leasing.pk}))
     return render(
         request,
         "gestion/edit_leasing.html",
@@ -885,17 +898,33 @@ def edit_leasing(request, pk):
 
 @admin_required
 def add_one_year(request):
-    """Add one to school_year field of every tenant"""
-    tenants = Tenant.objects.all()
-    for tenant in tenants:
-        tenant.school_year += 1
-        tenant.save()
-    messages.success(
-        request,
-        "Tous les locataires ont été augmentés d'une année"
-    )
+    """
+    Display the number of residents concerned, and add one to the school year of current
+    and next residents once confirmed.
+    """
+    form = AddOneYearForm(request.POST or None)
     next_url = request.GET.get('next', reverse('home'))
-    return redirect(next_url)
+    if 'cancel' in request.POST:
+        messages.success(request, "Demande annulée")
+        return redirect(next_url)
+    if form.is_valid():
+        counts = Tenant.add_one_year(reset_leaving=form.cleaned_data['reset_leaving'])
+        message = "%d locataires ont été augmentés d'une année" % counts["promoted"]
+        if counts["leaving"]:
+            message += ", %d ne sont plus sur le départ" % counts["leaving"]
+        messages.success(request, message)
+        return redirect(next_url)
+    preview = Tenant.add_one_year(reset_leaving=True, dry_run=True)
+    message = "%d résidents actuels ou futurs passeront à l'année suivante. " \
+        "%d n'ont pas d'année d'étude et ne seront pas modifiés. " \
+        "%d sont sur le départ." % (preview["promoted"], preview["skipped"], preview["leaving"])
+    return render(request, "form.html", {
+        "form": form,
+        "p": message,
+        "form_title": "Passage nA -> (n+1)A",
+        "form_button": "Confirmer",
+        "form_icon": "user-graduate",
+    })
 
 
 @admin_required
@@ -922,6 +951,7 @@ def leave(request, pk):
             room.save()
             tenant.current_leasing = None
             tenant.save()
+            RoomOccupancy.update_room(room)
         messages.success(request, "Le locataire a bien quitté la résidence")
         return redirect(reverse("gestion:tenantProfile", kwargs={"pk": tenant.pk}))
     return render(
@@ -971,6 +1001,7 @@ def move_out(request, pk, mode):
         room.save()
         tenant.current_leasing = None
         tenant.save()
+        RoomOccupancy.update_room(room)
         if mode == "room":
             messages.success(request, "La chambre a bien été vidé")
             return redirect(reverse("gestion:roomProfile", kwargs={"pk": room.pk}))
@@ -1038,6 +1069,7 @@ def move_in(request, pk, mode): # pylint: disable=too-many-return-statements
         room.current_leasing = leasing
         room.next_leasing = None
         room.save()
+        RoomOccupancy.update_room(room)
         return redirect(reverse('gestion:tenantProfile', kwargs={'pk': tenant.pk}))
     return render(
         request,
@@ -1051,6 +1083,27 @@ def move_in(request, pk, mode): # pylint: disable=too-many-return-statements
         }
     )
 
+@admin_required
+def move_in_all(request):
+    """Display the move-ins of all next tenants and do them once a date is given."""
+    form = DateForm(request.POST or None)
+    if 'cancel' in request.POST:
+        messages.success(request, "Demande annulée")
+        return redirect(request.POST.get('cancel') or "home")
+    done = form.is_valid()
+    report = Leasing.move_in_all(form.cleaned_data['date'] if done else None, dry_run=not done)
+    moved = sum(1 for move_in in report if move_in.moved)
+    if done:
+        invalidate_autocomplete()
+        messages.success(request, "Les emménagements ont bien été effectués")
+    return render(request, "gestion/move_in_all.html", {
+        "form": form,
+        "report": report,
+        "done": done,
+        "moved": moved,
+        "blocked": len(report) - moved,
+    })
+
 @admin_required
 def cancel_next_room(request, pk, mode):
     """Cancel next leasing
@@ -1071,6 +1124,7 @@ def cancel_next_room(request, pk, mode):
     tenant.next_leasing = None
     tenant.save()
     leasing.delete()
+    RoomOccupancy.update_room(room)
     if mode == "room":
         messages.success(request, "Le prochain locataire a bien été annulé")
         return redirect(reverse('gestion:roomProfile', kwargs={"pk": room.pk}))
@@ -1097,6 +1151,32 @@ def map_index(request):
     )
 
 
+@admin_required
+def map_download(request, pk):
+    """Download the map pk."""
+    return serve_file(request, get_object_or_404(Map, pk=pk).map)
+
+
+@admin_required
+def room_map_download(request, pk):
+    """Download the map of the room pk."""
+    return serve_file(request, get_object_or_404(Room.objects.only('map'), pk=pk).map)
+
+
+@admin_required
+def map_rendition(request, pk, size):
+    """Display the rendition size (see aloes.renditions.SIZES) of the map pk."""
+    return serve_rendition(request, get_object_or_404(Map, pk=pk).map, size)
+
+
+@admin_required
+def room_map_rendition(request, pk, size):
+    """Display the rendition size (see aloes.renditions.SIZES) of the map of the room pk."""
+    return serve_rendition(
+        request, get_object_or_404(Room.objects.only('map'), pk=pk).map, size
+    )
+
+
 class MapCreate(AdminRequiredMixin, ImprovedCreateView):  # pylint: disable=too-many-ancestors
     """Display a form to create a map."""
     model = Map
@@ -1113,14 +1193,13 @@ class MapCreate(AdminRequiredMixin, ImprovedCreateView):  # pylint: disable=too-
     }
 
 
-class MapEdit(AdminRequiredMixin, LockableUpdateView):  # pylint: disable=too-many-ancestors
+class MapEdit(AdminRequiredMixin, VersionedUpdateView):  # pylint: disable=too-many-ancestors
     """Display a form to edit a map."""
     model = Map
     fields = "__all__"
     template_name = "form.html"
     success_url = reverse_lazy('gestion:indexMap')
     success_message = "Le plan a bien été modifié"
-    lock_message = "Impossible de modifier le plan : il est en cours de modification"
     context = {
         "form_title": "Modification d'un plan",
         "form_icon": "pencil-alt",
@@ -1130,9 +1209,12 @@ class MapEdit(AdminRequiredMixin, LockableUpdateView):  # pylint: disable=too-ma
         }
 
     def form_valid(self, form):
-        if self.get_object().map:
-            os.remove(self.get_object().map.path)
-        return super().form_valid(form)
+        former_map = self.get_object().map
+        response = super().form_valid(form)
+        # Not saved on a conflict: self.object is then the current row.
+        if former_map and former_map != self.object.map:
+            os.remove(former_map.path)
+        return response
 
 
 class MapDelete(AdminRequiredMixin, ImprovedDeleteView):  # pylint: disable=too-many-ancestors
@@ -1159,95 +1241,91 @@ class MapDelete(AdminRequiredMixin, ImprovedDeleteView):  # pylint: disable=too-
 
 @admin_required
 def export_xls(request):
-    """View to export main page information in xlss format."""
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="export.xslx"'
-    workbook = xlsxwriter.Workbook(response, {"in_memory": True})
-    worksheet = workbook.add_worksheet()
-    items = [
-        'Chambre (lot)',
-        'Locataire (email)',
-        'Réservation',
-        'Réparation',
-        'Loyer',
-        'Observations'
-    ]
-    for i, item in enumerate(items):
-        worksheet.write(0, i, item)
-    rooms = Room.objects.all()
-    for i, room in enumerate(rooms):
-        if room.current_leasing:
-            tenant_text = str(room.current_leasing.tenant) + \
-                "(" + str(room.current_leasing.tenant.email) + ")"
-        else:
-            tenant_text = "Pas de locataire actuel"
-        items = [
-            str(room),
-            tenant_text,
-            str(room.next_leasing.tenant if room.next_leasing else "Pas réservée"),
-            str(room.renovation or "Non indiqué"),
-            str(room.rent_type or "Non indiqué"),
-            str(room.observations)
-        ]
-        for j, item in enumerate(items):
-            worksheet.write(i + 1, j, item)
-    tenants = Tenant.objects.filter(current_leasing=None)
-    last_written = i + 1
-    for i, tenant in enumerate(tenants):
-        items = ["Pas de chambre", str(tenant), "", "", ""]
-        for j, item in enumerate(items):
-            worksheet.write(i + last_written, j, item)
-    workbook.close()   
-    return response
+    """Queue the export of main page information (xlsx by default, csv or ods with format)."""
+    file_format = request.GET.get("format", "xlsx")
+    job = enqueue("gestion.export", "Export complet (" + file_format + ")", request.user,
+                  file_format=file_format)
+    return redirect(reverse('job', kwargs={'pk': job.pk}))
 
 ########## autocomplete ########
 
 
-class EmptyRoomAutocomplete(autocomplete.Select2QuerySetView):  # pylint: disable=too-many-ancestors
+class IndexedAutocompleteMixin:
+    """Answer from an index in memory (see gestion.autocomplete), or run the query if cold."""
+    index = None
+    filters = {}
+
+    def get(self, request, *args, **kwargs):
+        results = None
+        if request.user.is_authenticated:
+            results = self.index.search(self.q, **self.filters)
+        if results is None:
+            return super().get(request, *args, **kwargs)
+        return JsonResponse({
+            "results": [
+                {"id": str(pk), "text": label, "selected_text": label} for pk, label in results
+            ],
+            "pagination": {"more": False}
+        })
+
+
+class EmptyRoomAutocomplete(IndexedAutocompleteMixin, autocomplete.Select2QuerySetView):  # pylint: disable=too-many-ancestors
     """Autocomplete view for empty rooms."""
+    index = ROOMS
+    filters = {"is_active": True, "current_leasing_id": None}
+
     def get_queryset(self):
         if not self.request.user.is_authenticated:
-            return Room.object.none()
-        qs = Room.objects.filter(is_active=True).filter(current_leasing=None)
+            return Room.objects.none()
+        qs = Room.objects.filter(is_active=True).filter(current_leasing=None).order_by('room')
         if self.q:
             qs = qs.filter(room__istartswith=self.q)
         return qs
 
 
-class NoNextTenantRoomAutomplete(autocomplete.Select2QuerySetView):  # pylint: disable=too-many-ancestors
+class NoNextTenantRoomAutomplete(IndexedAutocompleteMixin, autocomplete.Select2QuerySetView):  # pylint: disable=too-many-ancestors
     """Autocomplete view for rooms with no next tenant (next leasing)."""
+    index = ROOMS
+    filters = {"is_active": True, "next_leasing_id": None}
+
     def get_queryset(self):
         if not self.request.user.is_authenticated:
-            return Room.object.none()
-        qs = Room.objects.filter(is_active=True).filter(next_leasing=None)
+            return Room.objects.none()
+        qs = Room.objects.filter(is_active=True).filter(next_leasing=None).order_by('room')
         if self.q:
             qs = qs.filter(room__istartswith=self.q)
         return qs
 
 
-class TenantWNRAutocomplete(autocomplete.Select2QuerySetView):  # pylint: disable=too-many-ancestors
+class TenantWNRAutocomplete(IndexedAutocompleteMixin, autocomplete.Select2QuerySetView):  # pylint: disable=too-many-ancestors
     """Autocomplete view for tenants with no next room(next leasing)."""
+    index = TENANTS
+    filters = {"next_leasing_id": None}
+
     def get_queryset(self):
         if not self.request.user.is_authenticated:
-            return Tenant.object.none()
-        qs = Tenant.objects.filter(next_leasing=None)
+            return Tenant.objects.none()
+        qs = Tenant.objects.filter(next_leasing=None).order_by(
+            'search_name', 'search_first_name'
+        )
         if self.q:
-            qs = qs.filter(Q(name__icontains=self.q) |
-                           Q(first_name__icontains=self.q))
+            qs = qs.filter(Tenant.search_filter(self.q))
         return qs
 
 
-class TenantWithoutRoomAutocomplete(autocomplete.Select2QuerySetView):
+class TenantWithoutRoomAutocomplete(IndexedAutocompleteMixin, autocomplete.Select2QuerySetView):  # pylint: disable=too-many-ancestors
     """Autocomplete view for tenants without room (current leasing)."""
+    index = TENANTS
+    filters = {"current_leasing_id": None}
+
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return Tenant.objects.none()
-        qs = Tenant.objects.filter(current_leasing=None)
+        qs = Tenant.objects.filter(current_leasing=None).order_by(
+            'search_name', 'search_first_name'
+        )
         if self.q:
-            qs = qs.filter(Q(name__icontains=self.q) |
-                           Q(first_name__icontains=self.q))
+            qs = qs.filter(Tenant.search_filter(self.q))
         return qs
 
 
@@ -1280,12 +1358,18 @@ def copy_backups():
     return True
 
 
+@admin_required
 def backup(request):
-    """Save bdd in JSON"""
-    management.call_command('dbbackup')
-    copy_backups()
-    messages.success(request, "La base de données a bien été sauvegardée.")
-    return redirect(request.META.get('HTTP_REFERER', '/'))
+    """Queue a backup of the database, unless one is already waiting or running."""
+    job = Job.objects.filter(
+        task="gestion.backup", status__in=(Job.PENDING, Job.RUNNING)
+    ).first()
+    if job is None:
+        job = enqueue("gestion.backup", "Sauvegarde de la base de données", request.user)
+        messages.success(request, "La sauvegarde de la base de données a été lancée.")
+    else:
+        messages.info(request, "Une sauvegarde de la base de données est déjà en cours.")
+    return redirect(reverse('job', kwargs={'pk': job.pk}))
 
 
 class Backup(CronJobBase):
@@ -1295,6 +1379,5 @@ class Backup(CronJobBase):
     code = 'gestion.Backup'
 
     def do(self): # pylint: disable=invalid-name, no-self-use
-        """Call ddbakcup command and copy_backups"""
-        management.call_command('dbbackup')
-        copy_backups()
+        """Queue the backup job, run by the worker of the backup queue."""
+        enqueue("gestion.backup", "Sauvegarde quotidienne de la base de données")